@@ -0,0 +1,19 @@
+"""Helpers shared by the benchmarks measuring GET /user/ latency under load."""
+from typing import List
+import asyncio
+import time
+import httpx
+
+
+async def user_probe(client: httpx.AsyncClient, samples: int, latencies: List[float]) -> None:
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = await client.get("/user/")
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        await asyncio.sleep(0.01)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
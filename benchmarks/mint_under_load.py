@@ -0,0 +1,95 @@
+"""Mint throughput and read latency during a burst of mints.
+
+Thumbnails used to be generated in the worker threads, where Pillow holds the GIL, so a burst of mints used
+a single core and slowed down every other request of the worker. They are generated in IMAGE_WORKERS
+processes now. Run against a live server, once per amount of image workers:
+
+    IMAGE_WORKERS=1 poetry run uvicorn nft_service.src.main:app --port 5000 --workers 1
+    poetry run python benchmarks/mint_under_load.py --url http://localhost:5000 --image path/to/large.jpg
+
+    IMAGE_WORKERS=4 poetry run uvicorn nft_service.src.main:app --port 5000 --workers 1
+    poetry run python benchmarks/mint_under_load.py --url http://localhost:5000 --image path/to/large.jpg
+
+Mints per second should grow with the workers up to the amount of cores while the p99 of GET /user/
+stays close to the one measured with --mint-clients 0. Use --pool to measure the process pool alone,
+without a server, for 1 to the amount of cores.
+"""
+from common import percentile, user_probe
+from nft_service.src.imaging import ImagePool, make_thumbnail
+from typing import List, Tuple
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import httpx
+
+
+async def mint_load(client: httpx.AsyncClient, image: bytes, stop: asyncio.Event) -> Tuple[int, int]:
+    minted, rejected = 0, 0
+    while not stop.is_set():
+        files = {"file": ("bench.jpg", image, "image/jpeg")}
+        response = await client.post("/nft/mint/", files=files, data={"description": "benchmark"})
+        # Rejected mints (queue full) are expected under heavy bursts
+        if response.status_code == 503:
+            rejected += 1
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+        else:
+            response.raise_for_status()
+            minted += 1
+    return minted, rejected
+
+
+async def main(url: str, image_path: str, mint_clients: int, samples: int) -> None:
+    with open(image_path, "rb") as fo:
+        image = fo.read()
+
+    limits = httpx.Limits(max_connections=mint_clients + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        stop = asyncio.Event()
+        load = [asyncio.create_task(mint_load(client, image, stop)) for _ in range(mint_clients)]
+
+        start = time.perf_counter()
+        latencies: List[float] = []
+        await user_probe(client, samples, latencies)
+
+        stop.set()
+        results = await asyncio.gather(*load)
+        elapsed = time.perf_counter() - start
+
+    minted = sum(result[0] for result in results)
+    rejected = sum(result[1] for result in results)
+    print(f"mint clients: {mint_clients}  minted: {minted} ({minted / elapsed:.1f}/s)  rejected: {rejected}")
+    print(f"/user/ latency ms  p50: {statistics.median(latencies):.1f}  p99: {percentile(latencies, 99):.1f}")
+
+
+async def pool_scaling(image_path: str, jobs: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for workers in range(1, (os.cpu_count() or 1) + 1):
+            pool = ImagePool(workers=workers, queue_size=jobs, timeout=120)
+            # Warm up so process start up is not measured
+            warm_up = [pool.run(make_thumbnail, image_path, f"{tmp_dir}/warm-{i}.jpg", 200) for i in range(workers)]
+            await asyncio.gather(*warm_up)
+
+            start = time.perf_counter()
+            thumbnails = [pool.run(make_thumbnail, image_path, f"{tmp_dir}/thumb-{i}.jpg", 200) for i in range(jobs)]
+            await asyncio.gather(*thumbnails)
+            elapsed = time.perf_counter() - start
+            pool.shutdown()
+            print(f"image workers: {workers}  thumbnails/s: {jobs / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--image", required=True, help="jpeg minted over and over")
+    parser.add_argument("--mint-clients", type=int, default=16, help="Concurrent clients minting")
+    parser.add_argument("--samples", type=int, default=500, help="Requests to /user/ to measure")
+    parser.add_argument("--pool", action="store_true", help="Measure only the image process pool")
+    parser.add_argument("--jobs", type=int, default=64, help="Thumbnails generated per amount of workers (--pool)")
+    args = parser.parse_args()
+    if args.pool:
+        asyncio.run(pool_scaling(args.image, args.jobs))
+    else:
+        asyncio.run(main(args.url, args.image, args.mint_clients, args.samples))
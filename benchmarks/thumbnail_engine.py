@@ -0,0 +1,109 @@
+"""CPU time and peak memory of a thumbnail, by engine and image size.
+
+Compares imaging.downscale, used by make_thumbnail, with the path it replaced: Image.thumbnail with LANCZOS,
+which drafts JPEGs at twice the thumbnail size. Also with a full resolution decode, what every format other
+than JPEG goes through. Every measure runs in a fresh process so peak RSS is not the one of a previous image:
+
+    poetry run python benchmarks/thumbnail_engine.py
+    poetry run python benchmarks/thumbnail_engine.py --corpus path/to/images --repeat 10
+
+CPU ms is the median per image, peak RSS the growth of the process peak while thumbnailing.
+"""
+from nft_service.src.imaging import downscale
+from PIL import ExifTags, Image
+from typing import Callable, Dict, List, Tuple
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SIZES: Tuple[Tuple[int, int], ...] = ((640, 480), (1600, 1200), (3000, 2000), (4000, 3000), (6000, 4000))
+THUMBNAIL_SIZE: int = 200
+
+
+def full_decode(path: str, thumbnail_path: str, size: int) -> None:
+    with Image.open(path) as img:
+        img.load()
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        img.save(thumbnail_path)
+
+
+def previous(path: str, thumbnail_path: str, size: int) -> None:
+    with Image.open(path) as img:
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        img.save(thumbnail_path)
+
+
+def engine(path: str, thumbnail_path: str, size: int) -> None:
+    with Image.open(path) as img:
+        downscale(img, size).save(thumbnail_path)
+
+
+ENGINES: Dict[str, Callable[[str, str, int], None]] = {"full": full_decode, "previous": previous, "engine": engine}
+
+
+def build_corpus(directory: str) -> None:
+    # Noise compresses like a detailed photo, unlike a flat color. With EXIF, as camera uploads
+    exif = Image.Exif()
+    exif[ExifTags.Base.Make] = "benchmark"
+    for width, height in SIZES:
+        bands = [Image.effect_noise((width, height), 64) for _ in range(3)]
+        img = Image.merge("RGB", bands)
+        for extension in ("jpg", "png"):
+            path = os.path.join(directory, f"{width}x{height}.{extension}")
+            img.save(path, exif=exif)
+
+
+def measure(engine_name: str, path: str, repeat: int) -> Dict[str, float]:
+    # Runs in its own process, see main. Processes start with the peak RSS of their parent (it is kept through
+    # exec), so the parent never loads an image itself
+    thumbnail = ENGINES[engine_name]
+    root, extension = os.path.splitext(path)
+    thumbnail_path = f"{root}-{engine_name}-thumb{extension}"
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_times = []
+    for _ in range(repeat):
+        start = time.process_time()
+        thumbnail(path, thumbnail_path, THUMBNAIL_SIZE)
+        cpu_times.append((time.process_time() - start) * 1000)
+    # ru_maxrss is in KB on Linux
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    os.unlink(thumbnail_path)
+    return {"cpu_ms": statistics.median(cpu_times), "rss_mb": rss_peak / 1024}
+
+
+def main(corpus: List[str], repeat: int) -> None:
+    # Smallest images first, the parent only reads their headers
+    corpus = sorted(corpus, key=os.path.getsize)
+    print(f"{'image':<24}{'engine':<10}{'cpu ms':>10}{'peak rss MB':>14}")
+    for path in corpus:
+        with Image.open(path) as img:
+            label = f"{img.format} {img.width}x{img.height}"
+        for engine_name in ENGINES:
+            command = [sys.executable, __file__, "--measure", engine_name, path, "--repeat", str(repeat)]
+            result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+            print(f"{label:<24}{engine_name:<10}{result['cpu_ms']:>10.1f}{result['rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory with the images to thumbnail, a generated one by default")
+    parser.add_argument("--repeat", type=int, default=5, help="Thumbnails per image and engine")
+    parser.add_argument("--measure", nargs=2, metavar=("ENGINE", "IMAGE"), help=argparse.SUPPRESS)
+    parser.add_argument("--build", metavar="DIRECTORY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], args.measure[1], args.repeat)))
+    elif args.build:
+        build_corpus(args.build)
+    elif args.corpus:
+        main(sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus)), args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            subprocess.run([sys.executable, __file__, "--build", tmp_dir], check=True)
+            main(sorted(os.path.join(tmp_dir, name) for name in os.listdir(tmp_dir)), args.repeat)
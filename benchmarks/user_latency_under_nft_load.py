@@ -0,0 +1,49 @@
+"""Latency of GET /user/ while GET /nft/ is under load.
+
+File and image work used to run inside the event loop, so a page of thumbnails being read
+stalled every other request of the worker. Run against a live server with some NFTs minted:
+
+    poetry run uvicorn nft_service.src.main:app --port 5000 --workers 1
+    poetry run python benchmarks/user_latency_under_nft_load.py --url http://localhost:5000
+
+Compare the p99 reported with and without the --nft-clients load.
+"""
+from common import percentile, user_probe
+from typing import List
+import argparse
+import asyncio
+import statistics
+import httpx
+
+
+async def nft_load(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    requests = 0
+    while not stop.is_set():
+        await client.get("/nft/", params={"limit": 50})
+        requests += 1
+    return requests
+
+
+async def main(url: str, nft_clients: int, samples: int) -> None:
+    limits = httpx.Limits(max_connections=nft_clients + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        stop = asyncio.Event()
+        load = [asyncio.create_task(nft_load(client, stop)) for _ in range(nft_clients)]
+
+        latencies: List[float] = []
+        await user_probe(client, samples, latencies)
+
+        stop.set()
+        nft_requests = sum(await asyncio.gather(*load))
+
+    print(f"/nft/ clients: {nft_clients}  /nft/ requests served: {nft_requests}")
+    print(f"/user/ latency ms  p50: {statistics.median(latencies):.1f}  p99: {percentile(latencies, 99):.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--nft-clients", type=int, default=16, help="Concurrent clients requesting /nft/")
+    parser.add_argument("--samples", type=int, default=500, help="Requests to /user/ to measure")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.nft_clients, args.samples))
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from nft_service.src import config as cf
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, Generic, Hashable, List, NamedTuple, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """In memory cache bounded by the total size in bytes of its values.
+
+    When adding a value would exceed the budget the least recently used entries are evicted.
+    Safe to be shared between requests running in different threads.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped on every invalidation, see token()
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def token(self) -> int:
+        """Take it before reading the source of a value and pass it to put.
+
+        If anything was invalidated in between the value might have been read before the change that
+        invalidated it, so it is not stored.
+        """
+        return self._invalidations
+
+    def put(self, key: Hashable, value: V, size: Optional[int] = None, token: Optional[int] = None) -> None:
+        size = len(value) if size is None else size  # type: ignore[arg-type]
+        # Values bigger than the whole budget would evict everything else just to be evicted next
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if token is not None and token != self._invalidations:
+                return
+            self._remove(key)
+            while self._bytes + size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return dict(
+                name=self.name,
+                entries=len(self._entries),
+                size_bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_ratio=self.hits / requests if requests else 0.0,
+            )
+
+    def _remove(self, key: Hashable) -> None:
+        if key in self._entries:
+            del self._entries[key]
+            self._bytes -= self._sizes.pop(key)
+
+
+# base64 representation of stored images and thumbnails, keyed by their stored name.
+# Stored files are never modified so entries never get stale.
+image_cache: LRUCache[str] = LRUCache("images", cf.IMAGE_CACHE_MAX_BYTES)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[datetime]
+    # Of the NFT when the body was built, None if it didn't exist
+    version: Optional[int]
+
+
+# Serialized GET /nft/{nft_id} responses keyed by NFT id. Entries must be invalidated whenever the NFT changes,
+# and as other processes only invalidate their own cache they are checked against the version of the row when read.
+fetch_cache: LRUCache[CachedResponse] = LRUCache("nft_fetch", cf.FETCH_CACHE_MAX_BYTES)
+
+
+def all_caches() -> List[LRUCache]:
+    return [image_cache, fetch_cache]
@@ -0,0 +1,33 @@
+"""Write the base64 sidecar of the thumbnails minted before it was precomputed at mint time.
+
+Usage:
+    poetry run python -m nft_service.src.commands.backfill_thumbnails
+"""
+from nft_service.src.db.events import engine
+from nft_service.src.models.nft import NFTFile
+from nft_service.src import storage
+from loguru import logger
+from sqlmodel import Session, select
+import os
+
+BATCH_SIZE: int = 1000
+
+
+def backfill() -> int:
+    written = 0
+    with Session(engine) as session:
+        thumbnails = session.exec(select(NFTFile.thumbnail).execution_options(yield_per=BATCH_SIZE))
+        for thumbnail in thumbnails:
+            if not storage.exists(thumbnail):
+                logger.warning("Thumbnail {} not found, skipping", thumbnail)
+                continue
+            if os.path.exists(storage.path_for(storage.encoded_name(thumbnail))):
+                continue
+            storage.write_encoded(thumbnail)
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    logger.info("Backfilling encoded thumbnails")
+    logger.info("{} encoded thumbnails written", backfill())
@@ -0,0 +1,80 @@
+"""Move the stored files to the sharded layout, or between volumes after STATIC_VOLUMES changes.
+
+Runs next to the service, which must already have STATIC_SHARDED set: new files are written where they
+belong and files not moved yet are still found where they were (see storage.path_for). Every file is first
+linked (or copied, between filesystems) to where it belongs, where readers find it from then on. The old
+copies are removed once no reader can still be opening them, after --grace seconds.
+
+Usage:
+    STATIC_SHARDED=true poetry run python -m nft_service.src.commands.migrate_storage [--rate 500] [--grace 60]
+"""
+from nft_service.src import config as cf
+from nft_service.src import storage
+from loguru import logger
+from typing import Iterable, Tuple
+import argparse
+import os
+import sys
+import time
+
+
+def misplaced_files() -> Iterable[Tuple[str, str]]:
+    # (name, path) of the stored files that are not where they belong
+    for root in dict.fromkeys((*storage.volumes(), cf.STATIC_PATH)):
+        if not os.path.isdir(root):
+            continue
+        for name, path in storage.stored_files(root):
+            if os.path.abspath(path) != os.path.abspath(storage.shard_path(name)):
+                yield name, path
+
+
+def copy_files(rate: float) -> int:
+    copied = 0
+    for name, path in misplaced_files():
+        if os.path.exists(storage.shard_path(name)):
+            continue
+        try:
+            storage.copy(path, storage.target_path(name))
+        except FileNotFoundError:
+            # Removed by the service meanwhile (content no longer referenced)
+            continue
+        copied += 1
+        # Throttled so the disks keep serving the service
+        if rate:
+            time.sleep(1 / rate)
+    return copied
+
+
+def prune_files() -> int:
+    pruned = 0
+    for name, path in misplaced_files():
+        target = storage.shard_path(name)
+        try:
+            if os.path.getsize(target) == os.path.getsize(path):
+                os.unlink(path)
+                pruned += 1
+        except FileNotFoundError:
+            # Not copied yet or removed by the service meanwhile
+            continue
+    return pruned
+
+
+def migrate(rate: float = 0, grace: float = 60) -> Tuple[int, int]:
+    copied = copy_files(rate)
+    # Readers that looked a file up before it was copied may still be opening the old copy
+    time.sleep(grace)
+    return copied, prune_files()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=0, help="Files copied per second, 0 for no limit")
+    parser.add_argument("--grace", type=float, default=60, help="Seconds old copies are kept after copying")
+    args = parser.parse_args()
+    if not cf.STATIC_SHARDED:
+        logger.error("STATIC_SHARDED is not set, the service would not find the migrated files")
+        sys.exit(1)
+
+    logger.info("Migrating stored files to {}", ", ".join(storage.volumes()))
+    copied, pruned = migrate(args.rate, args.grace)
+    logger.info("{} files copied, {} old copies removed", copied, pruned)
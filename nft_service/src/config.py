@@ -1,10 +1,16 @@
 from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
+from typing import Tuple
 import os
 
 config = Config(".env")
 
 ROOT_PATH: str = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../..")
 STATIC_PATH: str = ROOT_PATH + "/static/images/"
+# Files in ab/cd/ subdirectories instead of all in STATIC_PATH, see storage.path_for and commands.migrate_storage
+STATIC_SHARDED: bool = config("STATIC_SHARDED", cast=bool, default=False)
+# Directories the sharded files are spread over by consistent hashing, only STATIC_PATH when empty
+STATIC_VOLUMES: CommaSeparatedStrings = config("STATIC_VOLUMES", cast=CommaSeparatedStrings, default="")
 
 DB_HOST: str = config("DB_HOST", cast=str, default="localhost")
 DB_USER = config("DB_USER", cast=str, default="root")
@@ -16,3 +22,31 @@ DB_URI: str = f"mysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 COCREATOR_FEE: float = 0.20  # Mint operation fee equally divided between cocreators
 OWNER_FEE: float = 0.80  # Mint operation fee that goes to the owner of the nft
+
+THUMBNAIL_URL: str = "/nft/thumbnail/"  # Endpoint serving the thumbnails referenced from the NFT list
+FILE_URL: str = "/nft/file/"  # Endpoint serving the original files referenced from fetch and mint
+MINT_JOB_URL: str = "/nft/mint/jobs/"  # Endpoint reporting the status of the mints finished in the background
+THUMBNAIL_MAX_AGE: int = 31_536_000  # Thumbnails are immutable, so clients can keep them for a year
+DIGEST_CACHE_SIZE: int = 10_000  # Amount of file digests kept in memory
+FILE_CHUNK_SIZE: int = 64 * 1024
+MAX_UPLOAD_BYTES: int = config("MAX_UPLOAD_BYTES", cast=int, default=1_500_000)  # Largest file accepted by mint
+MULTIPART_OVERHEAD_BYTES: int = 64 * 1024  # Room for the form fields and boundaries around the uploaded file
+BULK_MINT_MAX_FILES: int = config("BULK_MINT_MAX_FILES", cast=int, default=100)  # Files accepted by a bulk mint
+BULK_MINT_BATCH_SIZE: int = config("BULK_MINT_BATCH_SIZE", cast=int, default=25)  # NFTs committed at a time
+BULK_MINT_CONCURRENCY: int = config("BULK_MINT_CONCURRENCY", cast=int, default=8)  # Files processed in parallel
+IMAGE_CACHE_MAX_BYTES: int = config("IMAGE_CACHE_MAX_BYTES", cast=int, default=64 * 1024 * 1024)
+FETCH_CACHE_MAX_BYTES: int = config("FETCH_CACHE_MAX_BYTES", cast=int, default=64 * 1024 * 1024)
+EXPORT_BATCH_SIZE: int = 500  # Rows read from the db at a time when exporting the whole catalogue
+FILE_IO_WORKERS: int = config("FILE_IO_WORKERS", cast=int, default=8)  # Threads doing file work
+IMAGE_WORKERS: int = config("IMAGE_WORKERS", cast=int, default=os.cpu_count() or 1)  # Image processes, 0 uses threads
+IMAGE_QUEUE_SIZE: int = config("IMAGE_QUEUE_SIZE", cast=int, default=64)  # Image jobs waiting or running at a time
+IMAGE_JOB_TIMEOUT: float = config("IMAGE_JOB_TIMEOUT", cast=float, default=30)  # Seconds before an image job fails
+IMAGE_RETRY_AFTER: int = 5  # Seconds clients are told to wait when the image queue is full
+MINT_JOB_RETRIES: int = config("MINT_JOB_RETRIES", cast=int, default=5)  # Background mints retried on a full queue
+MINT_JOB_TIMEOUT: int = config("MINT_JOB_TIMEOUT", cast=int, default=600)  # Idle seconds before a mint job is recovered
+MINT_JOB_RECOVERY_INTERVAL: int = 60  # Seconds between checks for mint jobs left behind by a crash or a restart
+THUMBNAIL_SIZE: int = 200  # Longest side of the thumbnails saved when minting
+STREAM_CHUNK_SIZE: int = 3 * 16 * 1024  # Multiple of 3 so base64 encoded chunks can be concatenated
+MULTI_GET_MAX_IDS: int = 50  # Max amount of NFTs fetched by a single batch request
+IMAGE_VARIANT_SIZES: Tuple[int, ...] = (64, 128, 200, 512)  # Longest side of the image variants clients can ask for
+COUNT_REFRESH_SECONDS: int = config("COUNT_REFRESH_SECONDS", cast=int, default=60)  # Recount of listing totals
@@ -0,0 +1,126 @@
+from collections import Counter
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional, Type
+from weakref import WeakKeyDictionary
+from fastapi import BackgroundTasks
+from loguru import logger
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, select, text
+from nft_service.src import config as cf
+from nft_service.src.models.nft import NFT
+from nft_service.src.models.transaction import Transaction
+from nft_service.src.models.balance import UserBalance
+from nft_service.src.schemas.request_schema import CountMode
+
+# Tables whose listings report their total count
+COUNTED_MODELS = (NFT, Transaction, UserBalance)
+# Key in Session.info where the rows inserted or deleted by the current transaction are kept until it ends
+_PENDING_DELTAS = "count_deltas"
+
+TABLE_ROWS_QUERY = (
+    "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+)
+
+
+class RowCounter:
+    """Amount of rows of a table, maintained as rows are inserted and deleted.
+
+    It starts unknown until the first recount, which runs in the background. Recounts happen again every
+    COUNT_REFRESH_SECONDS to pick up the rows written by other processes.
+    """
+
+    def __init__(self, model: Type[SQLModel]):
+        self.model = model
+        self.value: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = Lock()
+
+    def add(self, delta: int) -> None:
+        with self._lock:
+            if self.value is not None:
+                self.value += delta
+
+    def is_stale(self) -> bool:
+        return self._refreshed_at is None or monotonic() - self._refreshed_at > cf.COUNT_REFRESH_SECONDS
+
+    def start_refresh(self) -> bool:
+        # Only one recount at a time
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def refresh(self, engine: Engine) -> None:
+        try:
+            with Session(engine) as session:
+                value = session.exec(select(func.count()).select_from(self.model)).one()
+            with self._lock:
+                self.value = value
+                self._refreshed_at = monotonic()
+        except Exception as e:
+            logger.error(f"Error counting rows of {self.model.__tablename__}: {e}")
+        finally:
+            self._refreshing = False
+
+
+# Counters of each database, so several engines (e.g. tests) don't mix their counts
+_counters: "WeakKeyDictionary[Engine, Dict[Type[SQLModel], RowCounter]]" = WeakKeyDictionary()
+_counters_lock = Lock()
+
+
+def get_counter(engine: Engine, model: Type[SQLModel]) -> RowCounter:
+    with _counters_lock:
+        counters = _counters.setdefault(engine, {})
+        if model not in counters:
+            counters[model] = RowCounter(model)
+        return counters[model]
+
+
+def total_count(
+    session: Session, model: Type[SQLModel], mode: CountMode, background_tasks: BackgroundTasks
+) -> Optional[int]:
+    # Never counts on the request path. Stale counters are recounted after the response is sent, only when exact
+    # counts are asked for: approximate ones are meant not to scan the table at all
+    engine = session.get_bind()
+    counter = get_counter(engine, model)
+    if mode == CountMode.EXACT and counter.is_stale() and counter.start_refresh():
+        background_tasks.add_task(counter.refresh, engine)
+
+    if mode == CountMode.EXACT and counter.value is not None:
+        return counter.value
+    return _table_statistics_count(session, model) if engine.dialect.name == "mysql" else counter.value
+
+
+def _table_statistics_count(session: Session, model: Type[SQLModel]) -> Optional[int]:
+    table = model.__tablename__
+    return session.execute(text(TABLE_ROWS_QUERY), {"table": table}).scalar()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_deltas(session: Session, flush_context: object) -> None:
+    deltas: Counter = session.info.setdefault(_PENDING_DELTAS, Counter())
+    for obj in session.new:
+        if isinstance(obj, COUNTED_MODELS):
+            deltas[type(obj)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, COUNTED_MODELS):
+            deltas[type(obj)] -= 1
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_deltas(session: Session) -> None:
+    deltas: Optional[Counter] = session.info.pop(_PENDING_DELTAS, None)
+    if not deltas:
+        return
+    engine = session.get_bind()
+    for model, delta in deltas.items():
+        get_counter(engine, model).add(delta)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_deltas(session: Session) -> None:
+    session.info.pop(_PENDING_DELTAS, None)
@@ -3,25 +3,44 @@ from nft_service.src.models.balance import UserBalance
 from nft_service.src.exceptions import NotFound, InternalError
 from sqlalchemy.exc import NoResultFound
 from sqlmodel import select
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
 
 
 class BalanceRepository(BaseRepository):
-    async def get_all(self, offset: int, limit: int) -> List[UserBalance]:
-        return self.session.exec(
-            select(UserBalance).offset(offset).limit(limit).order_by(UserBalance.creation_date.desc())
-        ).all()
+    DEFAULT_RELATIONS = ("user",)
 
-    async def get_by_user_id(self, user_id: int, offset: int = 0, limit: int = 100) -> List[UserBalance]:
+    async def get_all(
+        self,
+        offset: int,
+        limit: int,
+        relations: Optional[Sequence[str]] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[UserBalance]:
+        sql_query = select(UserBalance).options(
+            *self.relation_options(UserBalance, relations), *self.column_options(UserBalance, columns)
+        )
+        sql_query = self.paginate(sql_query, UserBalance.creation_date, UserBalance.id, offset, limit, cursor)
+        return self.session.exec(sql_query).all()
+
+    async def get_by_user_id(
+        self,
+        user_id: int,
+        offset: int = 0,
+        limit: int = 100,
+        relations: Optional[Sequence[str]] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[UserBalance]:
         try:
-            obj = self.session.exec(
+            sql_query = (
                 select(UserBalance)
+                .options(*self.relation_options(UserBalance, relations), *self.column_options(UserBalance, columns))
                 .where(UserBalance.user_id == user_id)
-                .offset(offset)
-                .limit(limit)
-                .order_by(UserBalance.creation_date.desc())
-            ).all()
+            )
+            sql_query = self.paginate(sql_query, UserBalance.creation_date, UserBalance.id, offset, limit, cursor)
+            obj = self.session.exec(sql_query).all()
             return obj
         except NoResultFound as e:
             raise NotFound(
@@ -1,9 +1,16 @@
-from sqlmodel import Session
+from sqlmodel import Session, SQLModel
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only, selectinload
 from nft_service.src.context import Context
 from nft_service.src.models.auditable import AuditableModel
+from typing import Any, List, Optional, Sequence, Tuple, Type
+from datetime import date
 
 
 class BaseRepository:
+    # Relations eagerly loaded by list queries when the caller doesn't ask for specific ones
+    DEFAULT_RELATIONS: Sequence[str] = ()
+
     def __init__(self, session: Session, context: Context) -> None:
         self._session = session
         self._context = context
@@ -27,3 +34,40 @@ class BaseRepository:
         obj.modified_at = self.context.system_date
         obj.modified_by = self.context.username
         obj.version += 1
+
+    def relation_options(self, model: Type[SQLModel], relations: Optional[Sequence[str]] = None) -> List[Any]:
+        # Load each relation for the whole page with a single "SELECT ... WHERE id IN (...)"
+        # instead of one lazy load per row
+        relations = self.DEFAULT_RELATIONS if relations is None else relations
+        return [selectinload(getattr(model, relation)) for relation in relations]
+
+    def column_options(self, model: Type[SQLModel], columns: Optional[Sequence[str]] = None) -> List[Any]:
+        # Read only the given columns, the rest are deferred until accessed. None reads all of them
+        if columns is None:
+            return []
+        return [load_only(*[getattr(model, column) for column in columns])]
+
+    def paginate(
+        self,
+        sql_query: Any,
+        sort_column: Any,
+        id_column: Any,
+        offset: int,
+        limit: int,
+        cursor: Optional[Tuple[date, int]] = None,
+        ids_descending: bool = True,
+    ) -> Any:
+        # Rows are always sorted by (sort_column, id) so that the last row of a page identifies
+        # where the next one starts. With a cursor the db seeks straight to it through the
+        # (sort_column, id) index instead of reading and discarding `offset` rows.
+        id_order = id_column.desc() if ids_descending else id_column.asc()
+        sql_query = sql_query.order_by(sort_column.desc(), id_order)
+
+        if cursor is None:
+            return sql_query.offset(offset).limit(limit)
+
+        sort_value, last_id = cursor
+        next_id = id_column < last_id if ids_descending else id_column > last_id
+        return sql_query.where(
+            or_(sort_column < sort_value, and_(sort_column == sort_value, next_id))
+        ).limit(limit)
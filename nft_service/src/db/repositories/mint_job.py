@@ -0,0 +1,112 @@
+from nft_service.src.db.repositories.base import BaseRepository
+from nft_service.src.models.mint_job import MintJob
+from nft_service.src.schemas.nft_schema import MintJobStatus
+from nft_service.src.exceptions import NotFound, InternalError
+from sqlalchemy import update
+from sqlalchemy.exc import NoResultFound
+from sqlmodel import func, select
+from typing import Any, List
+from datetime import datetime
+
+# Jobs that still hold a reference to their stored file
+ACTIVE_STATUSES = (MintJobStatus.PENDING, MintJobStatus.RUNNING)
+
+
+class MintJobRepository(BaseRepository):
+    async def get_by_id(self, id: int) -> MintJob:
+        try:
+            sql_query = select(MintJob).where(MintJob.id == id)
+            return self.session.exec(sql_query).one()
+        except NoResultFound as e:
+            raise NotFound(details=str(e), extra={"model": "MintJob", "field": "id", "value": id})
+
+    async def count_active(self, hashed_name: str) -> int:
+        sql_query = (
+            select(func.count())
+            .select_from(MintJob)
+            .where(MintJob.hashed_name == hashed_name, MintJob.status.in_(ACTIVE_STATUSES))  # type: ignore
+        )
+        return self.session.exec(sql_query).one()
+
+    async def get_stale(self, before: datetime) -> List[MintJob]:
+        # Unfinished jobs nobody has worked on since before
+        sql_query = (
+            select(MintJob)
+            .where(MintJob.status.in_(ACTIVE_STATUSES), MintJob.modified_at < before)  # type: ignore
+            .order_by(MintJob.id)
+        )
+        return self.session.exec(sql_query).all()
+
+    async def create(
+        self,
+        status: str,
+        owner_id: int,
+        description: str,
+        creators: List[int],
+        filename: str,
+        hashed_name: str,
+        digest: str,
+        commit: bool = False,
+        **kwargs: Any
+    ) -> MintJob:
+        job_obj = MintJob(
+            status=status,
+            owner_id=owner_id,
+            description=description,
+            creators=creators,
+            filename=filename,
+            hashed_name=hashed_name,
+            digest=digest,
+        )
+        self.add_auditable_fields(job_obj)
+
+        try:
+            self.session.add(job_obj)
+            if commit:
+                self.session.commit()
+                self.session.refresh(job_obj)
+            else:
+                self.session.flush()
+        except Exception as e:
+            raise InternalError(details=str(e))
+
+        return job_obj
+
+    async def claim(self, job_obj: MintJob, from_status: str, **fields: Any) -> bool:
+        # Updates and commits the job only if it still is in from_status. A single conditional UPDATE, so when
+        # several processes try at once (e.g. recovering the same job) only one of them gets it
+        sql_query = (
+            update(MintJob)
+            .where(MintJob.id == job_obj.id, MintJob.status == from_status)
+            .values(
+                modified_at=self.context.system_date,
+                modified_by=self.context.username,
+                version=MintJob.version + 1,
+                **fields,
+            )
+        )
+        try:
+            claimed: bool = self.session.execute(sql_query).rowcount == 1  # type: ignore[attr-defined]
+            self.session.commit()
+            self.session.refresh(job_obj)
+        except Exception as e:
+            raise InternalError(details=str(e))
+
+        return claimed
+
+    async def update(self, job_obj: MintJob, commit: bool = False, **fields: Any) -> MintJob:
+        for field, value in fields.items():
+            setattr(job_obj, field, value)
+        self.update_auditable_fields(job_obj)
+
+        try:
+            self.session.add(job_obj)
+            if commit:
+                self.session.commit()
+                self.session.refresh(job_obj)
+            else:
+                self.session.flush()
+        except Exception as e:
+            raise InternalError(details=str(e))
+
+        return job_obj
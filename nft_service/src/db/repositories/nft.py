@@ -1,18 +1,68 @@
 from nft_service.src.db.repositories.base import BaseRepository
-from nft_service.src.models.nft import NFT
+from nft_service.src.models.nft import NFT, NFTCreatorRel, NFTFile
 from nft_service.src.models.user import User
 from nft_service.src.exceptions import NotFound, InternalError
-from sqlmodel import select
-from typing import List, Optional
+from nft_service.src.cache import fetch_cache
+from nft_service.src.db import search
+from sqlmodel import func, select
+from sqlalchemy import insert
+from sqlalchemy.dialects.mysql import match
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
 from datetime import datetime
 from sqlalchemy.exc import NoResultFound
 
 
 class NFTRepository(BaseRepository):
-    async def get_all(self, offset: int, limit: int) -> List[NFT]:
-        sql_query = select(NFT).offset(offset).limit(limit).order_by(NFT.creation_date.desc())
+    DEFAULT_RELATIONS = ("owner", "file", "creators")
+
+    async def get_all(
+        self,
+        offset: int,
+        limit: int,
+        relations: Optional[Sequence[str]] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        columns: Optional[Sequence[str]] = None,
+        owner: Optional[str] = None,
+        creator: Optional[str] = None,
+    ) -> List[NFT]:
+        sql_query = select(NFT).options(
+            *self.relation_options(NFT, relations), *self.column_options(NFT, columns)
+        )
+        # The usernames are resolved by subqueries on the unique username index, so the filtered page is a
+        # range of ix_nft_owner_id_creation_date_id or of ix_nft_creator_rel_creator_id_nft_id
+        if owner is not None:
+            sql_query = sql_query.where(NFT.owner_id == self._user_id(owner))
+        if creator is not None:
+            sql_query = sql_query.join(NFTCreatorRel, NFTCreatorRel.nft_id == NFT.id).where(
+                NFTCreatorRel.creator_id == self._user_id(creator)
+            )
+        sql_query = self.paginate(sql_query, NFT.creation_date, NFT.id, offset, limit, cursor)
         return self.session.exec(sql_query).all()
 
+    @staticmethod
+    def _user_id(username: str) -> Any:
+        return select(User.id).where(User.username == username).scalar_subquery()
+
+    async def iter_batches(
+        self, batch_size: int, relations: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[List[NFT]]:
+        # Walk the whole table in (creation_date, id) order one keyset page at a time. Each batch is
+        # detached from the session once consumed so memory doesn't grow with the size of the table.
+        cursor: Optional[Tuple[datetime, int]] = None
+        while True:
+            sql_query = select(NFT).options(*self.relation_options(NFT, relations))
+            sql_query = self.paginate(sql_query, NFT.creation_date, NFT.id, 0, batch_size, cursor)
+            batch: List[NFT] = self.session.exec(sql_query).all()
+            if not batch:
+                return
+
+            cursor = (batch[-1].creation_date, batch[-1].id)  # type: ignore[assignment]
+            yield batch
+            self.session.expunge_all()
+
+            if len(batch) < batch_size:
+                return
+
     async def get_by_id(self, id: int) -> NFT:
         try:
             sql_query = select(NFT).where(NFT.id == id)
@@ -20,20 +70,66 @@ class NFTRepository(BaseRepository):
         except NoResultFound as e:
             raise NotFound(details=str(e), extra={"model": "NFT", "field": "id", "value": id})
 
+    async def get_version(self, id: int) -> Optional[int]:
+        # Primary key lookup of the version alone, None when the NFT doesn't exist
+        sql_query = select(NFT.version).where(NFT.id == id)
+        return self.session.exec(sql_query).first()
+
+    async def count_files(self, hashed_name: str) -> int:
+        # Identical uploads share their stored file, see NFTService._release_content
+        sql_query = select(func.count()).select_from(NFTFile).where(NFTFile.hashed_name == hashed_name)
+        return self.session.exec(sql_query).one()
+
+    async def get_by_ids(self, ids: Sequence[int], relations: Optional[Sequence[str]] = None) -> List[NFT]:
+        # A single "SELECT ... WHERE id IN (...)" plus one query per relation, in no particular order
+        if not ids:
+            return []
+        sql_query = select(NFT).options(*self.relation_options(NFT, relations)).where(NFT.id.in_(set(ids)))
+        return self.session.exec(sql_query).all()
+
+    async def search(
+        self,
+        text: str,
+        offset: int,
+        limit: int,
+        cursor: Optional[Tuple[float, int]] = None,
+        relations: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[NFT, float]]:
+        # NFTs whose description matches the text with their relevance, sorted by (relevance, id)
+        if self.session.get_bind().dialect.name == "mysql":
+            return self.session.exec(self.fulltext_query(text, offset, limit, cursor, relations)).all()
+
+        ranked: List[Tuple[float, int]] = search.get_index(self.session).search(text)
+        if cursor is None:
+            ranked = ranked[offset:offset + limit]
+        else:
+            ranked = [(score, id) for score, id in ranked if (score, id) < cursor][:limit]
+        nft_by_id = {nft_obj.id: nft_obj for nft_obj in await self.get_by_ids([id for _, id in ranked], relations)}
+        # Ids indexed by a rolled back mint are not in the db
+        return [(nft_by_id[id], score) for score, id in ranked if id in nft_by_id]
+
+    def fulltext_query(
+        self,
+        text: str,
+        offset: int,
+        limit: int,
+        cursor: Optional[Tuple[float, int]] = None,
+        relations: Optional[Sequence[str]] = None,
+    ) -> Any:
+        # Served by the FULLTEXT index on nft.description
+        score = match(NFT.description, against=text).in_natural_language_mode()
+        sql_query = select(NFT, score.label("score")).options(*self.relation_options(NFT, relations)).where(score > 0)
+        return self.paginate(sql_query, score, NFT.id, offset, limit, cursor)
+
     async def create(
-        self, owner_id: int, description: str, creators: List[int], file_id: int, commit: bool, **kargs
+        self, owner_id: int, description: str, creators: Sequence[User], file_id: int, commit: bool, **kargs
     ) -> NFT:
-        usersList: List[User] = []
-        for user_id in creators:
-            sql_query = select(User).where(User.id == user_id)
-            user: User = self.session.exec(sql_query).one()
-            usersList.append(user)
-
+        # Creators come already loaded by the caller (see UserService.fetch_creators), no query per creator
         nft_obj = NFT(
             owner_id=owner_id,
             description=description,
             file_id=file_id,
-            creators=usersList,
+            creators=list(creators),
             creation_date=datetime.now(),
         )
 
@@ -48,8 +144,38 @@ class NFTRepository(BaseRepository):
                 self.session.flush()
         except Exception as e:
             raise InternalError(details=str(e))
+
         return nft_obj
 
+    async def create_many(
+        self, owner_id: int, items: Sequence[Tuple[str, Sequence[int], int]], commit: bool = False
+    ) -> List[NFT]:
+        # (description, creator ids, file id) of each NFT. The NFTs are inserted in a single flush and their
+        # creators with a single executemany, so a whole batch costs a few round trips and one commit
+        creation_date = datetime.now()
+        nft_list: List[NFT] = []
+        for description, _, file_id in items:
+            nft_obj = NFT(owner_id=owner_id, description=description, file_id=file_id, creation_date=creation_date)
+            self.add_auditable_fields(nft_obj)
+            nft_list.append(nft_obj)
+
+        try:
+            self.session.add_all(nft_list)
+            self.session.flush()
+            creator_rows = [
+                {"nft_id": nft_obj.id, "creator_id": creator_id}
+                for nft_obj, (_, creators, _) in zip(nft_list, items)
+                for creator_id in creators
+            ]
+            if creator_rows:
+                self.session.execute(insert(NFTCreatorRel), creator_rows)
+            if commit:
+                self.session.commit()
+        except Exception as e:
+            raise InternalError(details=str(e))
+
+        return nft_list
+
     async def update(
         self,
         id: int,
@@ -87,4 +213,8 @@ class NFTRepository(BaseRepository):
 
         except Exception as e:
             raise InternalError(details="Error trying to update nft", exception=str(e))
+        finally:
+            # When not committing here the caller has to invalidate it again once it commits
+            fetch_cache.invalidate(id)
+
         return nft_obj
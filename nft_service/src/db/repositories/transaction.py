@@ -2,15 +2,26 @@ from nft_service.src.db.repositories.base import BaseRepository
 from nft_service.src.models.transaction import Transaction
 from nft_service.src.exceptions import InternalError
 from sqlmodel import select
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
 
 
 class TransactionRepository(BaseRepository):
-    async def get_all(self, offset: int, limit: int) -> List[Transaction]:
-        return self.session.exec(
-            select(Transaction).offset(offset).limit(limit).order_by(Transaction.creation_date.desc())
-        ).all()
+    DEFAULT_RELATIONS = ("buyer", "seller")
+
+    async def get_all(
+        self,
+        offset: int,
+        limit: int,
+        relations: Optional[Sequence[str]] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Transaction]:
+        sql_query = select(Transaction).options(
+            *self.relation_options(Transaction, relations), *self.column_options(Transaction, columns)
+        )
+        sql_query = self.paginate(sql_query, Transaction.creation_date, Transaction.id, offset, limit, cursor)
+        return self.session.exec(sql_query).all()
 
     async def create(
         self, nft_id: int, buyer_id: int, seller_id: int, price: float, commit: bool = False, **kwargs
@@ -3,12 +3,16 @@ from nft_service.src.models.user import User
 from nft_service.src.exceptions import NotFound
 from sqlalchemy.exc import NoResultFound
 from sqlmodel import select
-from typing import List
+from typing import Iterable, List, Optional, Tuple
+from datetime import datetime
 
 
 class UserRepository(BaseRepository):
-    async def get_all(self, offset: int, limit: int) -> List[User]:
-        return self.session.exec(select(User).offset(offset).limit(limit).order_by(User.date_.desc())).all()
+    async def get_all(self, offset: int, limit: int, cursor: Optional[Tuple[datetime, int]] = None) -> List[User]:
+        # Users registered the same day keep their registration (id) order
+        date_cursor = (cursor[0].date(), cursor[1]) if cursor else None
+        sql_query = self.paginate(select(User), User.date_, User.id, offset, limit, date_cursor, ids_descending=False)
+        return self.session.exec(sql_query).all()
 
     async def get_by_id(self, id: int) -> User:
         try:
@@ -31,3 +35,17 @@ class UserRepository(BaseRepository):
                 extra={"model": "User", "field": "username", "value": username},
                 exception=str(e),
             )
+
+    async def get_by_usernames(self, usernames: Iterable[str]) -> List[User]:
+        # A single "SELECT ... WHERE username IN (...)", unknown usernames are just missing from the result
+        usernames = set(usernames)
+        if not usernames:
+            return []
+        return self.session.exec(select(User).where(User.username.in_(usernames))).all()  # type: ignore
+
+    async def get_by_ids(self, ids: Iterable[int]) -> List[User]:
+        # Same as get_by_usernames, unknown ids are just missing from the result
+        ids = set(ids)
+        if not ids:
+            return []
+        return self.session.exec(select(User).where(User.id.in_(ids))).all()  # type: ignore
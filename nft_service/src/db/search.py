@@ -0,0 +1,135 @@
+from collections import Counter
+from math import log
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+from nft_service.src.models.nft import NFT
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+import re
+
+# Same as innodb_ft_min_token_size, shorter words are not indexed by MySQL either
+MIN_TOKEN_SIZE: int = 3
+INDEX_BUILD_BATCH_SIZE: int = 1000
+# Key in Session.info where the NFTs changed by the current transaction are kept until it ends,
+# description of each changed NFT or None if it was deleted
+_PENDING_CHANGES = "search_changes"
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r"\w+", text.lower()) if len(token) >= MIN_TOKEN_SIZE]
+
+
+class InvertedIndex:
+    """In memory full-text index over NFT descriptions.
+
+    Used to search when the database is not MySQL (embedded or test databases), where there is no
+    FULLTEXT index. Maps every token to the NFTs containing it and ranks them by tf-idf.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._documents: Dict[int, Counter] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, nft_id: int, description: str) -> None:
+        with self._lock:
+            self._remove(nft_id)
+            terms = Counter(tokenize(description))
+            self._documents[nft_id] = terms
+            for token, frequency in terms.items():
+                self._postings.setdefault(token, {})[nft_id] = frequency
+
+    def remove(self, nft_id: int) -> None:
+        with self._lock:
+            self._remove(nft_id)
+
+    def search(self, text: str) -> List[Tuple[float, int]]:
+        # (score, nft_id) of every matching NFT sorted by (score, id) descending, like the listings
+        scores: Dict[int, float] = {}
+        with self._lock:
+            total = len(self._documents)
+            for token in set(tokenize(text)):
+                postings = self._postings.get(token, {})
+                if not postings:
+                    continue
+                idf = log(1 + total / len(postings))
+                for nft_id, frequency in postings.items():
+                    scores[nft_id] = scores.get(nft_id, 0.0) + frequency * idf
+        return sorted(((score, nft_id) for nft_id, score in scores.items()), reverse=True)
+
+    def _remove(self, nft_id: int) -> None:
+        for token in self._documents.pop(nft_id, ()):
+            postings = self._postings[token]
+            del postings[nft_id]
+            if not postings:
+                del self._postings[token]
+
+
+# One index per database, built the first time it is searched
+_indexes: "WeakKeyDictionary[Engine, InvertedIndex]" = WeakKeyDictionary()
+_indexes_lock = Lock()
+
+
+def get_index(session: Session) -> InvertedIndex:
+    engine = session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = _indexes[engine] = _build_index(session)
+        return index
+
+
+def get_built_index(session: Session) -> Optional[InvertedIndex]:
+    # Index to keep up to date, if any was built for the database of the session
+    return _indexes.get(session.get_bind())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context: object) -> None:
+    changes: Dict[int, Optional[str]] = session.info.setdefault(_PENDING_CHANGES, {})
+    for obj in session.new:
+        if isinstance(obj, NFT):
+            changes[obj.id] = obj.description  # type: ignore[index]
+    for obj in session.dirty:
+        # Trades change the owner only, the description isn't even loaded then
+        if isinstance(obj, NFT) and inspect(obj).attrs.description.history.has_changes():
+            changes[obj.id] = obj.description  # type: ignore[index]
+    for obj in session.deleted:
+        if isinstance(obj, NFT):
+            changes[obj.id] = None  # type: ignore[index]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    # Only committed NFTs are searchable, an index built later reads them from the database anyway
+    changes: Optional[Dict[int, Optional[str]]] = session.info.pop(_PENDING_CHANGES, None)
+    if not changes:
+        return
+    index = get_built_index(session)
+    if index is None:
+        return
+    for nft_id, description in changes.items():
+        if description is None:
+            index.remove(nft_id)
+        else:
+            index.add(nft_id, description)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_CHANGES, None)
+
+
+def _build_index(session: Session) -> InvertedIndex:
+    index = InvertedIndex()
+    rows: Iterable[Tuple[int, str]] = session.exec(
+        select(NFT.id, NFT.description).execution_options(yield_per=INDEX_BUILD_BATCH_SIZE)
+    )
+    for nft_id, description in rows:
+        index.add(nft_id, description)
+    return index
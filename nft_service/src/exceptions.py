@@ -34,6 +34,18 @@ class BaseException(Exception):
         )
 
 
+class NotModified(BaseException):
+    def __init__(self, *args: Any, etag: Optional[str] = None, last_modified: Optional[str] = None, **kwargs: Any):
+        kwargs["status"] = 304
+
+        if "message" not in kwargs:
+            kwargs["message"] = "not_modified"
+
+        super().__init__(*args, **kwargs)
+        self.etag = etag
+        self.last_modified = last_modified
+
+
 class BadRequest(BaseException):
     def __init__(self, *args: Any, **kwargs: Any):
         kwargs["status"] = 400
@@ -84,6 +96,16 @@ class Conflict(BaseException):
         super().__init__(*args, **kwargs)
 
 
+class PayloadTooLarge(BaseException):
+    def __init__(self, *args: Any, **kwargs: Any):
+        kwargs["status"] = 413
+
+        if "message" not in kwargs:
+            kwargs["message"] = "payload_too_large"
+
+        super().__init__(*args, **kwargs)
+
+
 class InternalError(BaseException):
     def __init__(self, *args: Any, **kwargs: Any):
         kwargs["status"] = 500
@@ -92,3 +114,14 @@ class InternalError(BaseException):
             kwargs["message"] = "internal_error"
 
         super().__init__(*args, **kwargs)
+
+
+class ServiceUnavailable(BaseException):
+    def __init__(self, *args: Any, retry_after: Optional[int] = None, **kwargs: Any):
+        kwargs["status"] = 503
+
+        if "message" not in kwargs:
+            kwargs["message"] = "service_unavailable"
+
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
@@ -0,0 +1,160 @@
+from nft_service.src import config as cf
+from nft_service.src import storage
+from nft_service.src.exceptions import ServiceUnavailable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional, Tuple, TypeVar
+from loguru import logger
+from PIL import ExifTags, Image, ImageOps
+import asyncio
+import multiprocessing
+import os
+
+T = TypeVar("T")
+
+# Sources larger than this many times the result are box reduced first, see downscale
+REDUCE_RATIO: float = 3.0
+# The box reduce stops at this many times the result, the rest is resampled
+REDUCING_GAP: float = 2.0
+# Image.info entries needed to render the pixels, the rest of the metadata is not saved
+KEPT_INFO = ("transparency",)
+# Workers start from a fresh interpreter instead of a fork of the app, so they don't inherit its threads, event
+# loop or database connections
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class ImagePool:
+    """Worker processes decoding and resizing images.
+
+    Pillow keeps the GIL for most of a decode or a LANCZOS resize, so threads can't spread that work across
+    cores and a burst of mints slows down every other request of the worker. Jobs run in up to `workers`
+    processes instead (0 runs them in the file IO threads). At most `queue_size` jobs wait or run at a time,
+    further jobs are rejected instead of piling up, and jobs taking longer than `timeout` seconds fail and
+    their worker is killed.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        # func and args are sent to another process, so they must be picklable (module level functions)
+        if self._pending >= self.queue_size:
+            raise ServiceUnavailable(
+                details="Too many images being processed, try again later", retry_after=cf.IMAGE_RETRY_AFTER
+            )
+
+        self._pending += 1
+        executor: Optional[ProcessPoolExecutor] = None
+        try:
+            if self.workers == 0:
+                return await asyncio.wait_for(storage.run_io(func, *args), self.timeout)
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, partial(func, *args))
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Image job {func.__name__} timed out after {self.timeout}s")
+            # A running job can't be cancelled, its worker is killed and new jobs go to fresh workers
+            self._restart(executor)
+            raise TimeoutError(f"Image processing took longer than {self.timeout}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for using too much memory), the pool can't be used anymore
+            self._restart(executor)
+            raise
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use so that importing the app doesn't start processes
+        if self._executor is None:
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == "forkserver":
+                # Workers are forked from a server which already imported Pillow, so new ones start fast
+                context.set_forkserver_preload([__name__])
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+
+    def _restart(self, executor: Optional[ProcessPoolExecutor]) -> None:
+        # Jobs failing on a pool that was already replaced leave the current one alone
+        if executor is None or executor is not self._executor:
+            return
+        self._executor = None
+        # shutdown doesn't stop running jobs, so stuck workers are killed. The other jobs still running in the
+        # old pool fail with BrokenProcessPool
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_pool = ImagePool(cf.IMAGE_WORKERS, cf.IMAGE_QUEUE_SIZE, cf.IMAGE_JOB_TIMEOUT)
+
+
+def make_thumbnail(path: str, thumbnail_path: str, size: int) -> None:
+    # Write to a temporary name first so readers never see a partial thumbnail
+    # thumb-3cda3e6df79c9ee99f41.png >> thumb-3cda3e6df79c9ee99f41.tmp.png, keeps the extension Pillow saves by
+    root, extension = os.path.splitext(thumbnail_path)
+    tmp_path = f"{root}.tmp{extension}"
+    with Image.open(path) as img:
+        downscale(img, size).save(tmp_path)
+    os.replace(tmp_path, thumbnail_path)
+
+
+def make_variant(path: str, variant_path: str, size: Optional[int], image_format: str) -> None:
+    with Image.open(path) as img:
+        img = downscale(img, size)
+        if image_format == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        # Write to a temporary name first so readers never see a partial variant
+        tmp_path = variant_path + ".tmp"
+        img.save(tmp_path, format=image_format.upper())
+    os.replace(tmp_path, variant_path)
+
+
+def downscale(img: Image.Image, size: Optional[int]) -> Image.Image:
+    """Image fitting in size x size, upright and without metadata. None keeps the size.
+
+    `img` must not be loaded yet: JPEGs are then decoded straight at 1/2, 1/4 or 1/8 of their size (DCT
+    scaling), the smallest scale still larger than the result, instead of at full resolution. What is left
+    is resized with LANCZOS for small sources, while large ones are first shrunk with a cheap box reduce
+    and finished with BICUBIC, which looks the same at thumbnail sizes for a fraction of the work.
+    """
+    if size:
+        img.draft(None, fit_size(img.size, size))
+    # Metadata is dropped below, so the EXIF orientation has to be applied to the pixels first. Only when there
+    # is one, exif_transpose copies the whole image otherwise
+    if img.getexif().get(ExifTags.Base.Orientation, 1) != 1:
+        img = ImageOps.exif_transpose(img)
+
+    target = fit_size(img.size, size) if size else img.size
+    if target != img.size:
+        if max(img.size) > REDUCE_RATIO * max(target):
+            img = img.resize(target, Image.Resampling.BICUBIC, reducing_gap=REDUCING_GAP)
+        else:
+            img = img.resize(target, Image.Resampling.LANCZOS)
+
+    # EXIF (camera, location), ICC profiles, comments... only what the pixels need is kept
+    img.info = {key: value for key, value in img.info.items() if key in KEPT_INFO}
+    return img
+
+
+def fit_size(image_size: Tuple[int, int], size: int) -> Tuple[int, int]:
+    # (4000, 3000), 200 >> (200, 150). Keeps the aspect ratio and never upscales
+    width, height = image_size
+    if width <= size and height <= size:
+        return image_size
+    scale = size / max(width, height)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
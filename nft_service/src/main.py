@@ -1,7 +1,14 @@
 from nft_service.src.routers.routers import _setup_routers, _setup_handlers
-from nft_service.src.db.events import create_db_and_tables
+from nft_service.src.db.events import create_db_and_tables, engine
+from nft_service.src.imaging import image_pool
+from nft_service.src.services.nft_service import NFTService
+from nft_service.src.context import Context
+from nft_service.src import config as cf
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
+from loguru import logger
+from sqlmodel import Session
+import asyncio
 
 app = FastAPI(
     title="MB Challenge",
@@ -19,3 +26,21 @@ async def startup() -> None:
     create_db_and_tables()
     _setup_routers(app)
     _setup_handlers(app)
+    app.state.mint_job_recovery = asyncio.create_task(recover_mint_jobs())
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    app.state.mint_job_recovery.cancel()
+    image_pool.shutdown()
+
+
+async def recover_mint_jobs() -> None:
+    # At startup and then periodically, see NFTService.recover_mint_jobs
+    while True:
+        try:
+            with Session(engine) as session:
+                await NFTService(session, Context.default_context()).recover_mint_jobs()
+        except Exception:
+            logger.exception("Error recovering mint jobs")
+        await asyncio.sleep(cf.MINT_JOB_RECOVERY_INTERVAL)
@@ -4,10 +4,15 @@ from sqlmodel import Field
 from typing import Optional
 from datetime import datetime
 from sqlmodel import Relationship
+from sqlalchemy import Index
 
 
 class UserBalance(AuditableModel, table=True):
     __tablename__ = "user_balance"
+    __table_args__ = (
+        Index("ix_user_balance_creation_date_id", "creation_date", "id"),
+        Index("ix_user_balance_user_id_creation_date_id", "user_id", "creation_date", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     creation_date: datetime = Field()
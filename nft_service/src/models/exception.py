@@ -70,3 +70,10 @@ class ForbiddenError(BaseResponse):
 class InternalServerError(BaseResponse):
     class Config:
         schema_extra = {"examples": [{"error": "internal_server", "detail": "No se pudo procesar la solicitud"}]}
+
+
+class ServiceUnavailableError(BaseResponse):
+    class Config:
+        schema_extra = {
+            "examples": [{"error": "service_unavailable", "detail": "Too many images being processed, try again later"}]
+        }
@@ -0,0 +1,26 @@
+from nft_service.src.models.auditable import AuditableModel
+from sqlmodel import Field
+from sqlalchemy import JSON, Column, Index
+from typing import List, Optional
+
+
+class MintJob(AuditableModel, table=True):
+    """Mint accepted by the API and finished in the background (thumbnail and NFT creation)"""
+
+    __tablename__ = "mint_job"
+    __table_args__ = (
+        Index("ix_mint_job_hashed_name_status", "hashed_name", "status"),
+        # Unfinished jobs by age, see MintJobRepository.get_stale
+        Index("ix_mint_job_status_modified_at", "status", "modified_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(max_length=20)
+    owner_id: int = Field(foreign_key="user.id")
+    description: str = Field(max_length=500)
+    creators: List[int] = Field(default=[], sa_column=Column(JSON))
+    filename: str = Field()
+    hashed_name: str = Field()
+    digest: str = Field(max_length=64)
+    nft_id: Optional[int] = Field(default=None, foreign_key="nft.id")
+    error: Optional[str] = Field(default=None, max_length=500)
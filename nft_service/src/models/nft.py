@@ -1,11 +1,13 @@
 from nft_service.src.models.auditable import AuditableModel
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import DDL, Index, event
 from typing import Optional, List
 from datetime import datetime
 
 
 class NFTCreatorRel(SQLModel, table=True):
     __tablename__ = "nft_creator_rel"
+    __table_args__ = (Index("ix_nft_creator_rel_creator_id_nft_id", "creator_id", "nft_id"),)
 
     nft_id: int = Field(foreign_key="nft.id", primary_key=True)
     creator_id: int = Field(foreign_key="user.id", primary_key=True)
@@ -13,15 +15,22 @@ class NFTCreatorRel(SQLModel, table=True):
 
 class NFTFile(SQLModel, table=True):
     __tablename__ = "nft_file"
+    # Files with the same content share the stored one, its references are counted by hashed_name
+    __table_args__ = (Index("ix_nft_file_hashed_name", "hashed_name"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
     filename: str = Field()
     hashed_name: str = Field()
     thumbnail: str = Field()
+    digest: Optional[str] = Field(default=None, max_length=64)  # sha256 of the content, unknown for older files
 
 
 class NFT(AuditableModel, table=True):
     __tablename__ = "nft"
+    __table_args__ = (
+        Index("ix_nft_creation_date_id", "creation_date", "id"),
+        Index("ix_nft_owner_id_creation_date_id", "owner_id", "creation_date", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     creation_date: datetime = Field()
@@ -33,3 +42,11 @@ class NFT(AuditableModel, table=True):
     owner: "User" = Relationship(sa_relationship_kwargs=dict(foreign_keys="[NFT.owner_id]"))  # type: ignore # noqa:
     file: NFTFile = Relationship(sa_relationship_kwargs=dict(foreign_keys="[NFT.file_id]"))
     creators: List["User"] = Relationship(back_populates="nfts", link_model=NFTCreatorRel)  # type: ignore # noqa:
+
+
+# Full-text search over descriptions. Only MySQL has it, other databases use db.search.InvertedIndex
+event.listen(
+    NFT.__table__,  # type: ignore[attr-defined]
+    "after_create",
+    DDL("CREATE FULLTEXT INDEX ix_nft_description_fulltext ON nft (description)").execute_if(dialect="mysql"),
+)
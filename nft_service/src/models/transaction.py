@@ -1,12 +1,14 @@
 from nft_service.src.models.auditable import AuditableModel
 from nft_service.src.models.user import User
 from sqlmodel import Field, Relationship
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 
 
 class Transaction(AuditableModel, table=True):
     __tablename__ = "transaction"
+    __table_args__ = (Index("ix_transaction_creation_date_id", "creation_date", "id"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
     creation_date: datetime = Field()
@@ -1,6 +1,6 @@
 from nft_service.src.models.auditable import AuditableModel
 from sqlmodel import Field, Relationship
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 from typing import Optional, List
 from nft_service.src.models.nft import NFTCreatorRel, NFT
 from datetime import date
@@ -18,3 +18,7 @@ class User(AuditableModel, table=True):
 
 
 User.update_forward_refs(User=User)
+
+# Same directions as the listing (newest day first, registration order within the day), see
+# UserRepository.get_all, so that MySQL walks the index for keyset pages
+Index("ix_user_date_id", User.date_.desc(), User.id.asc())  # type: ignore[attr-defined, union-attr]
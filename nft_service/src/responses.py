@@ -0,0 +1,120 @@
+from nft_service.src import utils
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+from typing import Any, Optional, Tuple
+import anyio
+import os
+import re
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Returned by parse_range for ranges starting past the end of the file
+UNSATISFIABLE: Tuple[int, int] = (-1, -1)
+# ASGI extension of servers able to send a file straight from the kernel (sendfile)
+ZERO_COPY_EXTENSION = "http.response.zerocopysend"
+# Headers kept in 304 responses, the others describe the body that is not sent
+NOT_MODIFIED_HEADERS = (b"cache-control", b"content-location", b"date", b"etag", b"expires", b"vary")
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that also answers single byte Range requests with 206 Partial Content.
+
+    The file is handed to the server to send it with sendfile when it supports the zero copy ASGI extension,
+    otherwise it is read in chunks as FileResponse does. Requests with several ranges get the whole file,
+    as allowed by the HTTP spec. Conditional requests are answered with 304 Not Modified when the client
+    already has the file, and ranges are only sent if If-Range still matches it.
+    """
+
+    def __init__(self, path: str, range_header: Optional[str] = None, **kwargs: Any) -> None:
+        super().__init__(path, **kwargs)
+        self.range_header = range_header
+        self.headers["accept-ranges"] = "bytes"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stat_result = self.stat_result or await anyio.to_thread.run_sync(os.stat, self.path)
+        self.set_stat_headers(stat_result)
+        size = stat_result.st_size
+
+        request_headers = Headers(scope=scope)
+        range_header = self.range_header if self._range_applies(request_headers.get("if-range")) else None
+        byte_range = parse_range(range_header, size) if range_header else None
+        if self._is_not_modified(request_headers):
+            self.status_code = 304
+            self.raw_headers = [(name, value) for name, value in self.raw_headers if name in NOT_MODIFIED_HEADERS]
+            start, length = 0, 0
+        elif byte_range == UNSATISFIABLE:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            start, length = 0, 0
+        elif byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(length)
+        else:
+            start, length = 0, size
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif ZERO_COPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({"type": ZERO_COPY_EXTENSION, "file": file, "offset": start, "count": length})
+        else:
+            await self._send_chunks(send, start, length)
+
+        if self.background is not None:
+            await self.background()
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        super().set_stat_headers(stat_result)
+        # Starlette leaves the ETag unquoted, clients send it back quoted as the HTTP spec requires
+        etag = self.headers["etag"]
+        if not etag.startswith(('"', 'W/"')):
+            self.headers["etag"] = f'"{etag}"'
+
+    def _is_not_modified(self, request_headers: Headers) -> bool:
+        last_modified = utils.parse_http_date(self.headers["last-modified"])
+        return last_modified is not None and utils.is_not_modified(
+            self.headers["etag"],
+            last_modified,
+            request_headers.get("if-none-match"),
+            request_headers.get("if-modified-since"),
+        )
+
+    def _range_applies(self, if_range: Optional[str]) -> bool:
+        # If-Range holds the ETag or the date of the file the client has part of, otherwise the whole file is sent.
+        # Exact match only, weak ETags never match
+        return not if_range or if_range in (self.headers["etag"], self.headers["last-modified"])
+
+    async def _send_chunks(self, send: Send, start: int, length: int) -> None:
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                # A file truncated meanwhile ends the body early instead of looping forever
+                remaining = remaining - len(chunk) if chunk else 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    # First and last byte requested, "bytes=0-99" >> (0, 99), "bytes=100-" >> (100, size - 1) and
+    # "bytes=-100" >> the last 100 bytes. None when the header must be ignored (invalid or several ranges).
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        return (max(size - suffix, 0), size - 1) if suffix > 0 and size > 0 else UNSATISFIABLE
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return UNSATISFIABLE
+    return start, min(int(last), size - 1) if last else size - 1
@@ -1,29 +1,55 @@
 from nft_service.src.schemas.balance_schema import BalanceResponse
-from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.schemas.request_schema import CountMode, FieldsRequest, SearchRequest
 from nft_service.src.db.events import get_session
 from nft_service.src.services.balance_service import BalanceService
 from nft_service.src.context import Context
-from nft_service.src.models.exception import InternalServerError
-from typing import List
-from fastapi import APIRouter, Depends
+from nft_service.src.models.exception import BadRequestError, InternalServerError
+from nft_service.src.utils import set_next_cursor, set_total_count, sparse_response
+from typing import List, Optional, Union
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Response
 
 ENDPOINT: str = "/balance"
 router = APIRouter()
 
 
-@router.get("/", response_model=List[BalanceResponse], responses={"500": {"model": InternalServerError}})
-async def get_history(search_request: SearchRequest = Depends(), db: get_session = Depends()) -> List[BalanceResponse]:
+@router.get(
+    "/",
+    response_model=List[BalanceResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
+async def get_history(
+    http_response: Response,
+    background_tasks: BackgroundTasks,
+    search_request: SearchRequest = Depends(),
+    fields_request: FieldsRequest = Depends(),
+    count: Optional[CountMode] = Query(default=None, description="Send the total amount of rows in X-Total-Count"),
+    db: get_session = Depends(),
+) -> Union[List[BalanceResponse], Response]:
     context = Context.default_context
-    response: List[BalanceResponse] = await BalanceService(db, context).get_all_history(search_request)
-    return response
+    fields = fields_request.selected(BalanceResponse)
+    response: List[BalanceResponse] = await BalanceService(db, context).get_all_history(search_request, fields)
+    set_next_cursor(http_response, response, search_request.limit)
+    if count:
+        set_total_count(http_response, BalanceService(db, context).count(count, background_tasks))
+    return sparse_response(http_response, response, fields)
 
 
-@router.get("/{user_id}", response_model=List[BalanceResponse], responses={"500": {"model": InternalServerError}})
+@router.get(
+    "/{user_id}",
+    response_model=List[BalanceResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
 async def get_user_history(
-    user_id: int, search_request: SearchRequest = Depends(), db: get_session = Depends()
-) -> List[BalanceResponse]:
+    user_id: int,
+    http_response: Response,
+    search_request: SearchRequest = Depends(),
+    fields_request: FieldsRequest = Depends(),
+    db: get_session = Depends(),
+) -> Union[List[BalanceResponse], Response]:
     context = Context.default_context
+    fields = fields_request.selected(BalanceResponse)
     response: List[BalanceResponse] = await BalanceService(db, context).get_all_history_for_user(
-        user_id, search_request
+        user_id, search_request, fields
     )
-    return response
+    set_next_cursor(http_response, response, search_request.limit)
+    return sparse_response(http_response, response, fields)
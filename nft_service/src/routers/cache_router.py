@@ -0,0 +1,13 @@
+from nft_service.src.schemas.cache_schema import CacheStatsResponse
+from nft_service.src.models.exception import InternalServerError
+from nft_service.src.cache import all_caches
+from typing import List
+from fastapi import APIRouter
+
+ENDPOINT: str = "/cache"
+router = APIRouter()
+
+
+@router.get("/", response_model=List[CacheStatsResponse], responses={"500": {"model": InternalServerError}})
+async def get_stats() -> List[CacheStatsResponse]:
+    return [CacheStatsResponse(**cache.stats()) for cache in all_caches()]
@@ -1,49 +1,264 @@
-from nft_service.src.schemas.nft_schema import NFTRequest, NFTResponse, NFTFetchResponse
+from nft_service.src.schemas.nft_schema import (
+    NFTRequest,
+    NFTResponse,
+    NFTFetchResponse,
+    NFTBatchItemResponse,
+    NFTBulkMintItemResponse,
+    NFTBulkMintRequest,
+    NFTSearchResponse,
+    NFTFilterRequest,
+    ImageFormat,
+    FileMode,
+    MintJobResponse,
+    ThumbnailMode,
+)
 from nft_service.src.schemas.transaction_schema import TransactionRequest, TransactionResponse
-from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.schemas.request_schema import CountMode, FieldsRequest, SearchRequest
 from nft_service.src.db.events import get_session
 from nft_service.src.services.nft_service import NFTService
 from nft_service.src.context import Context
-from nft_service.src.models.exception import BadRequestError, InternalServerError, NotFoundError
+from nft_service.src.models.exception import (
+    BadRequestError,
+    InternalServerError,
+    NotFoundError,
+    ServiceUnavailableError,
+)
 from nft_service.src.exceptions import BadRequest
-from nft_service.src.utils import valid_content_length
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, Form
+from nft_service.src.responses import RangeFileResponse
+from nft_service.src import config as cf
+from nft_service.src.utils import (
+    valid_content_length,
+    max_body_bytes,
+    BoundedBodyRoute,
+    set_next_cursor,
+    set_cache_validators,
+    set_total_count,
+    sparse_response,
+)
+from typing import List, Optional, Union
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, Form, Header, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 ENDPOINT: str = "/nft"
-router = APIRouter()
+router = APIRouter(route_class=BoundedBodyRoute)
+
+
+@router.get(
+    "/",
+    response_model=List[NFTResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
+async def get_all(
+    http_response: Response,
+    background_tasks: BackgroundTasks,
+    search_request: SearchRequest = Depends(),
+    thumbnail_mode: ThumbnailMode = Query(
+        default=ThumbnailMode.INLINE, description="Return thumbnails inline as base64 or as a url to download them"
+    ),
+    fields_request: FieldsRequest = Depends(),
+    filters: NFTFilterRequest = Depends(),
+    count: Optional[CountMode] = Query(default=None, description="Send the total amount of rows in X-Total-Count"),
+    db: get_session = Depends(),
+) -> Union[List[NFTResponse], Response]:
+    context = Context.default_context
+    fields = fields_request.selected(NFTResponse)
+    response: List[NFTResponse] = await NFTService(db, context).get_all(
+        search_request, thumbnail_mode, fields, filters
+    )
+    set_next_cursor(http_response, response, search_request.limit)
+    # Totals are kept for the whole table only
+    if count and not (filters.owner or filters.creator):
+        set_total_count(http_response, NFTService(db, context).count(count, background_tasks))
+    return sparse_response(http_response, response, fields)
+
+
+@router.get(
+    "/search",
+    response_model=List[NFTSearchResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
+async def search(
+    http_response: Response,
+    q: str = Query(min_length=1, max_length=200, description="Text to look for in the NFT descriptions"),
+    search_request: SearchRequest = Depends(),
+    thumbnail_mode: ThumbnailMode = Query(
+        default=ThumbnailMode.INLINE, description="Return thumbnails inline as base64 or as a url to download them"
+    ),
+    db: get_session = Depends(),
+) -> List[NFTSearchResponse]:
+    context = Context.default_context
+    response: List[NFTSearchResponse] = await NFTService(db, context).search(q, search_request, thumbnail_mode)
+    # Results are sorted by relevance, so pages continue from the score of the last one
+    set_next_cursor(http_response, response, search_request.limit, sort_field="score")
+    return response
+
 
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        "200": {"content": {"application/x-ndjson": {}}, "description": "One NFT per line"},
+        "500": {"model": InternalServerError},
+    },
+)
+async def export(db: get_session = Depends()) -> StreamingResponse:
+    context = Context.default_context
+    return StreamingResponse(NFTService(db, context).export(), media_type="application/x-ndjson")
 
-@router.get("/", response_model=List[NFTResponse], responses={"500": {"model": InternalServerError}})
-async def get_all(search_request: SearchRequest = Depends(), db: get_session = Depends()) -> List[NFTResponse]:
+
+@router.get(
+    "/batch",
+    response_model=List[NFTBatchItemResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
+async def fetch_many(
+    ids: List[int] = Query(description="Ids of the NFTs to fetch, results are returned in the same order"),
+    db: get_session = Depends(),
+) -> List[NFTBatchItemResponse]:
     context = Context.default_context
-    response: List[NFTResponse] = await NFTService(db, context).get_all(search_request)
+    response: List[NFTBatchItemResponse] = await NFTService(db, context).fetch_many(ids)
     return response
 
 
+@router.get(
+    "/thumbnail/{thumbnail}",
+    response_class=RangeFileResponse,
+    responses={"404": {"model": NotFoundError}, "500": {"model": InternalServerError}},
+)
+async def get_thumbnail(
+    thumbnail: str,
+    range_header: Optional[str] = Header(default=None, alias="range"),
+    db: get_session = Depends(),
+) -> RangeFileResponse:
+    context = Context.default_context
+    path: str = await NFTService(db, context).thumbnail_path(thumbnail)
+    return RangeFileResponse(
+        path,
+        range_header=range_header,
+        headers={"Cache-Control": f"public, max-age={cf.THUMBNAIL_MAX_AGE}, immutable"},
+    )
+
+
+@router.get(
+    "/file/{name}",
+    response_class=RangeFileResponse,
+    responses={
+        "200": {"content": {"image/*": {}}, "description": "Original NFT file"},
+        "206": {"description": "Partial Content"},
+        "404": {"model": NotFoundError},
+        "416": {"description": "Range Not Satisfiable"},
+        "500": {"model": InternalServerError},
+    },
+)
+async def get_file(
+    name: str,
+    range_header: Optional[str] = Header(default=None, alias="range"),
+    db: get_session = Depends(),
+) -> RangeFileResponse:
+    context = Context.default_context
+    path, media_format = await NFTService(db, context).file_path(name)
+    # Stored files are named after their content, so they never change
+    return RangeFileResponse(
+        path,
+        range_header=range_header,
+        media_type=f"image/{media_format}",
+        headers={"Cache-Control": f"public, max-age={cf.THUMBNAIL_MAX_AGE}, immutable"},
+    )
+
+
 @router.get(
     "/{nft_id}",
     response_model=NFTFetchResponse,
-    responses={"404": {"model": NotFoundError}, "500": {"model": InternalServerError}},
+    responses={
+        "304": {"description": "Not Modified"},
+        "404": {"model": NotFoundError},
+        "500": {"model": InternalServerError},
+    },
 )
-async def fetch(nft_id: int, db: get_session = Depends()) -> NFTFetchResponse:
+async def fetch(
+    nft_id: int,
+    stream: bool = Query(default=False, description="Stream the response encoding the file while it is read"),
+    file_mode: FileMode = Query(
+        default=FileMode.INLINE, description="Return the file inline (base64) or as a reference (url)"
+    ),
+    if_none_match: Optional[str] = Header(default=None),
+    if_modified_since: Optional[str] = Header(default=None),
+    db: get_session = Depends(),
+) -> Response:
     context = Context.default_context
-    response: NFTFetchResponse = await NFTService(db, context).fetch(nft_id)
+    if file_mode == FileMode.REFERENCE:
+        # Small enough without the file to be built on every request
+        reference = await NFTService(db, context).fetch(nft_id, if_none_match, if_modified_since, file_mode)
+        response = Response(reference.json(), media_type="application/json")
+        set_cache_validators(response, reference.etag, reference.last_modified)
+        return response
+
+    if stream:
+        envelope, body = await NFTService(db, context).fetch_stream(nft_id, if_none_match, if_modified_since)
+        streaming_response = StreamingResponse(body, media_type="application/json")
+        set_cache_validators(streaming_response, envelope.etag, envelope.last_modified)
+        return streaming_response
+
+    cached = await NFTService(db, context).fetch_cached(nft_id, if_none_match, if_modified_since)
+    # Already serialized, so it is sent as is instead of going through the response model again
+    response = Response(cached.body, media_type="application/json")
+    set_cache_validators(response, cached.etag, cached.last_modified)
     return response
 
 
+@router.get(
+    "/{nft_id}/image",
+    response_class=RangeFileResponse,
+    responses={
+        "200": {"content": {"image/*": {}}, "description": "NFT image"},
+        "400": {"model": BadRequestError},
+        "404": {"model": NotFoundError},
+        "500": {"model": InternalServerError},
+    },
+)
+async def get_image(
+    nft_id: int,
+    size: Optional[int] = Query(default=None, description=f"Longest side, one of {list(cf.IMAGE_VARIANT_SIZES)}"),
+    image_format: Optional[ImageFormat] = Query(
+        default=None, alias="format", description="Negotiated from the Accept header when missing"
+    ),
+    accept: Optional[str] = Header(default=None),
+    range_header: Optional[str] = Header(default=None, alias="range"),
+    db: get_session = Depends(),
+) -> RangeFileResponse:
+    context = Context.default_context
+    path, media_format = await NFTService(db, context).image_variant(nft_id, size, image_format, accept)
+    headers = {"Cache-Control": f"public, max-age={cf.THUMBNAIL_MAX_AGE}, immutable"}
+    if image_format is None:
+        headers["Vary"] = "Accept"
+    return RangeFileResponse(path, range_header=range_header, media_type=f"image/{media_format}", headers=headers)
+
+
 @router.post(
     "/mint/",
     response_model=NFTFetchResponse,
-    responses={400: {"model": BadRequestError}, 500: {"model": InternalServerError}},
+    responses={
+        202: {"model": MintJobResponse, "description": "Mint accepted, finished in the background"},
+        400: {"model": BadRequestError},
+        500: {"model": InternalServerError},
+        503: {"model": ServiceUnavailableError},
+    },
 )
 async def mint_nft(
     file: UploadFile,
-    file_size: int = Depends(valid_content_length),
+    background_tasks: BackgroundTasks,
+    file_size: Optional[int] = Depends(valid_content_length),
     description: str = Form(),
     creators: List[str] = Form(default=[], description="List of co-creators username"),
+    file_mode: FileMode = Query(
+        default=FileMode.INLINE, description="Return the file inline (base64) or as a reference (url)"
+    ),
+    background: bool = Query(
+        default=False, description="Answer 202 with a job once the file is stored and create the NFT afterwards"
+    ),
     db: get_session = Depends(),
-) -> NFTFetchResponse:
+) -> Union[NFTFetchResponse, ORJSONResponse]:
     context = Context.default_context()
 
     # Only accept jpeg and png images for simplicity
@@ -51,7 +266,50 @@ async def mint_nft(
         raise BadRequest(details="File extension not allowed")
 
     request = NFTRequest(description=description, creators=creators)
-    response = await NFTService(db, context).add(request, file)
+    if background:
+        job = await NFTService(db, context).add_in_background(request, file, background_tasks)
+        return ORJSONResponse(
+            jsonable_encoder(job), status_code=status.HTTP_202_ACCEPTED, headers={"Location": job.url}
+        )
+
+    response = await NFTService(db, context).add(request, file, file_mode)
+    return response
+
+
+@router.post(
+    "/mint/bulk/",
+    response_model=List[NFTBulkMintItemResponse],
+    responses={400: {"model": BadRequestError}, 500: {"model": InternalServerError}},
+)
+@max_body_bytes(cf.MAX_UPLOAD_BYTES * cf.BULK_MINT_MAX_FILES + cf.MULTIPART_OVERHEAD_BYTES)
+async def mint_bulk(
+    files: List[UploadFile],
+    metadata: str = Form(
+        description='JSON with the description and creators of each file, in the same order. '
+        'E.g. {"items": [{"description": "...", "creators": ["..."]}]}'
+    ),
+    db: get_session = Depends(),
+) -> List[NFTBulkMintItemResponse]:
+    context = Context.default_context()
+
+    # Only accept jpeg and png images for simplicity
+    for file in files:
+        if file.content_type not in ["image/jpeg", "image/png"]:
+            raise BadRequest(details=f"File extension not allowed: {file.filename}")
+
+    request = NFTBulkMintRequest.parse_raw(metadata)
+    response = await NFTService(db, context).add_many(request.items, files)
+    return response
+
+
+@router.get(
+    "/mint/jobs/{job_id}",
+    response_model=MintJobResponse,
+    responses={"404": {"model": NotFoundError}, "500": {"model": InternalServerError}},
+)
+async def get_mint_job(job_id: int, db: get_session = Depends()) -> MintJobResponse:
+    context = Context.default_context()
+    response = await NFTService(db, context).mint_job(job_id)
     return response
 
 
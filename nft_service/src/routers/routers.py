@@ -1,6 +1,14 @@
-from nft_service.src.exceptions import BadRequest, Conflict, NotFound, InternalError
-from nft_service.src.routers import nft_router, balance_router, user_router, transaction_router
-from fastapi.responses import ORJSONResponse
+from nft_service.src.exceptions import (
+    BadRequest,
+    Conflict,
+    NotFound,
+    NotModified,
+    InternalError,
+    PayloadTooLarge,
+    ServiceUnavailable,
+)
+from nft_service.src.routers import nft_router, balance_router, user_router, transaction_router, cache_router
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 from fastapi.exception_handlers import request_validation_exception_handler
@@ -14,6 +22,7 @@ def _setup_routers(app: FastAPI) -> None:
     app.include_router(balance_router.router, prefix=balance_router.ENDPOINT, tags=["Use Balance"])
     app.include_router(user_router.router, prefix=user_router.ENDPOINT, tags=["User"])
     app.include_router(transaction_router.router, prefix=transaction_router.ENDPOINT, tags=["Transaction"])
+    app.include_router(cache_router.router, prefix=cache_router.ENDPOINT, tags=["Cache"])
 
 
 def _setup_handlers(app: FastAPI) -> None:
@@ -29,6 +38,13 @@ def _setup_handlers(app: FastAPI) -> None:
 
         return ORJSONResponse(status_code=exc.status, content=content)
 
+    @app.exception_handler(NotModified)
+    async def handle_not_modified(request: Request, exc: NotModified) -> Response:  # pylint: disable=unused-argument
+        headers = {"ETag": exc.etag} if exc.etag else {}
+        if exc.last_modified:
+            headers["Last-Modified"] = exc.last_modified
+        return Response(status_code=exc.status, headers=headers)
+
     @app.exception_handler(ValidationError)
     @app.exception_handler(RequestValidationError)
     async def handle_validation_error(request: Request, exc: RequestValidationError) -> ORJSONResponse:
@@ -38,6 +54,7 @@ def _setup_handlers(app: FastAPI) -> None:
         return await request_validation_exception_handler(request, exc)
 
     @app.exception_handler(BadRequest)
+    @app.exception_handler(PayloadTooLarge)
     async def handle_bad_request_exception(
         request: Request,
         exc: Union[Conflict, NotFound],  # pylint: disable=unused-argument
@@ -55,6 +72,16 @@ def _setup_handlers(app: FastAPI) -> None:
         content: dict[str, Any] = dict(status_code=exc.status, error=exc.message, detail=exc.details)
         return ORJSONResponse(status_code=exc.status, content=content)
 
+    @app.exception_handler(ServiceUnavailable)
+    async def handle_service_unavailable_exception(
+        request: Request,
+        exc: ServiceUnavailable,  # pylint: disable=unused-argument
+    ) -> ORJSONResponse:
+        logger.error("status={} error={} details={}", exc.status, exc.message, exc.details)
+        content: dict[str, Any] = dict(status_code=exc.status, error=exc.message, detail=exc.details)
+        headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+        return ORJSONResponse(status_code=exc.status, content=content, headers=headers)
+
     @app.exception_handler(Exception)
     async def handle_exception(request: Request, exc: Exception) -> ORJSONResponse:  # pylint: disable=unused-argument
         """Return a custom message and status code"""
@@ -1,20 +1,34 @@
 from nft_service.src.schemas.transaction_schema import TransactionResponse
-from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.schemas.request_schema import CountMode, FieldsRequest, SearchRequest
 from nft_service.src.db.events import get_session
 from nft_service.src.services.transaction_service import TransactionService
 from nft_service.src.context import Context
-from nft_service.src.models.exception import InternalServerError
-from typing import List
-from fastapi import APIRouter, Depends
+from nft_service.src.models.exception import BadRequestError, InternalServerError
+from nft_service.src.utils import set_next_cursor, set_total_count, sparse_response
+from typing import List, Optional, Union
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Response
 
 ENDPOINT: str = "/transaction"
 router = APIRouter()
 
 
-@router.get("/", response_model=List[TransactionResponse], responses={"500": {"model": InternalServerError}})
+@router.get(
+    "/",
+    response_model=List[TransactionResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
 async def get_history(
-    search_request: SearchRequest = Depends(), db: get_session = Depends()
-) -> List[TransactionResponse]:
+    http_response: Response,
+    background_tasks: BackgroundTasks,
+    search_request: SearchRequest = Depends(),
+    fields_request: FieldsRequest = Depends(),
+    count: Optional[CountMode] = Query(default=None, description="Send the total amount of rows in X-Total-Count"),
+    db: get_session = Depends(),
+) -> Union[List[TransactionResponse], Response]:
     context = Context.default_context
-    response: List[TransactionResponse] = await TransactionService(db, context).get_all(search_request)
-    return response
+    fields = fields_request.selected(TransactionResponse)
+    response: List[TransactionResponse] = await TransactionService(db, context).get_all(search_request, fields)
+    set_next_cursor(http_response, response, search_request.limit)
+    if count:
+        set_total_count(http_response, TransactionService(db, context).count(count, background_tasks))
+    return sparse_response(http_response, response, fields)
@@ -3,18 +3,26 @@ from nft_service.src.schemas.request_schema import SearchRequest
 from nft_service.src.db.events import get_session
 from nft_service.src.services.user_service import UserService
 from nft_service.src.context import Context
-from nft_service.src.models.exception import NotFoundError, InternalServerError
+from nft_service.src.models.exception import BadRequestError, NotFoundError, InternalServerError
+from nft_service.src.utils import set_next_cursor
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 
 ENDPOINT: str = "/user"
 router = APIRouter()
 
 
-@router.get("/", response_model=List[UserResponse], responses={"500": {"model": InternalServerError}})
-async def get_all(search_request: SearchRequest = Depends(), db: get_session = Depends()) -> List[UserResponse]:
+@router.get(
+    "/",
+    response_model=List[UserResponse],
+    responses={"400": {"model": BadRequestError}, "500": {"model": InternalServerError}},
+)
+async def get_all(
+    http_response: Response, search_request: SearchRequest = Depends(), db: get_session = Depends()
+) -> List[UserResponse]:
     context = Context.default_context
     response: List[UserResponse] = await UserService(db, context).get_all(search_request)
+    set_next_cursor(http_response, response, search_request.limit, sort_field="date_")
     return response
 
 
@@ -8,6 +8,7 @@ from typing import Optional
 class BalanceResponse(BaseModel):
     """Balance Response Schema"""
 
+    id: Optional[int] = Field(default=None)
     creation_date: datetime = Field()
     user: UserResponse = Field()
     transaction_id: Optional[int] = Field(default=0, description="Id of the transaction asociated")
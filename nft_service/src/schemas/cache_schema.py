@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+
+
+class CacheStatsResponse(BaseModel):
+    """Cache Stats Response Schema"""
+
+    name: str = Field()
+    entries: int = Field(description="Amount of values currently cached")
+    size_bytes: int = Field(description="Memory used by the cached values")
+    max_bytes: int = Field(description="Memory budget of the cache")
+    hits: int = Field()
+    misses: int = Field()
+    evictions: int = Field(description="Values removed to make room for new ones")
+    hit_ratio: float = Field(ge=0, le=1)
@@ -1,22 +1,67 @@
 from nft_service.src import utils
 from nft_service.src.schemas.user_schema import UserResponse
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Optional, List
 from datetime import datetime
+from enum import Enum
+
+
+class ThumbnailMode(str, Enum):
+    """How thumbnails are returned in NFT lists"""
+
+    INLINE = "inline"  # base64 content inside the response
+    REFERENCE = "ref"  # url to download it plus a hash of its content
+
+
+class FileMode(str, Enum):
+    """How the NFT file is returned by fetch and mint"""
+
+    INLINE = "inline"  # base64 content inside the response
+    REFERENCE = "ref"  # url to download the raw file
+
+
+class MintJobStatus(str, Enum):
+    """Stage of a mint finished in the background"""
+
+    PENDING = "pending"  # file stored, waiting for a worker
+    RUNNING = "running"  # thumbnail and NFT being created
+    DONE = "done"  # NFT created
+    FAILED = "failed"  # nothing was created, see the error
+
+
+class ImageFormat(str, Enum):
+    """Formats NFT images can be requested in"""
+
+    JPEG = "jpeg"
+    PNG = "png"
+    WEBP = "webp"
+
+
+class NFTFilterRequest(BaseModel):
+    """NFT List Filters Schema"""
+
+    owner: Optional[str] = Field(default=None, description="Username of the owner of the NFTs")
+    creator: Optional[str] = Field(default=None, description="Username of one of the creators of the NFTs")
+
+    def __init__(self, owner: Optional[str] = None, creator: Optional[str] = None):
+        super().__init__(owner=owner, creator=creator)
 
 
 class NFTThumbnailResponse(BaseModel):
     """NFT File Thumbnail Response Schema"""
 
     filename: str = Field()
-    thumbnail: str = Field(description="base64 representation of the file thumbnail")
+    thumbnail: Optional[str] = Field(default=None, description="base64 representation of the file thumbnail")
+    url: Optional[str] = Field(default=None, description="Url to download the thumbnail (ref mode)")
+    hash: Optional[str] = Field(default=None, description="sha256 of the thumbnail content (ref mode)")
 
 
 class NFTFileResponse(BaseModel):
     """NFT File Response Schema"""
 
     filename: str = Field()
-    file: str = Field(description="base64 representation of the file")
+    file: Optional[str] = Field(default=None, description="base64 representation of the file")
+    url: Optional[str] = Field(default=None, description="Url to download the raw file (ref mode)")
 
 
 class NFTRequest(BaseModel):
@@ -26,6 +71,12 @@ class NFTRequest(BaseModel):
     creators: Optional[List[str]] = Field(description="List of creators of the NFT")
 
 
+class NFTBulkMintRequest(BaseModel):
+    """NFT Bulk Mint Request Schema"""
+
+    items: List[NFTRequest] = Field(description="Description and creators of each file, in the same order")
+
+
 class NFTResponse(BaseModel):
     """NFT Response Schema"""
 
@@ -40,6 +91,12 @@ class NFTResponse(BaseModel):
         json_encoders = {datetime: utils.format_datetime}
 
 
+class NFTSearchResponse(NFTResponse):
+    """NFT Search Response Schema"""
+
+    score: float = Field(description="Relevance of the NFT for the searched text, higher first")
+
+
 class NFTFetchResponse(BaseModel):
     """NFT Fetch Response Schema"""
 
@@ -50,5 +107,51 @@ class NFTFetchResponse(BaseModel):
     creators: List[UserResponse] = Field(default=[], description="List of creators of the NFT")
     file: NFTFileResponse = Field(description="NFT file")
 
+    # HTTP cache validators, sent as headers instead of in the body
+    _etag: Optional[str] = PrivateAttr(default=None)
+    _last_modified: Optional[datetime] = PrivateAttr(default=None)
+
     class Config:
         json_encoders = {datetime: utils.format_datetime}
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self._etag
+
+    @property
+    def last_modified(self) -> Optional[datetime]:
+        return self._last_modified
+
+    def set_validators(self, etag: str, last_modified: datetime) -> None:
+        self._etag = etag
+        self._last_modified = last_modified
+
+
+class NFTBatchItemResponse(BaseModel):
+    """NFT Batch Item Response Schema"""
+
+    id: int = Field(description="Requested id")
+    found: bool = Field(description="False when there is no NFT with the requested id")
+    nft: Optional[NFTFetchResponse] = Field(default=None, description="The NFT when found")
+
+
+class MintJobResponse(BaseModel):
+    """Mint Job Response Schema"""
+
+    id: int = Field()
+    status: MintJobStatus = Field()
+    nft_id: Optional[int] = Field(default=None, description="Minted NFT once the job is done")
+    error: Optional[str] = Field(default=None, description="Why the mint failed")
+    created_at: datetime = Field()
+    modified_at: datetime = Field()
+    url: str = Field(description="Url to poll the status of the job")
+
+
+class NFTBulkMintItemResponse(BaseModel):
+    """NFT Bulk Mint Item Response Schema"""
+
+    index: int = Field(description="Position of the file in the request")
+    filename: str = Field()
+    created: bool = Field(description="False when the NFT could not be minted, see the error")
+    nft_id: Optional[int] = Field(default=None)
+    error: Optional[str] = Field(default=None)
@@ -1,4 +1,15 @@
+from nft_service.src import utils
 from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional, Set, Tuple, Type
+from enum import Enum
+
+
+class CountMode(str, Enum):
+    """How the total count of a listing is obtained"""
+
+    APPROXIMATE = "approximate"  # from the table statistics kept by the db, may be off by a few percent
+    EXACT = "exact"  # from counters kept up to date by the service and recounted in the background
 
 
 class SearchRequest(BaseModel):
@@ -6,10 +17,34 @@ class SearchRequest(BaseModel):
 
     offset: int = Field(default=0, ge=0)
     limit: int = Field(default=50, ge=0, lte=50)
+    cursor: Optional[str] = Field(
+        default=None, description="Opaque cursor returned by the previous page. When present offset is ignored"
+    )
 
     def __init__(
         self,
         offset: int = 0,
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ):
-        super().__init__(offset=offset, limit=limit)
+        super().__init__(offset=offset, limit=limit, cursor=cursor)
+
+    def decode_cursor(self) -> Optional[Tuple[datetime, int]]:
+        return utils.decode_cursor(self.cursor) if self.cursor else None
+
+    def decode_score_cursor(self) -> Optional[Tuple[float, int]]:
+        return utils.decode_cursor(self.cursor, float) if self.cursor else None
+
+
+class FieldsRequest(BaseModel):
+    """Schema to support sparse fieldsets"""
+
+    fields: Optional[str] = Field(
+        default=None, description="Comma separated list of the fields to return. All of them when missing"
+    )
+
+    def __init__(self, fields: Optional[str] = None):
+        super().__init__(fields=fields)
+
+    def selected(self, schema: Type[BaseModel]) -> Optional[Set[str]]:
+        return utils.parse_fields(self.fields, schema.__fields__) if self.fields else None
@@ -1,5 +1,6 @@
 from nft_service.src.schemas.balance_schema import BalanceResponse
-from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.schemas.user_schema import UserResponse
+from nft_service.src.schemas.request_schema import CountMode, SearchRequest
 from nft_service.src.services.base_service import BaseService
 from nft_service.src.models.balance import UserBalance
 from nft_service.src.exceptions import BadRequest
@@ -10,10 +11,14 @@ from nft_service.src.context import Context
 from nft_service.src.db.repositories.balance import BalanceRepository
 from nft_service.src.exceptions import InternalError
 from sqlmodel import Session
-from typing import List
+from fastapi import BackgroundTasks
+from typing import List, Optional, Set
 
 
 class BalanceService(BaseService):
+    # Columns each response field is built from, see select_plan
+    FIELD_COLUMNS = {"user": ("user_id",)}
+
     def __init__(self, session: Session, context: Context):
         super().__init__(session, context)
         self.balance_repo = BalanceRepository(session, context)
@@ -42,24 +47,56 @@ class BalanceService(BaseService):
             self.db.rollback()
             raise e
 
-    async def get_all_history(self, search_request: SearchRequest) -> List[BalanceResponse]:
+    async def get_all_history(
+        self, search_request: SearchRequest, fields: Optional[Set[str]] = None
+    ) -> List[BalanceResponse]:
+        cursor = search_request.decode_cursor()
+        relations, columns = self.select_plan(fields, BalanceRepository.DEFAULT_RELATIONS, self.FIELD_COLUMNS)
         try:
-            balance_rows = await self.balance_repo.get_all(search_request.offset, search_request.limit)
-            return [BalanceResponse(**balance_row.dict(), user=balance_row.user) for balance_row in balance_rows]
+            balance_rows = await self.balance_repo.get_all(
+                search_request.offset, search_request.limit, relations=relations, cursor=cursor, columns=columns
+            )
+            return [self._balance_response(balance_row, fields) for balance_row in balance_rows]
         except Exception as e:
             raise InternalError(detail="Error retrieving historic balance", exception=str(e))
 
-    async def get_all_history_for_user(self, user_id: int, search_request: SearchRequest) -> List[BalanceResponse]:
+    def count(self, mode: CountMode, background_tasks: BackgroundTasks) -> Optional[int]:
+        return self.total_count(UserBalance, mode, background_tasks)
+
+    async def get_all_history_for_user(
+        self, user_id: int, search_request: SearchRequest, fields: Optional[Set[str]] = None
+    ) -> List[BalanceResponse]:
+        cursor = search_request.decode_cursor()
+        relations, columns = self.select_plan(fields, BalanceRepository.DEFAULT_RELATIONS, self.FIELD_COLUMNS)
         try:
-            balance_rows = await self.balance_repo.get_by_user_id(user_id, search_request.offset, search_request.limit)
-            return [BalanceResponse(**balance_row.dict(), user=balance_row.user) for balance_row in balance_rows]
+            balance_rows = await self.balance_repo.get_by_user_id(
+                user_id,
+                search_request.offset,
+                search_request.limit,
+                relations=relations,
+                cursor=cursor,
+                columns=columns,
+            )
+            return [self._balance_response(balance_row, fields) for balance_row in balance_rows]
         except Exception as e:
             raise InternalError(detail="Error retrieving user historic balance", exception=str(e))
 
+    def _balance_response(self, balance_row: UserBalance, fields: Optional[Set[str]]) -> BalanceResponse:
+        return self.project(
+            BalanceResponse,
+            fields,
+            id=lambda: balance_row.id,
+            creation_date=lambda: balance_row.creation_date,
+            user=lambda: UserResponse(**balance_row.user.dict()),
+            transaction_id=lambda: balance_row.transaction_id,
+            initial_amount=lambda: balance_row.initial_amount,
+            final_amount=lambda: balance_row.final_amount,
+        )
+
     async def _generate_balance_movement(
         self, transaction_id: int, user_id: int, amount_operated: float, is_buy: bool, commit: int
     ) -> UserBalance:
-        user_balance_rows: List[UserBalance] = await self.balance_repo.get_by_user_id(user_id)
+        user_balance_rows: List[UserBalance] = await self.balance_repo.get_by_user_id(user_id, relations=())
 
         last_balance: UserBalance = user_balance_rows[-1]
 
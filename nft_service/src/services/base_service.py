@@ -1,6 +1,16 @@
 from nft_service.src.models.auditable import AuditableModel
 from nft_service.src.context import Context
-from sqlmodel import Session
+from nft_service.src.db import counts
+from nft_service.src.schemas.request_schema import CountMode
+from fastapi import BackgroundTasks
+from pydantic import BaseModel
+from sqlmodel import Session, SQLModel
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Type, TypeVar
+
+M = TypeVar("M", bound=BaseModel)
+
+# Always read, list pages are sorted and continued by them
+KEY_FIELDS: Tuple[str, ...] = ("id", "creation_date")
 
 
 class BaseService:
@@ -14,3 +24,25 @@ class BaseService:
         obj.created_by = self.context.username
         obj.modified_by = self.context.username
         obj.version = 1
+
+    @staticmethod
+    def select_plan(
+        fields: Optional[Set[str]], relations: Sequence[str], field_columns: Dict[str, Sequence[str]]
+    ) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+        # Relations and columns needed to build the requested fields, None meaning all of them
+        if fields is None:
+            return None, None
+        columns = list(KEY_FIELDS) + [column for field in fields for column in field_columns.get(field, (field,))]
+        return [relation for relation in relations if relation in fields], columns
+
+    @staticmethod
+    def project(schema: Type[M], fields: Optional[Set[str]], **producers: Callable[[], Any]) -> M:
+        # Only the requested fields are produced, the others may need relations that were not loaded.
+        # Projected responses lack required fields, so they are built without validation.
+        if fields is None:
+            return schema(**{name: produce() for name, produce in producers.items()})
+        values = {name: produce() for name, produce in producers.items() if name in fields or name in KEY_FIELDS}
+        return schema.construct(**values)
+
+    def total_count(self, model: Type[SQLModel], mode: CountMode, background_tasks: BackgroundTasks) -> Optional[int]:
+        return counts.total_count(self.db, model, mode, background_tasks)
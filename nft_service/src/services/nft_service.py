@@ -6,32 +6,59 @@ from nft_service.src.schemas.nft_schema import (
     NFTRequest,
     NFTResponse,
     NFTFetchResponse,
+    NFTBatchItemResponse,
+    NFTBulkMintItemResponse,
+    NFTSearchResponse,
+    NFTFilterRequest,
     NFTThumbnailResponse,
+    ImageFormat,
+    FileMode,
+    MintJobResponse,
+    MintJobStatus,
     NFTFileResponse,
+    ThumbnailMode,
 )
 from nft_service.src.schemas.user_schema import UserResponse
 from nft_service.src.schemas.transaction_schema import (
     TransactionResponse,
     TransactionRequest,
 )
-from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.schemas.request_schema import CountMode, SearchRequest
 from nft_service.src.models.nft import NFT, NFTFile
+from nft_service.src.models.mint_job import MintJob
 from nft_service.src.models.user import User
 from nft_service.src.models.transaction import Transaction
 from nft_service.src import config as cf
-from nft_service.src.exceptions import InternalError, NotFound, BadRequest
+from nft_service.src import imaging, storage, utils
+from nft_service.src.imaging import image_pool
+from nft_service.src.cache import CachedResponse, fetch_cache, image_cache
+from nft_service.src.exceptions import (
+    InternalError,
+    NotFound,
+    NotModified,
+    BadRequest,
+    PayloadTooLarge,
+    ServiceUnavailable,
+)
 from nft_service.src.db.repositories.nft import NFTRepository
+from nft_service.src.db.repositories.mint_job import MintJobRepository
+from nft_service.src.db.repositories.user import UserRepository
 from nft_service.src.context import Context
-from fastapi import UploadFile
-from typing import List
+from fastapi import BackgroundTasks, UploadFile
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Set, Tuple, TypeVar
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
 from sqlmodel import Session
 import os
-import secrets
+import asyncio
 import base64
-from PIL import Image
+import orjson
+from loguru import logger
 
 from nft_service.src.handlers.handler import BaseHandler
 
+T = TypeVar("T")
+
 
 class MintNFTSUseCase(BaseHandler):
 
@@ -39,10 +66,7 @@ class MintNFTSUseCase(BaseHandler):
         # Get logged user from context, this will be the owner of the NFT
         loggedUser: UserResponse = await self.user_service.fetch_logged_user()
 
-        creatorList: List[UserResponse] = []
-        for username in req.creators:
-            user_response: UserResponse = await self.user_service.fetch_by_username(username)
-            creatorList.append(user_response)
+        creatorList: List[User] = await self.user_service.fetch_creators(req.creators)
 
         try:
             file_obj: NFTFile = await self._process_file(file)
@@ -54,134 +78,694 @@ class MintNFTSUseCase(BaseHandler):
             nft_obj: NFT = await self.nft_repo.create(
                 owner_id=loggedUser.id,
                 description=req.description,
-                creators=[u.id for u in creatorList],
+                creators=creatorList,
                 file_id=file_obj.id,
                 commit=True,
             )
-            base64_img: str = await self._image_to_base64(f"{cf.STATIC_PATH}{file_obj.hashed_name}")
+            base64_img: str = await self._image_to_base64(file_obj.hashed_name)
         except Exception as e:
             # If anywhing goes wrong, remove the persisted file.
             self.db.rollback()
-            os.unlink(f"{cf.STATIC_PATH}{file_obj.hashed_name}")
-            os.unlink(f"{cf.STATIC_PATH}{file_obj.thumbnail}")
+            os.unlink(storage.path_for(file_obj.hashed_name))
+            os.unlink(storage.path_for(file_obj.thumbnail))
             raise InternalError(details="Error trying to mint NFT", exception=e)
 
         return NFTFetchResponse(
             file=NFTFileResponse(filename=nft_obj.file.filename, file=base64_img),
             owner=UserResponse(**nft_obj.owner.dict()),
-            creators=creatorList,
+            creators=[UserResponse(**u.dict()) for u in creatorList],
             **nft_obj.dict(),
         )
 
 
 class NFTService(BaseService):
+    # Columns each response field is built from, see select_plan
+    FIELD_COLUMNS = {"owner": ("owner_id",), "creators": (), "file": ("file_id",)}
+
     def __init__(self, session: Session, context: Context):
         super().__init__(session, context)
         self.nft_repo = NFTRepository(session, context)
+        self.job_repo = MintJobRepository(session, context)
+        self.user_repo = UserRepository(session, context)
         self.user_service = UserService(session, self.context)
         self.trx_service = TransactionService(session, self.context)
         self.balance_service = BalanceService(session, self.context)
 
-    async def _image_to_base64(self, path: str) -> str:
-        with open(path, "rb") as fo:
-            base64_img = base64.b64encode(fo.read()).decode()
+    async def _image_to_base64(self, name: str, precomputed: bool = False) -> str:
+        base64_img = image_cache.get(name)
+        if base64_img is None:
+            base64_img = await storage.run_io(self._read_base64, name, precomputed)
+            image_cache.put(name, base64_img)
         return base64_img
 
-    async def _process_file(self, file: UploadFile) -> NFTFile:
-        # First persist the file locally
-        filename = file.filename
+    @staticmethod
+    def _read_base64(name: str, precomputed: bool) -> str:
+        # Thumbnails are encoded once when minting, older ones may still lack the encoded sidecar
+        base64_img = storage.read_encoded(name) if precomputed else None
+        if base64_img is None:
+            with open(storage.path_for(name), "rb") as fo:
+                base64_img = base64.b64encode(fo.read()).decode()
+        return base64_img
+
+    async def _make_variant(self, name: str, variant: str, size: Optional[int], image_format: str) -> None:
+        path = await storage.run_io(storage.path_for, name)
+        variant_path = await storage.run_io(storage.target_path, variant)
+        await image_pool.run(imaging.make_variant, path, variant_path, size, image_format)
+
+    async def _store_original(self, file: UploadFile, encode: bool = False) -> storage.StoredUpload:
         # test.png >> ["test", "png]
-        extension = filename.split(".")[1]
+        extension = file.filename.split(".")[1]
 
-        # /static/images/3cda3e6df79c9ee99f41.png
-        hashed_name = secrets.token_hex(10) + "." + extension
-        file_path = f"{cf.STATIC_PATH}{hashed_name}"
-        file_content = await file.read()
+        # Disk work runs in threads so other requests are not blocked meanwhile.
+        # Named after its content, /static/images/<sha256>.png, once kept by _process_file
+        return await storage.run_io(storage.write_upload, file.file, extension, cf.MAX_UPLOAD_BYTES, encode)
 
-        with open(file_path, "wb") as fo:
-            fo.write(file_content)
+    async def _make_thumbnail(self, hashed_name: str) -> str:
+        # /static/images/thumb-<sha256>.png
+        thumb_hashed_name = "thumb-" + hashed_name
+        # Content addressed, so known content already has its thumbnail
+        if await storage.run_io(storage.exists, thumb_hashed_name):
+            return thumb_hashed_name
+
+        try:
+            # Image work runs in other processes, see imaging.ImagePool
+            await image_pool.run(
+                imaging.make_thumbnail,
+                await storage.run_io(storage.path_for, hashed_name),
+                await storage.run_io(storage.target_path, thumb_hashed_name),
+                cf.THUMBNAIL_SIZE,
+            )
+            # Thumbnails never change, so they are base64 encoded only once
+            await storage.run_io(storage.write_encoded, thumb_hashed_name)
+        except Exception:
+            await storage.run_io(storage.remove_if_exists, thumb_hashed_name)
+            raise
+        return thumb_hashed_name
+
+    async def _process_file(self, file: UploadFile, upload: storage.StoredUpload) -> NFTFile:
+        # Called holding storage.name_lock(upload.name), see _release_content
+        await storage.run_io(storage.keep_upload, upload)
+        if upload.base64 is not None:
+            # Encoded while it was written, so the response doesn't read the file again
+            image_cache.put(upload.name, upload.base64)
 
         # Save also a thumbnail to avoid passing the entire image from the get_all endpoint
-        with Image.open(file_path) as img:
-            img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-            # /static/images/thumb-3cda3e6df79c9ee99f41.png
-            thumb_hashed_name = "thumb-" + hashed_name
-            thumb_path = f"{cf.STATIC_PATH}{thumb_hashed_name}"
-            img.save(thumb_path)
-
-        file_obj = NFTFile(filename=filename, hashed_name=hashed_name, thumbnail=thumb_hashed_name)
+        thumb_hashed_name = await self._make_thumbnail(upload.name)
+
+        file_obj = NFTFile(
+            filename=file.filename, hashed_name=upload.name, thumbnail=thumb_hashed_name, digest=upload.digest
+        )
         self.db.add(file_obj)
         self.db.flush()
         return file_obj
 
-    async def add(self, request: NFTRequest, file: UploadFile) -> NFTFetchResponse:
+    async def _release_content(self, hashed_name: str) -> None:
+        # Identical uploads share the original and its thumbnail, which are removed only once no file nor
+        # pending mint job references them. Called holding storage.name_lock(hashed_name), which every mint of
+        # every worker process keeps until its reference is committed, so the content can't be removed as it gets
+        # a new one.
+        references = await self.nft_repo.count_files(hashed_name) + await self.job_repo.count_active(hashed_name)
+        if references > 0:
+            return
+        image_cache.invalidate(hashed_name)
+        await storage.run_io(storage.remove_if_exists, hashed_name)
+        await storage.run_io(storage.remove_if_exists, "thumb-" + hashed_name)
+
+    async def add(
+        self, request: NFTRequest, file: UploadFile, file_mode: FileMode = FileMode.INLINE
+    ) -> NFTFetchResponse:
         # Get logged user from context, this will be the owner of the NFT
         loggedUser: UserResponse = await self.user_service.fetch_logged_user()
 
-        creatorList: List[UserResponse] = []
-        for username in request.creators:
-            user_response: UserResponse = await self.user_service.fetch_by_username(username)
-            creatorList.append(user_response)
+        # Every creator resolved with a single query, then handed to the repository as they are
+        creatorList: List[User] = await self.user_service.fetch_creators(request.creators)
+        # Read before the commit expires them
+        creatorResponses = [UserResponse(**u.dict()) for u in creatorList]
 
         try:
-            file_obj: NFTFile = await self._process_file(file)
+            upload = await self._store_original(file, encode=file_mode == FileMode.INLINE)
+        except PayloadTooLarge:
+            raise
         except Exception as e:
             raise InternalError(details="Error trying to process the file", exception=e)
 
-        try:
-            # Create NFT with the file attached
-            nft_obj: NFT = await self.nft_repo.create(
-                owner_id=loggedUser.id,
-                description=request.description,
-                creators=[u.id for u in creatorList],
-                file_id=file_obj.id,
-                commit=True,
-            )
-            base64_img: str = await self._image_to_base64(f"{cf.STATIC_PATH}{file_obj.hashed_name}")
-        except Exception as e:
-            # If anywhing goes wrong, remove the persisted file.
-            self.db.rollback()
-            os.unlink(f"{cf.STATIC_PATH}{file_obj.hashed_name}")
-            os.unlink(f"{cf.STATIC_PATH}{file_obj.thumbnail}")
-            raise InternalError(details="Error trying to mint NFT", exception=e)
+        async with storage.name_lock(upload.name):
+            try:
+                file_obj: NFTFile = await self._process_file(file, upload)
+            except Exception as e:
+                self.db.rollback()
+                await storage.run_io(storage.discard_upload, upload)
+                await self._release_content(upload.name)
+                if isinstance(e, ServiceUnavailable):
+                    raise
+                raise InternalError(details="Error trying to process the file", exception=e)
+
+            try:
+                # Create NFT with the file attached
+                nft_obj: NFT = await self.nft_repo.create(
+                    owner_id=loggedUser.id,
+                    description=request.description,
+                    creators=creatorList,
+                    file_id=file_obj.id,
+                    commit=True,
+                )
+                file_response: NFTFileResponse = await self._file_response(file_obj, file_mode)
+            except Exception as e:
+                # If anywhing goes wrong, remove the persisted file unless other NFTs share it.
+                self.db.rollback()
+                await self._release_content(upload.name)
+                raise InternalError(details="Error trying to mint NFT", exception=e)
 
         return NFTFetchResponse(
-            file=NFTFileResponse(filename=nft_obj.file.filename, file=base64_img),
+            file=file_response,
             owner=UserResponse(**nft_obj.owner.dict()),
-            creators=creatorList,
+            creators=creatorResponses,
             **nft_obj.dict(),
         )
 
-    async def fetch(self, nft_id: int) -> NFTFetchResponse:
-        nft_obj = await self.nft_repo.get_by_id(nft_id)
-        base64_img: str = await self._image_to_base64(f"{cf.STATIC_PATH}{nft_obj.file.hashed_name}")
+    async def add_many(self, requests: List[NFTRequest], files: List[UploadFile]) -> List[NFTBulkMintItemResponse]:
+        # Mints every file with its request, reporting each one on its own: a file that can't be minted
+        # (unknown creator, too large, broken image) doesn't stop the others
+        if len(requests) != len(files):
+            raise BadRequest(details="Every file needs its description and creators, in the same order")
+        if len(files) > cf.BULK_MINT_MAX_FILES:
+            raise BadRequest(details=f"Cannot mint more than {cf.BULK_MINT_MAX_FILES} NFTs at once")
 
-        return NFTFetchResponse(
+        loggedUser: UserResponse = await self.user_service.fetch_logged_user()
+        # The creators of every file are resolved with a single query
+        users = await self.user_service.fetch_by_usernames(
+            {username for request in requests for username in request.creators or []}
+        )
+
+        results: List[Optional[NFTBulkMintItemResponse]] = [None] * len(files)
+        for index, (request, file) in enumerate(zip(requests, files)):
+            unknown = [username for username in request.creators or [] if username not in users]
+            if unknown:
+                results[index] = self._bulk_item(index, file, error=f"Unknown creators: {', '.join(unknown)}")
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        for start in range(0, len(pending), cf.BULK_MINT_BATCH_SIZE):
+            batch = pending[start:start + cf.BULK_MINT_BATCH_SIZE]
+            await self._add_batch(batch, requests, files, loggedUser.id, users, results)
+        return results  # type: ignore[return-value]
+
+    async def _add_batch(
+        self,
+        batch: List[int],
+        requests: List[NFTRequest],
+        files: List[UploadFile],
+        owner_id: int,
+        users: Dict[str, UserResponse],
+        results: List[Optional[NFTBulkMintItemResponse]],
+    ) -> None:
+        # Files are stored and thumbnailed in parallel, then the whole batch is inserted and committed at once
+        semaphore = asyncio.Semaphore(cf.BULK_MINT_CONCURRENCY)
+
+        async def bounded(coroutine: Awaitable[T]) -> T:
+            async with semaphore:
+                return await coroutine
+
+        stored = await asyncio.gather(
+            *(bounded(self._store_original(files[index])) for index in batch), return_exceptions=True
+        )
+        uploads: Dict[int, storage.StoredUpload] = {}
+        for index, upload in zip(batch, stored):
+            if isinstance(upload, Exception):
+                results[index] = self._bulk_item(index, files[index], error=self._bulk_error(upload))
+            else:
+                uploads[index] = upload  # type: ignore[assignment]
+
+        names = sorted({upload.name for upload in uploads.values()})
+        async with AsyncExitStack() as stack:
+            # Identical files share their content lock, taken once and in order so that concurrent
+            # bulk mints of the same files can't deadlock
+            for name in names:
+                await stack.enter_async_context(storage.name_lock(name))
+
+            try:
+                # keep_upload only renames, no need to run it in parallel
+                for index, upload in list(uploads.items()):
+                    try:
+                        await storage.run_io(storage.keep_upload, upload)
+                    except Exception as e:
+                        logger.exception(f"Error keeping the upload {upload.name}")
+                        await storage.run_io(storage.discard_upload, upload)
+                        results[index] = self._bulk_item(index, files[index], error=self._bulk_error(e))
+                        del uploads[index]
+                kept_names = sorted({upload.name for upload in uploads.values()})
+                thumbnails = await asyncio.gather(
+                    *(bounded(self._make_thumbnail(name)) for name in kept_names), return_exceptions=True
+                )
+                thumbnail_by_name = dict(zip(kept_names, thumbnails))
+
+                ready: List[int] = []
+                for index, upload in uploads.items():
+                    thumbnail = thumbnail_by_name[upload.name]
+                    if isinstance(thumbnail, Exception):
+                        results[index] = self._bulk_item(index, files[index], error=self._bulk_error(thumbnail))
+                    else:
+                        ready.append(index)
+
+                try:
+                    file_list = [
+                        NFTFile(
+                            filename=files[index].filename,
+                            hashed_name=uploads[index].name,
+                            thumbnail=thumbnail_by_name[uploads[index].name],
+                            digest=uploads[index].digest,
+                        )
+                        for index in ready
+                    ]
+                    self.db.add_all(file_list)
+                    self.db.flush()
+                    nft_list: List[NFT] = await self.nft_repo.create_many(
+                        owner_id=owner_id,
+                        items=[
+                            (
+                                requests[index].description,
+                                [users[username].id for username in requests[index].creators or []],
+                                file_obj.id,  # type: ignore[misc]
+                            )
+                            for index, file_obj in zip(ready, file_list)
+                        ],
+                        commit=True,
+                    )
+                    for index, nft_obj in zip(ready, nft_list):
+                        results[index] = self._bulk_item(index, files[index], nft_id=nft_obj.id)
+                except Exception as e:
+                    logger.exception(f"Error minting a batch of {len(ready)} NFTs")
+                    self.db.rollback()
+                    for index in ready:
+                        results[index] = self._bulk_item(index, files[index], error=self._bulk_error(e))
+            finally:
+                # Content of the failed files is removed unless other NFTs share it
+                for name in names:
+                    await self._release_content(name)
+
+    @staticmethod
+    def _bulk_item(
+        index: int, file: UploadFile, nft_id: Optional[int] = None, error: Optional[str] = None
+    ) -> NFTBulkMintItemResponse:
+        return NFTBulkMintItemResponse(
+            index=index, filename=file.filename, created=nft_id is not None, nft_id=nft_id, error=error
+        )
+
+    @staticmethod
+    def _bulk_error(e: Exception) -> str:
+        # Errors the client can act on are reported as they are, the rest as in a single mint
+        if isinstance(e, (PayloadTooLarge, ServiceUnavailable)) and e.details:
+            return e.details
+        return "Error trying to mint NFT"
+
+    async def add_in_background(
+        self, request: NFTRequest, file: UploadFile, background_tasks: BackgroundTasks
+    ) -> MintJobResponse:
+        # Only the original is stored while the client waits. The thumbnail and the NFT are created after the
+        # response is sent, the client polls the returned job to know when the NFT is ready.
+        loggedUser: UserResponse = await self.user_service.fetch_logged_user()
+        creators: List[int] = [user.id for user in await self.user_service.fetch_creators(request.creators)]
+
+        try:
+            upload = await self._store_original(file)
+        except PayloadTooLarge:
+            raise
+        except Exception as e:
+            raise InternalError(details="Error trying to process the file", exception=e)
+
+        async with storage.name_lock(upload.name):
+            try:
+                await storage.run_io(storage.keep_upload, upload)
+                job_obj: MintJob = await self.job_repo.create(
+                    status=MintJobStatus.PENDING,
+                    owner_id=loggedUser.id,
+                    description=request.description,
+                    creators=creators,
+                    filename=file.filename,
+                    hashed_name=upload.name,
+                    digest=upload.digest,
+                    commit=True,
+                )
+            except Exception as e:
+                self.db.rollback()
+                await storage.run_io(storage.discard_upload, upload)
+                await self._release_content(upload.name)
+                raise InternalError(details="Error trying to mint NFT", exception=e)
+
+        background_tasks.add_task(self._run_mint_job, job_obj.id)
+        return self._job_response(job_obj)
+
+    async def _run_mint_job(self, job_id: int) -> None:
+        # The request session may be closed by the time background tasks run, so the job uses its own
+        for attempt in range(cf.MINT_JOB_RETRIES + 1):
+            # Dated on every attempt, so the job is not taken as abandoned while it waits, see recover_mint_jobs
+            context = Context(self.context.username, datetime.now(), self.context.user_ip)
+            with Session(self.db.get_bind()) as session:
+                job = await NFTService(session, context).finish_mint(job_id)
+            if job.status != MintJobStatus.PENDING:
+                return
+            # Left pending while the image queue is full, tried again later backing off
+            await asyncio.sleep(cf.IMAGE_RETRY_AFTER * 2**attempt)
+        logger.warning(f"Mint job {job_id} still pending after {cf.MINT_JOB_RETRIES} retries")
+
+    async def finish_mint(self, job_id: int) -> MintJobResponse:
+        job_obj: MintJob = await self.job_repo.get_by_id(job_id)
+        # Only one process runs it, recover_mint_jobs may be picking it up elsewhere
+        if not await self.job_repo.claim(job_obj, MintJobStatus.PENDING, status=MintJobStatus.RUNNING):
+            return self._job_response(job_obj)
+
+        hashed_name = job_obj.hashed_name
+        async with storage.name_lock(hashed_name):
+            error = "Error trying to process the file"
+            try:
+                thumb_hashed_name = await self._make_thumbnail(hashed_name)
+
+                error = "Error trying to mint NFT"
+                file_obj = NFTFile(
+                    filename=job_obj.filename,
+                    hashed_name=hashed_name,
+                    thumbnail=thumb_hashed_name,
+                    digest=job_obj.digest,
+                )
+                self.db.add(file_obj)
+                self.db.flush()
+                nft_obj: NFT = await self.nft_repo.create(
+                    owner_id=job_obj.owner_id,
+                    description=job_obj.description,
+                    creators=await self.user_repo.get_by_ids(job_obj.creators),
+                    file_id=file_obj.id,
+                    commit=False,
+                )
+                # Committed together with the NFT, so a failure leaves neither the NFT nor a finished job behind
+                await self.job_repo.update(job_obj, status=MintJobStatus.DONE, nft_id=nft_obj.id, commit=True)
+            except ServiceUnavailable:
+                # The image queue is full. No client waits for this mint, so instead of failing it is left
+                # pending, keeping its content, to be tried again later (see _run_mint_job)
+                self.db.rollback()
+                await self.job_repo.update(job_obj, status=MintJobStatus.PENDING, commit=True)
+            except Exception:
+                logger.exception(f"Mint job {job_id} failed")
+                self.db.rollback()
+                await self.job_repo.update(job_obj, status=MintJobStatus.FAILED, error=error, commit=True)
+                await self._release_content(hashed_name)
+
+        return self._job_response(job_obj)
+
+    async def recover_mint_jobs(self) -> int:
+        # Jobs left unfinished by a crash or a restart, which would otherwise keep their content forever.
+        # Pending ones never started so they are run again, running ones were interrupted at any point so they fail
+        before = self.context.system_date - timedelta(seconds=cf.MINT_JOB_TIMEOUT)
+        stale_jobs: List[MintJob] = await self.job_repo.get_stale(before)
+        for job_obj in stale_jobs:
+            if job_obj.status == MintJobStatus.PENDING:
+                await self.finish_mint(job_obj.id)  # type: ignore[arg-type]
+                continue
+
+            failed = await self.job_repo.claim(
+                job_obj, MintJobStatus.RUNNING, status=MintJobStatus.FAILED, error="Mint interrupted, try again"
+            )
+            if failed:
+                logger.warning(f"Mint job {job_obj.id} interrupted")
+                async with storage.name_lock(job_obj.hashed_name):
+                    await self._release_content(job_obj.hashed_name)
+        return len(stale_jobs)
+
+    async def mint_job(self, job_id: int) -> MintJobResponse:
+        return self._job_response(await self.job_repo.get_by_id(job_id))
+
+    @staticmethod
+    def _job_response(job_obj: MintJob) -> MintJobResponse:
+        return MintJobResponse(**job_obj.dict(), url=f"{cf.MINT_JOB_URL}{job_obj.id}")
+
+    async def fetch(
+        self,
+        nft_id: int,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[str] = None,
+        file_mode: FileMode = FileMode.INLINE,
+    ) -> NFTFetchResponse:
+        nft_obj = await self.nft_repo.get_by_id(nft_id)
+        # Answered before touching the file when the client already has this version
+        self._check_not_modified(nft_obj, if_none_match, if_modified_since, file_mode)
+        file_response: NFTFileResponse = await self._file_response(nft_obj.file, file_mode)
+        return self._fetch_response(nft_obj, file_response, file_mode)
+
+    async def fetch_many(self, ids: List[int]) -> List[NFTBatchItemResponse]:
+        if len(ids) > cf.MULTI_GET_MAX_IDS:
+            raise BadRequest(details=f"Cannot fetch more than {cf.MULTI_GET_MAX_IDS} NFTs at once")
+
+        nft_list: List[NFT] = await self.nft_repo.get_by_ids(ids, relations=("owner", "file"))
+        # Read all the images concurrently
+        images: List[str] = await asyncio.gather(
+            *[self._image_to_base64(nft_obj.file.hashed_name) for nft_obj in nft_list]
+        )
+        found = {
+            nft_obj.id: self._fetch_response(nft_obj, NFTFileResponse(filename=nft_obj.file.filename, file=base64_img))
+            for nft_obj, base64_img in zip(nft_list, images)
+        }
+
+        # Same order as requested, repeated ids included
+        return [NFTBatchItemResponse(id=id, found=id in found, nft=found.get(id)) for id in ids]
+
+    def _fetch_response(
+        self, nft_obj: NFT, file_response: NFTFileResponse, file_mode: FileMode = FileMode.INLINE
+    ) -> NFTFetchResponse:
+        response = NFTFetchResponse(
             **nft_obj.dict(),
-            file=NFTFileResponse(filename=nft_obj.file.filename, file=base64_img),
+            file=file_response,
             owner=UserResponse(**nft_obj.owner.dict()),
         )
+        response.set_validators(self._etag(nft_obj, file_mode), nft_obj.modified_at)
+        return response
 
-    async def get_all(self, search_request: SearchRequest) -> List[NFTResponse]:
+    async def _file_response(self, file_obj: NFTFile, file_mode: FileMode) -> NFTFileResponse:
+        if file_mode == FileMode.REFERENCE:
+            return NFTFileResponse(filename=file_obj.filename, url=f"{cf.FILE_URL}{file_obj.hashed_name}")
+        base64_img: str = await self._image_to_base64(file_obj.hashed_name)
+        return NFTFileResponse(filename=file_obj.filename, file=base64_img)
+
+    async def fetch_cached(
+        self, nft_id: int, if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None
+    ) -> CachedResponse:
+        # Serialized fetch response, built once per change of the NFT
+        cached: Optional[CachedResponse] = fetch_cache.get(nft_id)
+        # Other processes can only invalidate their own cache, so entries are checked against the row. Read before
+        # building the body, if the NFT changes in between the entry is rebuilt on the next request
+        version: Optional[int] = await self.nft_repo.get_version(nft_id)
+        if cached is not None and cached.version != version:
+            fetch_cache.invalidate(nft_id)
+            cached = None
+        if cached is None:
+            token = fetch_cache.token()
+            response: NFTFetchResponse = await self.fetch(
+                nft_id, if_none_match=if_none_match, if_modified_since=if_modified_since
+            )
+            body = response.json().encode()
+            cached = CachedResponse(body, response.etag, response.last_modified, version)
+            fetch_cache.put(nft_id, cached, size=len(body), token=token)
+        elif cached.etag and cached.last_modified:
+            if utils.is_not_modified(cached.etag, cached.last_modified, if_none_match, if_modified_since):
+                raise NotModified(etag=cached.etag, last_modified=utils.http_date(cached.last_modified))
+        return cached
+
+    async def fetch_stream(
+        self, nft_id: int, if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None
+    ) -> Tuple[NFTFetchResponse, AsyncIterator[bytes]]:
+        # Same body as fetch but the file is read and encoded a chunk at a time while it is being sent,
+        # so memory used doesn't depend on the size of the image.
+        nft_obj = await self.nft_repo.get_by_id(nft_id)
+        self._check_not_modified(nft_obj, if_none_match, if_modified_since)
+        envelope = NFTFetchResponse(
+            **nft_obj.dict(),
+            file=NFTFileResponse(filename=nft_obj.file.filename, file=""),
+            owner=UserResponse(**nft_obj.owner.dict()),
+        )
+        envelope.set_validators(self._etag(nft_obj), nft_obj.modified_at)
+        return envelope, self._stream_fetch_response(envelope, nft_obj.file.hashed_name)
+
+    @staticmethod
+    def _etag(nft_obj: NFT, file_mode: FileMode = FileMode.INLINE) -> str:
+        # Stored files are never modified and any change to the NFT bumps its version
+        suffix = "-ref" if file_mode == FileMode.REFERENCE else ""
+        return f'"{nft_obj.file.hashed_name}-{nft_obj.version}{suffix}"'
+
+    def _check_not_modified(
+        self,
+        nft_obj: NFT,
+        if_none_match: Optional[str],
+        if_modified_since: Optional[str],
+        file_mode: FileMode = FileMode.INLINE,
+    ) -> None:
+        etag = self._etag(nft_obj, file_mode)
+        if utils.is_not_modified(etag, nft_obj.modified_at, if_none_match, if_modified_since):
+            raise NotModified(etag=etag, last_modified=utils.http_date(nft_obj.modified_at))
+
+    async def _stream_fetch_response(self, envelope: NFTFetchResponse, name: str) -> AsyncIterator[bytes]:
+        # {"id": 1, ..., "file": {"filename": "puppy.jpg", "file": "<base64 chunks>", "url": null}}
+        head = envelope.json(exclude={"file"})[:-1]
+        yield f'{head}, "file": {{"filename": {orjson.dumps(envelope.file.filename).decode()}, "file": "'.encode()
+
+        cached: Optional[str] = image_cache.get(name)
+        if cached is not None:
+            yield cached.encode()
+        else:
+            fo = await storage.run_io(open, await storage.run_io(storage.path_for, name), "rb")
+            try:
+                # Chunks are multiple of 3 bytes long so their base64 can be concatenated without padding
+                while chunk := await storage.run_io(fo.read, cf.STREAM_CHUNK_SIZE):
+                    yield base64.b64encode(chunk)
+            finally:
+                await storage.run_io(fo.close)
+
+        yield b'", "url": null}}'
+
+    async def get_all(
+        self,
+        search_request: SearchRequest,
+        thumbnail_mode: ThumbnailMode = ThumbnailMode.INLINE,
+        fields: Optional[Set[str]] = None,
+        filters: Optional[NFTFilterRequest] = None,
+    ) -> List[NFTResponse]:
+        cursor = search_request.decode_cursor()
+        relations, columns = self.select_plan(fields, NFTRepository.DEFAULT_RELATIONS, self.FIELD_COLUMNS)
+        filters = filters or NFTFilterRequest()
         try:
             response: List[NFTResponse] = []
-            nft_list: List[NFT] = await self.nft_repo.get_all(search_request.offset, search_request.limit)
+            nft_list: List[NFT] = await self.nft_repo.get_all(
+                search_request.offset,
+                search_request.limit,
+                relations=relations,
+                cursor=cursor,
+                columns=columns,
+                owner=filters.owner,
+                creator=filters.creator,
+            )
 
-            for nft_obj in nft_list:
-                base64_img: str = await self._image_to_base64(f"{cf.STATIC_PATH}{nft_obj.file.thumbnail}")
+            # Read all the thumbnails of the page concurrently. Without the file there is nothing to read.
+            thumbnails: List[Optional[NFTThumbnailResponse]] = [None] * len(nft_list)
+            if fields is None or "file" in fields:
+                thumbnails = await asyncio.gather(
+                    *[self._thumbnail_response(nft_obj.file, thumbnail_mode) for nft_obj in nft_list]
+                )
 
-                nft_resp = NFTResponse(
+            for nft_obj, thumbnail in zip(nft_list, thumbnails):
+                nft_resp = self.project(
+                    NFTResponse,
+                    fields,
+                    id=lambda: nft_obj.id,
+                    creation_date=lambda: nft_obj.creation_date,
+                    description=lambda: nft_obj.description,
+                    creators=lambda: [UserResponse(**u.dict()) for u in nft_obj.creators],
+                    owner=lambda: UserResponse(**nft_obj.owner.dict()),
+                    file=lambda: thumbnail,
+                )
+                response.append(nft_resp)
+        except Exception as e:
+            raise InternalError(detail="Error retrieving NFT list", exception=str(e))
+        return response
+
+    def count(self, mode: CountMode, background_tasks: BackgroundTasks) -> Optional[int]:
+        return self.total_count(NFT, mode, background_tasks)
+
+    async def search(
+        self, text: str, search_request: SearchRequest, thumbnail_mode: ThumbnailMode = ThumbnailMode.INLINE
+    ) -> List[NFTSearchResponse]:
+        cursor = search_request.decode_score_cursor()
+        try:
+            rows: List[Tuple[NFT, float]] = await self.nft_repo.search(
+                text, search_request.offset, search_request.limit, cursor=cursor
+            )
+            thumbnails: List[NFTThumbnailResponse] = await asyncio.gather(
+                *[self._thumbnail_response(nft_obj.file, thumbnail_mode) for nft_obj, _ in rows]
+            )
+            return [
+                NFTSearchResponse(
                     id=nft_obj.id,
                     creation_date=nft_obj.creation_date,
                     description=nft_obj.description,
                     creators=[UserResponse(**u.dict()) for u in nft_obj.creators],
                     owner=UserResponse(**nft_obj.owner.dict()),
-                    file=NFTThumbnailResponse(filename=nft_obj.file.filename, thumbnail=base64_img),
+                    file=thumbnail,
+                    score=score,
                 )
-                response.append(nft_resp)
+                for (nft_obj, score), thumbnail in zip(rows, thumbnails)
+            ]
         except Exception as e:
-            raise InternalError(detail="Error retrieving NFT list", exception=str(e))
-        return response
+            raise InternalError(details="Error searching NFTs", exception=str(e))
+
+    async def export(self) -> AsyncIterator[bytes]:
+        # One NFT per line (NDJSON). Thumbnails are referenced by url to keep the export light.
+        async for nft_list in self.nft_repo.iter_batches(cf.EXPORT_BATCH_SIZE):
+            for nft_obj in nft_list:
+                nft_resp = NFTResponse(
+                    id=nft_obj.id,
+                    creation_date=nft_obj.creation_date,
+                    description=nft_obj.description,
+                    creators=[UserResponse(**u.dict()) for u in nft_obj.creators],
+                    owner=UserResponse(**nft_obj.owner.dict()),
+                    file=NFTThumbnailResponse(
+                        filename=nft_obj.file.filename, url=f"{cf.THUMBNAIL_URL}{nft_obj.file.thumbnail}"
+                    ),
+                )
+                yield nft_resp.json().encode() + b"\n"
+
+    async def image_variant(
+        self, nft_id: int, size: Optional[int], image_format: Optional[ImageFormat], accept: Optional[str]
+    ) -> Tuple[str, str]:
+        # Path and format of the NFT image in the given size and format. Variants are generated from the
+        # original the first time they are requested and reused afterwards.
+        if size is not None and size not in cf.IMAGE_VARIANT_SIZES:
+            raise BadRequest(details=f"Size must be one of {', '.join(map(str, cf.IMAGE_VARIANT_SIZES))}")
+
+        nft_obj: NFT = await self.nft_repo.get_by_id(nft_id)
+        name = nft_obj.file.hashed_name
+        original_format = storage.image_format(name) or ImageFormat.JPEG.value
+        if image_format is None:
+            target_format = utils.negotiate_image_format(accept, [ImageFormat.WEBP.value], original_format)
+        else:
+            target_format = image_format.value
+
+        if size is None and target_format == original_format:
+            return await storage.run_io(storage.path_for, name), target_format
+
+        variant = storage.variant_name(name, size, target_format)
+        if not await storage.run_io(storage.exists, variant):
+            async with storage.name_lock(variant):
+                # Somebody else may have generated it while waiting for the lock
+                if not await storage.run_io(storage.exists, variant):
+                    await self._make_variant(name, variant, size, target_format)
+        return await storage.run_io(storage.path_for, variant), target_format
+
+    async def file_path(self, name: str) -> Tuple[str, str]:
+        # Path and format of a stored original image. Thumbnails have their own endpoint
+        image_format = storage.image_format(name)
+        path = None
+        if not name.startswith("thumb-") and image_format is not None:
+            path = await storage.run_io(storage.find, name)
+        if path is None or image_format is None:
+            raise NotFound(details="File not found", extra={"model": "NFTFile", "field": "hashed_name", "value": name})
+        return path, image_format
+
+    async def thumbnail_path(self, thumbnail: str) -> str:
+        # Only thumbnails can be downloaded from here, originals are returned by fetch. Their base64 sidecars are
+        # not images, they are never served either
+        is_thumbnail = thumbnail.startswith("thumb-") and storage.image_format(thumbnail) is not None
+        path = await storage.run_io(storage.find, thumbnail) if is_thumbnail else None
+        if path is None:
+            raise NotFound(
+                details="Thumbnail not found", extra={"model": "NFTFile", "field": "thumbnail", "value": thumbnail}
+            )
+        return path
+
+    async def _thumbnail_response(self, file_obj: NFTFile, thumbnail_mode: ThumbnailMode) -> NFTThumbnailResponse:
+        if thumbnail_mode == ThumbnailMode.REFERENCE:
+            return NFTThumbnailResponse(
+                filename=file_obj.filename,
+                url=f"{cf.THUMBNAIL_URL}{file_obj.thumbnail}",
+                hash=await storage.run_io(storage.file_digest, file_obj.thumbnail),
+            )
+
+        base64_img: str = await self._image_to_base64(file_obj.thumbnail, precomputed=True)
+        return NFTThumbnailResponse(filename=file_obj.filename, thumbnail=base64_img)
 
     async def trade_nft(self, nft_id: int, request: TransactionRequest, is_buy: bool) -> TransactionResponse:
         nft_obj: NFT = await self.nft_repo.get_by_id(nft_id)
@@ -223,6 +807,8 @@ class NFTService(BaseService):
         except Exception as e:
             self.db.rollback()
             raise InternalError(details="Internal Server Error", exception=str(e))
+        finally:
+            fetch_cache.invalidate(nft_id)
         return result
 
     def _validate_buy_data(self, buyer: User, seller: User, nft: NFT) -> None:
@@ -1,6 +1,6 @@
 from nft_service.src.services.base_service import BaseService
 from nft_service.src.schemas.user_schema import UserResponse
-from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.schemas.request_schema import CountMode, SearchRequest
 from nft_service.src.schemas.transaction_schema import TransactionRequest, TransactionResponse
 from nft_service.src.models.user import User
 from nft_service.src.models.transaction import Transaction
@@ -9,10 +9,14 @@ from nft_service.src.db.repositories.transaction import TransactionRepository
 from nft_service.src.exceptions import InternalError
 from nft_service.src.context import Context
 from sqlmodel import Session
-from typing import List
+from fastapi import BackgroundTasks
+from typing import List, Optional, Set
 
 
 class TransactionService(BaseService):
+    # Columns each response field is built from, see select_plan
+    FIELD_COLUMNS = {"buyer": ("buyer_id",), "seller": ("seller_id",)}
+
     def __init__(self, session: Session, context: Context):
         super().__init__(session, context)
         self.trx_repo = TransactionRepository(session, context)
@@ -28,24 +32,33 @@ class TransactionService(BaseService):
 
         return transaction_obj
 
-    async def get_all(self, search_request: SearchRequest) -> List[TransactionResponse]:
+    async def get_all(
+        self, search_request: SearchRequest, fields: Optional[Set[str]] = None
+    ) -> List[TransactionResponse]:
+        cursor = search_request.decode_cursor()
+        relations, columns = self.select_plan(fields, TransactionRepository.DEFAULT_RELATIONS, self.FIELD_COLUMNS)
         try:
             result: List[TransactionResponse] = []
             transaction_rows: List[Transaction] = await self.trx_repo.get_all(
-                search_request.offset, search_request.limit
+                search_request.offset, search_request.limit, relations=relations, cursor=cursor, columns=columns
             )
 
             for transaction_row in transaction_rows:
-                transaction_dict = dict(
-                    id=transaction_row.id,
-                    creation_date=transaction_row.creation_date,
-                    nft_id=transaction_row.nft_id,
-                    buyer=UserResponse(**transaction_row.buyer.dict()),
-                    seller=UserResponse(**transaction_row.seller.dict()),
-                    price=transaction_row.price,
+                transaction_resp = self.project(
+                    TransactionResponse,
+                    fields,
+                    id=lambda: transaction_row.id,
+                    creation_date=lambda: transaction_row.creation_date,
+                    nft_id=lambda: transaction_row.nft_id,
+                    buyer=lambda: UserResponse(**transaction_row.buyer.dict()),
+                    seller=lambda: UserResponse(**transaction_row.seller.dict()),
+                    price=lambda: transaction_row.price,
                 )
-                result.append(TransactionResponse(**transaction_dict))
+                result.append(transaction_resp)
 
             return result
         except Exception as e:
             raise InternalError(detail="Error retrieving Transaction list", exception=str(e))
+
+    def count(self, mode: CountMode, background_tasks: BackgroundTasks) -> Optional[int]:
+        return self.total_count(Transaction, mode, background_tasks)
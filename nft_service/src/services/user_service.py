@@ -4,9 +4,9 @@ from nft_service.src.schemas.user_schema import UserResponse
 from nft_service.src.schemas.request_schema import SearchRequest
 from nft_service.src.context import Context
 from nft_service.src.db.repositories.user import UserRepository
-from nft_service.src.exceptions import InternalError
+from nft_service.src.exceptions import InternalError, NotFound
 from sqlmodel import Session
-from typing import List
+from typing import Dict, Iterable, List
 
 
 class UserService(BaseService):
@@ -15,8 +15,11 @@ class UserService(BaseService):
         self.user_repo = UserRepository(session, context)
 
     async def get_all(self, search_request: SearchRequest) -> List[UserResponse]:
+        cursor = search_request.decode_cursor()
         try:
-            userList: List[User] = await self.user_repo.get_all(search_request.offset, search_request.limit)
+            userList: List[User] = await self.user_repo.get_all(
+                search_request.offset, search_request.limit, cursor=cursor
+            )
             return [UserResponse(**u.dict()) for u in userList]
         except Exception as e:
             raise InternalError(detail="Error retrieving Users list", exception=str(e))
@@ -32,3 +35,20 @@ class UserService(BaseService):
     async def fetch_by_username(self, username: str) -> UserResponse:
         user: User = await self.user_repo.get_by_username(username)
         return UserResponse(**user.dict())
+
+    async def fetch_creators(self, usernames: Iterable[str]) -> List[User]:
+        # Users of every username, in the same order and resolved with a single query. Every unknown
+        # username is reported in the same error
+        usernames = list(dict.fromkeys(usernames))
+        users = {user.username: user for user in await self.user_repo.get_by_usernames(usernames)}
+        unknown = [username for username in usernames if username not in users]
+        if unknown:
+            raise NotFound(
+                details=f"Unknown users: {', '.join(unknown)}",
+                extra={"model": "User", "field": "username", "value": ", ".join(unknown)},
+            )
+        return [users[username] for username in usernames]
+
+    async def fetch_by_usernames(self, usernames: Iterable[str]) -> Dict[str, UserResponse]:
+        users: List[User] = await self.user_repo.get_by_usernames(usernames)
+        return {user.username: UserResponse(**user.dict()) for user in users}
@@ -0,0 +1,352 @@
+from nft_service.src import config as cf
+from nft_service.src.exceptions import PayloadTooLarge
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+from weakref import WeakValueDictionary
+import asyncio
+import base64
+import bisect
+import errno
+import fcntl
+import hashlib
+import os
+import re
+import secrets
+import shutil
+
+ENCODED_SUFFIX: str = ".b64"
+# Image format of each extension of the stored files and the extension variants are saved with
+EXTENSION_FORMATS: Dict[str, str] = {"jpg": "jpeg", "jpeg": "jpeg", "png": "png", "webp": "webp"}
+FORMAT_EXTENSIONS: Dict[str, str] = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+THUMBNAIL_PREFIX: str = "thumb-"
+# Points of each volume in the hash ring, more spread the files more evenly
+VOLUME_REPLICAS: int = 128
+
+T = TypeVar("T")
+
+# Disk reads/writes and image processing block, so they run here instead of in the event loop.
+# Bounded so that a slow disk can't pile up an unlimited amount of threads.
+_io_executor = ThreadPoolExecutor(max_workers=cf.FILE_IO_WORKERS, thread_name_prefix="file-io")
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, partial(func, *args, **kwargs))
+
+
+class HashRing:
+    """Consistent hashing of keys over a set of volumes.
+
+    Every volume owns the keys hashing right before its points in the ring, so adding a volume only moves
+    the files that now belong to it (about 1/n of them) instead of nearly all of them as a modulo would.
+    """
+
+    def __init__(self, volumes: Sequence[str], replicas: int = VOLUME_REPLICAS):
+        self._points = sorted((_ring_hash(f"{volume}#{i}"), volume) for volume in volumes for i in range(replicas))
+        self._hashes = [point for point, _ in self._points]
+
+    def volume_for(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._points)
+        return self._points[index][1]
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+@lru_cache(maxsize=8)
+def _ring(volumes: Tuple[str, ...]) -> HashRing:
+    return HashRing(volumes)
+
+
+def volumes() -> Tuple[str, ...]:
+    return tuple(cf.STATIC_VOLUMES) or (cf.STATIC_PATH,)
+
+
+def shard_key(name: str) -> str:
+    # Files derived from the same content (thumbnail, variants, encoded copies) share their directory
+    # thumb-3cda3e6df79c9ee99f41.png.b64 >> 3cda3e6df79c9ee99f41
+    if name.startswith(THUMBNAIL_PREFIX):
+        name = name[len(THUMBNAIL_PREFIX):]
+    return re.split(r"[.-]", name, maxsplit=1)[0]
+
+
+def shard_path(name: str, volume: Optional[str] = None) -> str:
+    # 3cda3e6df79c9ee99f41.png >> <volume>/3c/da/3cda3e6df79c9ee99f41.png
+    key = shard_key(name).ljust(4, "_")
+    if volume is None:
+        all_volumes = volumes()
+        volume = all_volumes[0] if len(all_volumes) == 1 else _ring(all_volumes).volume_for(key)
+    return os.path.join(volume, key[:2], key[2:4], name)
+
+
+def locations(name: str) -> List[str]:
+    # Where a file may be, where it belongs first. Then where an earlier layout or set of volumes put it
+    if not cf.STATIC_SHARDED:
+        return [f"{cf.STATIC_PATH}{name}"]
+    paths = [shard_path(name)]
+    paths += [shard_path(name, volume) for volume in volumes()]
+    paths += [os.path.join(volume, name) for volume in (*volumes(), cf.STATIC_PATH)]
+    return list(dict.fromkeys(paths))
+
+
+def path_for(name: str) -> str:
+    # /static/images/3cda3e6df79c9ee99f41.png, or /static/images/3c/da/3cda3e6df79c9ee99f41.png once sharded.
+    # Files not moved there yet (see commands.migrate_storage) are found where they were, so reads keep
+    # working meanwhile. Files stored nowhere get the path they would be written to
+    paths = locations(name)
+    if len(paths) > 1:
+        for path in paths:
+            if os.path.isfile(path):
+                return path
+    return paths[0]
+
+
+def target_path(name: str) -> str:
+    # Path a new file is written to, its shard directory created if needed
+    path = locations(name)[0]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def tmp_path(name: str) -> str:
+    # Temporary files whose final name is not known yet, see write_upload
+    return os.path.join(volumes()[0], name) if cf.STATIC_SHARDED else f"{cf.STATIC_PATH}{name}"
+
+
+def move(source: str, destination: str) -> None:
+    # Volumes may be different filesystems, where a rename is not possible
+    try:
+        os.replace(source, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy(source, destination)
+        os.unlink(source)
+
+
+def copy(source: str, destination: str) -> None:
+    # Hard linked when possible. Written to a temporary name first so readers never see a partial file
+    tmp_destination = destination + ".tmp"
+    if os.path.exists(tmp_destination):
+        os.unlink(tmp_destination)
+    try:
+        os.link(source, tmp_destination)
+    except OSError:
+        shutil.copyfile(source, tmp_destination)
+    os.replace(tmp_destination, destination)
+
+
+def stored_files(root: str) -> Iterable[Tuple[str, str]]:
+    # (name, path) of the files stored in a volume, in the flat or the sharded layout. Temporary files are skipped
+    for entry in os.scandir(root):
+        if entry.is_file():
+            if _is_stored(entry.name):
+                yield entry.name, entry.path
+        elif entry.is_dir() and len(entry.name) == 2:
+            for shard in os.scandir(entry.path):
+                if shard.is_dir() and len(shard.name) == 2:
+                    for file_entry in os.scandir(shard.path):
+                        if file_entry.is_file() and _is_stored(file_entry.name):
+                            yield file_entry.name, file_entry.path
+
+
+def _is_stored(name: str) -> bool:
+    # upload-<hex>.tmp, thumb-<hash>.tmp.png, <hash>-128.webp.tmp...
+    return not name.startswith(".") and ".tmp" not in name
+
+
+def exists(name: str) -> bool:
+    return find(name) is not None
+
+
+def find(name: str) -> Optional[str]:
+    # Path of a stored file in a single lookup, None when it isn't stored.
+    # Only plain stored names are accepted, never paths pointing outside the static folder
+    if not name or os.path.basename(name) != name:
+        return None
+    path = path_for(name)
+    return path if os.path.isfile(path) else None
+
+
+@lru_cache(maxsize=cf.DIGEST_CACHE_SIZE)
+def file_digest(name: str) -> str:
+    # Stored files are never modified once written, so their digest can be computed only once
+    digest = hashlib.sha256()
+    with open(path_for(name), "rb") as fo:
+        for chunk in iter(lambda: fo.read(cf.FILE_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_format(name: str) -> Optional[str]:
+    # 3cda3e6df79c9ee99f41.JPG >> "jpeg"
+    return EXTENSION_FORMATS.get(os.path.splitext(name)[1][1:].lower())
+
+
+def variant_name(name: str, size: Optional[int], image_format: str) -> str:
+    # Variants are saved next to the original
+    # 3cda3e6df79c9ee99f41.png >> 3cda3e6df79c9ee99f41-128.webp
+    stem = os.path.splitext(name)[0]
+    size_suffix = f"-{size}" if size else ""
+    return f"{stem}{size_suffix}.{FORMAT_EXTENSIONS[image_format]}"
+
+
+# Held while a derived file (variant, thumbnail) is generated so concurrent requests for it wait instead of
+# generating it again, and while shared content is released so it isn't removed as it gets a new reference.
+# Files are shared by every worker process of the host, so besides a lock of the process the holder keeps an
+# exclusive flock on a lock file of the name, hidden in STATIC_PATH so it isn't taken for a stored file
+_name_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+LOCK_POLL_INTERVAL: float = 0.01  # Seconds between tries to lock a file another process holds
+
+
+@asynccontextmanager
+async def name_lock(name: str) -> AsyncIterator[None]:
+    lock = _name_locks.get(name)
+    if lock is None:
+        lock = _name_locks[name] = asyncio.Lock()
+    async with lock:
+        path = os.path.join(cf.STATIC_PATH, f".{name}.lock")
+        # Polled instead of waited in an IO thread, processes waiting for each other's locks could otherwise
+        # take all the threads the holders need to finish
+        fd = _try_lock_file(path)
+        while fd is None:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            fd = _try_lock_file(path)
+        try:
+            yield
+        finally:
+            # Unlinked before it is unlocked so no lock files are left behind, see _try_lock_file
+            os.unlink(path)
+            os.close(fd)
+
+
+def _try_lock_file(path: str) -> Optional[int]:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Its holder may have unlinked it while it was being opened, then it isn't the lock of the name anymore
+        if os.path.samestat(os.fstat(fd), os.stat(path)):
+            return fd
+    except (BlockingIOError, FileNotFoundError):
+        pass
+    os.close(fd)
+    return None
+
+
+def content_name(digest: str, extension: str) -> str:
+    # Stored files are named after their content, so identical uploads share them
+    # ("<sha256>", "JPEG") >> 9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08.jpg
+    extension = extension.lower()
+    return f"{digest}.{FORMAT_EXTENSIONS.get(EXTENSION_FORMATS.get(extension, ''), extension)}"
+
+
+class StoredUpload(NamedTuple):
+    name: str
+    size: int
+    digest: str  # sha256 of the content
+    base64: Optional[str]  # content encoded while it was written, when asked for
+    tmp_path: str  # where it waits until keep_upload
+
+
+def write_upload(source: BinaryIO, extension: str, max_bytes: int, encode: bool = False) -> StoredUpload:
+    # Copies the upload a chunk at a time, counting, hashing and optionally encoding it on the way, so the
+    # content is read only once and never held whole in memory (except the encoded copy when asked for)
+    digest = hashlib.sha256()
+    encoded: List[bytes] = []
+    carry = b""
+    size = 0
+    # The name depends on the content, so it is written to a temporary name first, see keep_upload
+    upload_path = tmp_path(f"upload-{secrets.token_hex(8)}.tmp")
+    try:
+        with open(upload_path, "wb") as fo:
+            while chunk := source.read(cf.STREAM_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PayloadTooLarge(details=f"File larger than {max_bytes} bytes")
+                digest.update(chunk)
+                fo.write(chunk)
+                if encode:
+                    # Only whole groups of 3 bytes are encoded so the pieces can be concatenated without padding
+                    pending = carry + chunk
+                    cut = len(pending) - len(pending) % 3
+                    encoded.append(base64.b64encode(pending[:cut]))
+                    carry = pending[cut:]
+    except Exception:
+        if os.path.exists(upload_path):
+            os.unlink(upload_path)
+        raise
+
+    base64_content = b"".join(encoded + [base64.b64encode(carry)]).decode() if encode else None
+    name = content_name(digest.hexdigest(), extension)
+    return StoredUpload(name, size, digest.hexdigest(), base64_content, upload_path)
+
+
+def keep_upload(upload: StoredUpload) -> bool:
+    # Moves the upload to its content name, readers never see a partial file. Known content is kept as is,
+    # replacing it would only drop it from the page cache. Returns whether the content is new
+    created = not os.path.isfile(path_for(upload.name))
+    if created:
+        move(upload.tmp_path, target_path(upload.name))
+    else:
+        os.unlink(upload.tmp_path)
+    return created
+
+
+def discard_upload(upload: StoredUpload) -> None:
+    if os.path.exists(upload.tmp_path):
+        os.unlink(upload.tmp_path)
+
+
+def encoded_name(name: str) -> str:
+    # Sidecar with the base64 representation of a stored file
+    # thumb-3cda3e6df79c9ee99f41.png >> thumb-3cda3e6df79c9ee99f41.png.b64
+    return name + ENCODED_SUFFIX
+
+
+def write_encoded(name: str) -> str:
+    with open(path_for(name), "rb") as fo:
+        base64_content = base64.b64encode(fo.read())
+    # Write to a temporary name first so readers never see a partial sidecar
+    encoded_path = target_path(encoded_name(name))
+    with open(encoded_path + ".tmp", "wb") as fo:
+        fo.write(base64_content)
+    os.replace(encoded_path + ".tmp", encoded_path)
+    return base64_content.decode()
+
+
+def read_encoded(name: str) -> Optional[str]:
+    try:
+        with open(path_for(encoded_name(name)), "rb") as fo:
+            return fo.read().decode()
+    except FileNotFoundError:
+        return None
+
+
+def remove_if_exists(name: str) -> None:
+    if os.path.exists(path_for(name)):
+        remove(name)
+
+
+def remove(name: str) -> None:
+    # Every copy, a file being migrated may be in both layouts for a while
+    os.unlink(path_for(name))
+    for stored_name in (name, encoded_name(name)):
+        for path in locations(stored_name):
+            if os.path.exists(path):
+                os.unlink(path)
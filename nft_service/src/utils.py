@@ -1,5 +1,21 @@
-from datetime import datetime
-from fastapi import Header
+from nft_service.src import config as cf
+from nft_service.src.exceptions import BadRequest
+from datetime import date, datetime, timezone
+from email.utils import format_datetime as format_http_datetime, parsedate_to_datetime
+from fastapi import Header, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.types import Message, Receive
+from typing import Any, Callable, Coroutine, Iterable, List, Optional, Set, Tuple, TypeVar, Union
+import base64
+import binascii
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+NEXT_CURSOR_HEADER: str = "X-Next-Cursor"
+TOTAL_COUNT_HEADER: str = "X-Total-Count"
 
 
 def format_datetime(dt: datetime) -> str:
@@ -10,7 +26,165 @@ def format_date(dt: datetime) -> str:
     return dt.strftime("%d-%m-%Y")
 
 
-# Dont allow files greater than ~1.5MB
-async def valid_content_length(content_length: int = Header(..., lt=1_500_000)) -> int:
-    print(content_length)
+# Dont allow files greater than MAX_UPLOAD_BYTES (~1.5MB)
+MAX_BODY_BYTES: int = cf.MAX_UPLOAD_BYTES + cf.MULTIPART_OVERHEAD_BYTES
+
+
+async def valid_content_length(
+    content_length: Optional[int] = Header(default=None, lt=MAX_BODY_BYTES)
+) -> Optional[int]:
+    # Only rejects early the bodies declared too large, the bytes actually received are bounded by BoundedBodyRoute
     return content_length
+
+
+def bounded_receive(receive: Receive, max_bytes: int) -> Receive:
+    received = 0
+
+    async def receive_within_budget() -> Message:
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                # HTTPException because FastAPI turns anything else raised while parsing the body into a 400
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Request body too large"
+                )
+        return message
+
+    return receive_within_budget
+
+
+def max_body_bytes(limit: int) -> Callable[[F], F]:
+    # Budget of the request body of an endpoint accepting more than a single upload, see BoundedBodyRoute
+    def decorator(endpoint: F) -> F:
+        endpoint.max_body_bytes = limit  # type: ignore[attr-defined]
+        return endpoint
+
+    return decorator
+
+
+class BoundedBodyRoute(APIRoute):
+    """Route that stops reading the request body once it goes over the upload budget.
+
+    Content-Length can be missing (chunked uploads) or lie, so the bytes are counted as they arrive
+    instead, before they are parsed and spooled to disk. The budget is MAX_BODY_BYTES unless the
+    endpoint sets its own with max_body_bytes.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def bounded_handler(request: Request) -> Response:
+            max_bytes = getattr(self.endpoint, "max_body_bytes", MAX_BODY_BYTES)
+            return await handler(Request(request.scope, bounded_receive(request.receive, max_bytes)))
+
+        return bounded_handler
+
+
+def encode_cursor(sort_value: Union[date, float], id: int) -> str:
+    # (creation_date, id) of the last row of a page >> "MjAyMy0wMS0zMFQxMDoxNTozMHwxMg=="
+    # Search results are sorted by relevance instead, so their cursor holds the (score, id)
+    value = sort_value.isoformat() if isinstance(sort_value, date) else repr(sort_value)
+    raw = f"{value}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, parse_sort_value: Callable[[str], Any] = datetime.fromisoformat) -> Tuple[Any, int]:
+    try:
+        sort_value, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return parse_sort_value(sort_value), int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise BadRequest(details="Invalid pagination cursor", exception=e)
+
+
+def set_next_cursor(response: Response, items: List[Any], limit: int, sort_field: str = "creation_date") -> None:
+    # A page shorter than the limit is the last one, so there is nothing to continue from
+    if items and len(items) == limit and items[-1].id is not None:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_field), last.id)
+
+
+def negotiate_image_format(accept: Optional[str], preferred: List[str], default: str) -> str:
+    # First of the preferred formats with the highest quality in the Accept header,
+    # e.g. "image/avif,image/webp,*/*;q=0.8". Wildcards alone keep the default.
+    qualities = {}
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.lower()] = quality
+
+    best = max(preferred, key=lambda image_format: qualities.get(f"image/{image_format}", 0.0))
+    return best if qualities.get(f"image/{best}", 0.0) > 0 else default
+
+
+def set_total_count(response: Response, total: Optional[int]) -> None:
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+
+def http_date(dt: datetime) -> str:
+    # Dates are stored without timezone, HTTP dates have second precision
+    return format_http_datetime(dt.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Invalid dates are ignored as stated by the HTTP spec
+        return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match: "abc", W/"def" or *
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def is_not_modified(
+    etag: str, last_modified: datetime, if_none_match: Optional[str], if_modified_since: Optional[str]
+) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since when both are sent
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    since = parse_http_date(if_modified_since)
+    return since is not None and last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+
+
+def set_cache_validators(response: Response, etag: Optional[str], last_modified: Optional[datetime]) -> None:
+    if etag:
+        response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def parse_fields(fields: str, allowed: Iterable[str]) -> Set[str]:
+    # "id, owner,price" >> {"id", "owner", "price"}
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected.difference(allowed)
+    if unknown:
+        raise BadRequest(details=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def sparse_response(
+    http_response: Response, items: List[BaseModel], fields: Optional[Set[str]]
+) -> Union[List[BaseModel], ORJSONResponse]:
+    # Projected items lack required fields so they can't go through the response model.
+    # They are encoded here keeping the headers already set on the response.
+    if fields is None:
+        return items
+    content = [jsonable_encoder(item, include=fields) for item in items]
+    return ORJSONResponse(content, headers=http_response.headers)
@@ -0,0 +1,67 @@
+from nft_service.src.models.nft import NFT, NFTFile
+from nft_service.src.models.user import User
+from nft_service.src.db import counts
+from nft_service.src.schemas.request_schema import CountMode
+from fastapi import BackgroundTasks, status
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+import tests.utils as utils
+import pytest
+from datetime import datetime
+
+
+async def _run(background_tasks: BackgroundTasks) -> None:
+    await background_tasks()
+
+
+@pytest.mark.asyncio
+async def test_exact_count_maintained_on_commit_ok(client: TestClient, session: Session) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    utils._new_NFT(file_id=file_obj.id, owner_id=owner.id, session=session)  # type: ignore
+
+    # Unknown until the first recount, which is left for after the response
+    background_tasks = BackgroundTasks()
+    assert counts.total_count(session, NFT, CountMode.EXACT, background_tasks) is None
+    assert len(background_tasks.tasks) == 1
+    await _run(background_tasks)
+
+    background_tasks = BackgroundTasks()
+    assert counts.total_count(session, NFT, CountMode.EXACT, background_tasks) == 1
+    assert not background_tasks.tasks
+
+    # Committed inserts are counted without counting again, rolled back ones are not
+    utils._new_NFT(file_id=file_obj.id, owner_id=owner.id, session=session)  # type: ignore
+    rolled_back = NFT(
+        creation_date=datetime.now(), file_id=file_obj.id, owner_id=owner.id, description="Rolled back"
+    )
+    utils.fill_obj_with_audit_data(rolled_back)
+    session.add(rolled_back)
+    session.flush()
+    session.rollback()
+
+    assert counts.total_count(session, NFT, CountMode.EXACT, BackgroundTasks()) == 2
+
+
+def test_approximate_count_never_recounts_ok(client: TestClient, session: Session) -> None:
+    background_tasks = BackgroundTasks()
+    counts.total_count(session, NFT, CountMode.APPROXIMATE, background_tasks)
+    assert not background_tasks.tasks
+
+
+@pytest.mark.asyncio
+async def test_list_sends_total_count_header_ok(client: TestClient, session: Session) -> None:
+    user: User = utils.persist_new_user("test-user", session)
+    utils.persist_new_user_balance(user.id, initial_amount=0, final_amount=1, session=session)  # type: ignore
+
+    # The first request only schedules the recount
+    response = client.get("/balance/?count=exact")
+    assert response.status_code == status.HTTP_200_OK
+    assert "X-Total-Count" not in response.headers
+
+    response = client.get("/balance/?count=exact")
+    assert response.headers["X-Total-Count"] == "1"
+
+    # Without asking for it the header is not sent
+    response = client.get("/balance/")
+    assert "X-Total-Count" not in response.headers
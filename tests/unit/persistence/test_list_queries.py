@@ -0,0 +1,179 @@
+from nft_service.src.models.nft import NFT, NFTFile
+from nft_service.src.models.user import User
+from nft_service.src.context import Context
+from nft_service.src.db.repositories.nft import NFTRepository
+from nft_service.src.db.repositories.transaction import TransactionRepository
+from nft_service.src.db.repositories.balance import BalanceRepository
+from nft_service.src.services.nft_service import NFTService
+from nft_service.src.schemas.request_schema import SearchRequest
+from sqlalchemy import event
+from sqlmodel import Session
+from fastapi.testclient import TestClient
+import tests.utils as utils
+import pytest
+from typing import Any, Callable, Coroutine, List
+
+
+async def _count_queries(session: Session, load_page: Callable[[], Coroutine[Any, Any, List[Any]]]) -> int:
+    # Expire everything loaded so far so that every relation has to be fetched from the db again
+    session.expire_all()
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:  # type: ignore
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        await load_page()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+def _persist_nfts(session: Session, owner: User, cocreators: List[User], amount: int) -> None:
+    for _ in range(amount):
+        file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+        utils._new_NFT(file_id=file_obj.id, owner_id=owner.id, session=session, cocreators=cocreators)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_nft_page_query_count_does_not_depend_on_page_size_ok(client: TestClient, session: Session) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    cocreators: List[User] = [utils.persist_new_user(f"test-cocreator-{i}", session) for i in range(3)]
+    repo = NFTRepository(session, Context.default_context())
+
+    async def load_page() -> List[NFT]:
+        nft_list: List[NFT] = await repo.get_all(offset=0, limit=50)
+        for nft_obj in nft_list:
+            assert nft_obj.owner and nft_obj.file and nft_obj.creators
+        return nft_list
+
+    _persist_nfts(session, owner, cocreators, 1)
+    single_row_queries = await _count_queries(session, load_page)
+
+    _persist_nfts(session, owner, cocreators, 49)
+    full_page_queries = await _count_queries(session, load_page)
+
+    assert single_row_queries == full_page_queries
+
+
+@pytest.mark.asyncio
+async def test_nft_page_only_loads_requested_relations_ok(client: TestClient, session: Session) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    _persist_nfts(session, owner, [], 5)
+    repo = NFTRepository(session, Context.default_context())
+
+    async def load_page() -> List[NFT]:
+        return await repo.get_all(offset=0, limit=50, relations=["owner"])
+
+    # One query for the page plus one for the owners
+    assert await _count_queries(session, load_page) == 2
+
+
+@pytest.mark.asyncio
+async def test_transaction_and_balance_page_query_count_does_not_depend_on_page_size_ok(
+    client: TestClient, session: Session
+) -> None:
+    buyer: User = utils.persist_new_user("test-buyer-user", session)
+    seller: User = utils.persist_new_user("test-seller-user", session)
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=seller.id, session=session)  # type: ignore
+    context = Context.default_context()
+    trx_repo = TransactionRepository(session, context)
+    balance_repo = BalanceRepository(session, context)
+
+    async def load_transactions() -> List[Any]:
+        rows = await trx_repo.get_all(offset=0, limit=50)
+        for row in rows:
+            assert row.buyer and row.seller
+        return rows
+
+    async def load_balances() -> List[Any]:
+        rows = await balance_repo.get_all(offset=0, limit=50)
+        for row in rows:
+            assert row.user
+        return rows
+
+    def persist_rows(amount: int) -> None:
+        for _ in range(amount):
+            utils.persist_new_transaction(
+                buyer.id, seller.id, nft_id=nft_obj.id, price=1, session=session  # type: ignore
+            )
+            utils.persist_new_user_balance(buyer.id, initial_amount=0, final_amount=1, session=session)  # type: ignore
+
+    persist_rows(1)
+    single_row_counts = (
+        await _count_queries(session, load_transactions),
+        await _count_queries(session, load_balances),
+    )
+
+    persist_rows(49)
+    full_page_counts = (
+        await _count_queries(session, load_transactions),
+        await _count_queries(session, load_balances),
+    )
+
+    assert single_row_counts == full_page_counts
+
+
+@pytest.mark.asyncio
+async def test_nft_page_without_file_skips_file_table_ok(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    _persist_nfts(session, owner, [], 5)
+    service = NFTService(session, Context.default_context())
+
+    async def thumbnail_response(*args, **kargs) -> Any:  # type: ignore
+        raise AssertionError("thumbnails should not be read")
+
+    monkeypatch.setattr(service, "_thumbnail_response", thumbnail_response)
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:  # type: ignore
+        statements.append(statement)
+
+    session.expire_all()
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        nft_list = await service.get_all(SearchRequest(), fields={"id", "owner"})
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    # One query for the page plus one for the owners, none of them reading the description or the file
+    assert len(statements) == 2
+    assert not any("nft_file" in statement or "description" in statement for statement in statements)
+    assert len(nft_list) == 5
+    assert nft_list[0].owner.username == "test-owner-user"
+    assert not hasattr(nft_list[0], "file")
+
+
+@pytest.mark.asyncio
+async def test_nft_page_filtered_by_owner_and_creator_ok(client: TestClient, session: Session) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    other_owner: User = utils.persist_new_user("test-other-owner-user", session)
+    cocreator: User = utils.persist_new_user("test-cocreator", session)
+    _persist_nfts(session, owner, [cocreator], 3)
+    _persist_nfts(session, owner, [], 2)
+    _persist_nfts(session, other_owner, [cocreator], 1)
+    repo = NFTRepository(session, Context.default_context())
+
+    owned = await repo.get_all(offset=0, limit=50, owner="test-owner-user")
+    assert len(owned) == 5
+    assert {nft_obj.owner_id for nft_obj in owned} == {owner.id}
+
+    cocreated = await repo.get_all(offset=0, limit=50, creator="test-cocreator")
+    assert len(cocreated) == 4
+    assert all(cocreator in nft_obj.creators for nft_obj in cocreated)
+
+    both = await repo.get_all(offset=0, limit=2, owner="test-owner-user", creator="test-cocreator")
+    last = both[-1]
+    rest = await repo.get_all(
+        offset=0, limit=2, owner="test-owner-user", creator="test-cocreator", cursor=(last.creation_date, last.id)
+    )
+    assert len(both) == 2 and len(rest) == 1
+    assert {nft_obj.id for nft_obj in both + rest} == {nft_obj.id for nft_obj in cocreated if nft_obj in owned}
+
+    assert await repo.get_all(offset=0, limit=50, owner="unknown-user") == []
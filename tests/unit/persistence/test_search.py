@@ -0,0 +1,100 @@
+from nft_service.src.models.nft import NFTFile
+from nft_service.src.models.user import User
+from nft_service.src.context import Context
+from nft_service.src.db.repositories.nft import NFTRepository
+from nft_service.src.db import search
+from nft_service.src.db.search import InvertedIndex
+from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.services.nft_service import NFTService
+from nft_service.src.schemas.nft_schema import NFTSearchResponse, NFTThumbnailResponse, ThumbnailMode
+from nft_service.src import utils as src_utils
+from sqlalchemy.dialects import mysql
+from sqlmodel import Session
+from fastapi.testclient import TestClient
+import tests.utils as utils
+import pytest
+from typing import Any, List
+
+
+def _persist_nft(session: Session, owner: User, description: str) -> int:
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    nft_obj = utils._new_NFT(
+        file_id=file_obj.id, owner_id=owner.id, session=session, description=description  # type: ignore
+    )
+    return nft_obj.id  # type: ignore
+
+
+def test_inverted_index_ranks_by_relevance_ok() -> None:
+    index = InvertedIndex()
+    index.add(1, "A puppy")
+    index.add(2, "A puppy playing with another puppy")
+    index.add(3, "A kitten")
+
+    assert [nft_id for _, nft_id in index.search("PUPPY")] == [2, 1]
+    assert index.search("dog") == []
+
+    # Updated descriptions replace the previous ones
+    index.add(3, "A puppy and a kitten")
+    assert {nft_id for _, nft_id in index.search("puppy")} == {1, 2, 3}
+    index.remove(2)
+    assert {nft_id for _, nft_id in index.search("puppy")} == {1, 3}
+
+
+@pytest.mark.asyncio
+async def test_search_pages_by_relevance_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    best_id = _persist_nft(session, owner, "Golden puppy with a puppy hat")
+    ids = [_persist_nft(session, owner, f"Puppy number {i}") for i in range(3)]
+    _persist_nft(session, owner, "A kitten")
+
+    service = NFTService(session, Context.default_context())
+
+    async def thumbnail_response(file_obj: NFTFile, mode: ThumbnailMode) -> NFTThumbnailResponse:
+        return NFTThumbnailResponse(filename=file_obj.filename)
+
+    monkeypatch.setattr(service, "_thumbnail_response", thumbnail_response)
+    first_page: List[NFTSearchResponse] = await service.search(
+        "puppy", SearchRequest(limit=2), ThumbnailMode.REFERENCE
+    )
+    assert [nft.id for nft in first_page] == [best_id, ids[2]]
+    assert first_page[0].score > first_page[1].score
+
+    cursor = src_utils.encode_cursor(first_page[-1].score, first_page[-1].id)
+    second_page = await service.search("puppy", SearchRequest(limit=2, cursor=cursor), ThumbnailMode.REFERENCE)
+    assert [nft.id for nft in second_page] == [ids[1], ids[0]]
+
+    # NFTs minted after the index was built are found too
+    await NFTRepository(session, Context.default_context()).create(
+        owner_id=owner.id, description="Another puppy", creators=[], file_id=1, commit=True  # type: ignore
+    )
+    found = await service.search("another", SearchRequest(), ThumbnailMode.REFERENCE)
+    assert [nft.description for nft in found] == ["Another puppy"]
+
+
+@pytest.mark.asyncio
+async def test_search_index_updated_on_commit_ok(client: TestClient, session: Session) -> None:
+    owner: User = utils.persist_new_user("test-owner-user", session)
+    index = search.get_index(session)
+    repo = NFTRepository(session, Context.default_context())
+
+    nft_obj = await repo.create(
+        owner_id=owner.id, description="Rolled back puppy", creators=[], file_id=1, commit=False  # type: ignore
+    )
+    assert index.search("puppy") == []
+    session.rollback()
+    assert index.search("puppy") == []
+
+    nft_obj = await repo.create(
+        owner_id=owner.id, description="Committed puppy", creators=[], file_id=1, commit=False  # type: ignore
+    )
+    assert index.search("puppy") == []
+    session.commit()
+    assert [nft_id for _, nft_id in index.search("puppy")] == [nft_obj.id]
+
+
+def test_mysql_search_uses_fulltext_index_ok() -> None:
+    repo = NFTRepository(None, Context.default_context())  # type: ignore
+    sql = str(repo.fulltext_query("puppy", 0, 10, cursor=(1.5, 7)).compile(dialect=mysql.dialect()))
+
+    assert "MATCH (nft.description) AGAINST" in sql
+    assert "ORDER BY MATCH (nft.description) AGAINST (%s IN NATURAL LANGUAGE MODE) DESC, nft.id DESC" in sql
@@ -1,18 +1,30 @@
 from nft_service.src.schemas.transaction_schema import TransactionResponse
-from nft_service.src.schemas.nft_schema import NFTFetchResponse, NFTFileResponse, NFTResponse, NFTThumbnailResponse
+from nft_service.src.schemas.nft_schema import (
+    FileMode,
+    MintJobResponse,
+    MintJobStatus,
+    NFTBatchItemResponse,
+    NFTBulkMintItemResponse,
+    NFTFetchResponse,
+    NFTFileResponse,
+    NFTResponse,
+    NFTSearchResponse,
+    NFTThumbnailResponse,
+)
 from nft_service.src.schemas.user_schema import UserResponse
 from nft_service.src.models.nft import NFTFile
 from nft_service.src.models.user import User
 from nft_service.src.routers import nft_router
 from nft_service.src.context import Context
-from nft_service.src.exceptions import NotFound, InternalError, BadRequest
+from nft_service.src.exceptions import NotFound, NotModified, InternalError, BadRequest, ServiceUnavailable
 from fastapi.exceptions import RequestValidationError
 from fastapi.testclient import TestClient
 from fastapi import status
 import pytest
 import os
 import pkg_resources
-from typing import Any, List
+import json
+from typing import Any, AsyncIterator, List
 from sqlmodel import Session
 from datetime import datetime
 from tests import utils
@@ -20,6 +32,7 @@ from datetime import date
 
 NFT_ENDPOINT: str = "/nft/"
 MINT_ENDPOINT: str = "/nft/mint/"
+MINT_BULK_ENDPOINT: str = "/nft/mint/bulk/"
 BUY_ENDPOINT: str = "/nft/buy/"
 SELL_ENDPOINT: str = "/nft/sell/"
 RESOURCES_PATH: str = os.path.join(os.path.dirname(__file__), "../resources/static/")
@@ -54,6 +67,138 @@ async def test_fetch_nft_ok(client: TestClient, session: Session, monkeypatch: A
     assert response_json["creators"] == []
 
 
+@pytest.mark.asyncio
+async def test_fetch_nft_conditional_ok(client: TestClient, monkeypatch: Any) -> None:
+    nft_fake_id = 99
+    etag = '"dummy-hash-1"'
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def fetch(*args, **kargs) -> NFTFetchResponse:  # type: ignore
+        received.update(kargs)
+        if kargs["if_none_match"] == etag:
+            raise NotModified(etag=etag, last_modified="Mon, 02 Jan 2023 10:00:00 GMT")
+        response = NFTFetchResponse(
+            id=1,
+            creation_date=datetime.now(),
+            description="dummy_description",
+            owner=UserResponse(id=1, username="dummy-user", date_=date.today()),
+            creators=[],
+            file=NFTFileResponse(filename="puppy.jpg", file="dummy-base64"),
+        )
+        response.set_validators(etag, datetime(2023, 1, 2, 10))
+        return response
+
+    monkeypatch.setattr(nft_router.NFTService, "fetch", fetch)
+
+    # Verify a matching If-None-Match gets an empty 304
+    response = client.get(f"{NFT_ENDPOINT}{nft_fake_id}", headers={"If-None-Match": etag})
+    assert received["if_none_match"] == etag
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    # Verify the validators are sent with the body
+    response = client.get(f"{NFT_ENDPOINT}{nft_fake_id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] == etag
+    assert response.headers["Last-Modified"] == "Mon, 02 Jan 2023 10:00:00 GMT"
+
+    # Verify the cached response is also validated
+    received.clear()
+    response = client.get(f"{NFT_ENDPOINT}{nft_fake_id}", headers={"If-None-Match": etag})
+    assert not received
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_ok(client: TestClient, monkeypatch: Any) -> None:
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def fetch_many(self, ids, *args, **kargs) -> List[NFTBatchItemResponse]:  # type: ignore
+        received["ids"] = ids
+        return [
+            NFTBatchItemResponse(
+                id=1,
+                found=True,
+                nft=NFTFetchResponse(
+                    id=1,
+                    creation_date=datetime.now(),
+                    description="dummy_description",
+                    owner=UserResponse(id=1, username="dummy-user", date_=date.today()),
+                    creators=[],
+                    file=NFTFileResponse(filename="puppy.jpg", file="dummy-base64"),
+                ),
+            ),
+            NFTBatchItemResponse(id=99, found=False),
+        ]
+
+    monkeypatch.setattr(nft_router.NFTService, "fetch_many", fetch_many)
+
+    response = client.get(f"{NFT_ENDPOINT}batch?ids=1&ids=99")
+
+    # Verify endpoint returns 200 with an item per requested id
+    response_json = response.json()
+    assert response.status_code == status.HTTP_200_OK
+    assert received["ids"] == [1, 99]
+    assert response_json[0]["found"] is True
+    assert response_json[0]["nft"]["description"] == "dummy_description"
+    assert response_json[1] == dict(id=99, found=False, nft=None)
+
+
+@pytest.mark.asyncio
+async def test_search_ok(client: TestClient, monkeypatch: Any) -> None:
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def search(self, text, search_request, *args, **kargs) -> List[NFTSearchResponse]:  # type: ignore
+        received["text"] = text
+        return [
+            NFTSearchResponse(
+                id=1,
+                creation_date=datetime.now(),
+                description="dummy puppy",
+                owner=UserResponse(id=1, username="dummy-user", date_=date.today()),
+                creators=[],
+                file=NFTThumbnailResponse(filename="puppy.jpg", url="/nft/thumbnail/thumb-puppy.jpg"),
+                score=1.5,
+            )
+        ]
+
+    monkeypatch.setattr(nft_router.NFTService, "search", search)
+
+    response = client.get(f"{NFT_ENDPOINT}search?q=puppy&limit=1")
+
+    # Verify endpoint returns 200 with a cursor to continue from the score of the last result
+    assert response.status_code == status.HTTP_200_OK
+    assert received["text"] == "puppy"
+    assert response.json()[0]["score"] == 1.5
+    assert "X-Next-Cursor" in response.headers
+
+    # Verify the text to search is required
+    response = client.get(f"{NFT_ENDPOINT}search")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_get_all_filtered_ok(client: TestClient, monkeypatch: Any) -> None:
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def get_all(self, search_request, thumbnail_mode, fields, filters) -> List[NFTResponse]:  # type: ignore
+        received["filters"] = filters
+        return []
+
+    monkeypatch.setattr(nft_router.NFTService, "get_all", get_all)
+
+    response = client.get(f"{NFT_ENDPOINT}?owner=test-owner&creator=test-creator")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert received["filters"].owner == "test-owner"
+    assert received["filters"].creator == "test-creator"
+
+
 @pytest.mark.asyncio
 async def test_fetch_nft_404_err(client: TestClient, monkeypatch: Any) -> None:
     nft_fake_id = 99
@@ -210,6 +355,50 @@ async def test_mint_nft_ok(client: TestClient, session: Session, monkeypatch: An
         assert response_json["creators"] == []
 
 
+@pytest.mark.asyncio
+async def test_mint_bulk_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    user: User = utils.persist_new_user(username="test-user", session=session)
+
+    def mocked_default_context() -> Any:
+        context: Context = Context(username=user.username, system_date=datetime.now(), user_ip="localhost")
+        return context
+
+    monkeypatch.setattr(nft_router.Context, "default_context", mocked_default_context)
+    received: List[Any] = []
+
+    # We are testing only the endpoint so we mock de service
+    async def add_many(self, requests, files) -> List[NFTBulkMintItemResponse]:  # type: ignore
+        for request, file in zip(requests, files):
+            received.append((request.description, request.creators, file.filename))
+        return [
+            NFTBulkMintItemResponse(index=0, filename="puppy.jpg", created=True, nft_id=1),
+            NFTBulkMintItemResponse(index=1, filename="other.jpg", created=False, error="Unknown creators: unknown"),
+        ]
+
+    monkeypatch.setattr(nft_router.NFTService, "add_many", add_many)
+
+    metadata = {"items": [{"description": "first", "creators": []}, {"description": "second", "creators": ["unknown"]}]}
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        content = fo.read()
+    files = [("files", ("puppy.jpg", content, "image/jpeg")), ("files", ("other.jpg", content, "image/jpeg"))]
+    response = client.post(MINT_BULK_ENDPOINT, files=files, data={"metadata": json.dumps(metadata)})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert received == [("first", [], "puppy.jpg"), ("second", ["unknown"], "other.jpg")]
+    assert [item["created"] for item in response.json()] == [True, False]
+    assert response.json()[1]["error"] == "Unknown creators: unknown"
+
+    # Metadata that is not valid is rejected before minting anything
+    response = client.post(MINT_BULK_ENDPOINT, files=files, data={"metadata": "[{"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # So are files that are not images
+    files.append(("files", ("nft.txt", b"dummy", "text/plain")))
+    response = client.post(MINT_BULK_ENDPOINT, files=files, data={"metadata": json.dumps(metadata)})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert len(received) == 2
+
+
 @pytest.mark.asyncio
 async def test_mint_nft_400_err(client: TestClient, session: Session, monkeypatch: Any) -> None:
     # First persist some user to acts as logged user
@@ -240,6 +429,97 @@ async def test_mint_nft_400_err(client: TestClient, session: Session, monkeypatc
         assert response_json["detail"] == "dummy exception"
 
 
+@pytest.mark.asyncio
+async def test_mint_nft_in_background_ok(client: TestClient, monkeypatch: Any) -> None:
+    data = {"description": "dummy_description"}
+    scheduled: List[int] = []
+
+    # We are testing only the endpoint so we mock de service
+    async def add_in_background(self, request, file, background_tasks) -> MintJobResponse:  # type: ignore
+        background_tasks.add_task(scheduled.append, 1)
+        return MintJobResponse(
+            id=1,
+            status=MintJobStatus.PENDING,
+            created_at=datetime.now(),
+            modified_at=datetime.now(),
+            url="/nft/mint/jobs/1",
+        )
+
+    monkeypatch.setattr(nft_router.NFTService, "add_in_background", add_in_background)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        files = {"file": fo}
+        response = client.post(MINT_ENDPOINT, files=files, data=data, params={"background": True})
+
+    # Verify endpoint returns 202 pointing to the job, whose work runs after the response
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.headers["location"] == "/nft/mint/jobs/1"
+    assert response.json()["status"] == "pending"
+    assert scheduled == [1]
+
+
+@pytest.mark.asyncio
+async def test_get_mint_job_ok(client: TestClient, monkeypatch: Any) -> None:
+    # We are testing only the endpoint so we mock de service
+    async def mint_job(self, job_id) -> MintJobResponse:  # type: ignore
+        if job_id != 1:
+            raise NotFound(details="dummy exception")
+        return MintJobResponse(
+            id=job_id,
+            status=MintJobStatus.DONE,
+            nft_id=7,
+            created_at=datetime.now(),
+            modified_at=datetime.now(),
+            url="/nft/mint/jobs/1",
+        )
+
+    monkeypatch.setattr(nft_router.NFTService, "mint_job", mint_job)
+
+    response = client.get(f"{MINT_ENDPOINT}jobs/1")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "done"
+    assert response.json()["nft_id"] == 7
+
+    assert client.get(f"{MINT_ENDPOINT}jobs/2").status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_413_err(client: TestClient, monkeypatch: Any) -> None:
+    # The budget is enforced on the bytes received, whatever the declared Content-Length
+    monkeypatch.setattr("nft_service.src.utils.MAX_BODY_BYTES", 1000)
+
+    async def add(*args, **kargs) -> NFTFetchResponse:  # type: ignore
+        raise AssertionError("the body should not be accepted")
+
+    monkeypatch.setattr(nft_router.NFTService, "add", add)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        files = {"file": fo}
+        response = client.post(MINT_ENDPOINT, files=files, data={"description": "dummy_description"})
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_503_err(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    data = {"description": "dummy_description"}
+
+    # We are testing only the endpoint so we mock de service
+    async def add(*args, **kargs) -> NFTFetchResponse:  # type: ignore
+        raise ServiceUnavailable(details="dummy exception", retry_after=5)
+
+    monkeypatch.setattr(nft_router.NFTService, "add", add)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        files = {"file": fo}
+        response = client.post(MINT_ENDPOINT, files=files, data=data)
+
+        # Verify endpoint returns 503 telling the client when to retry
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["retry-after"] == "5"
+        assert response.json()["detail"] == "dummy exception"
+
+
 @pytest.mark.asyncio
 async def test_mint_nft_422_err(client: TestClient, session: Session, monkeypatch: Any) -> None:
     # First persist some user to acts as logged user
@@ -546,3 +826,184 @@ async def test_sell_nft_500_err(client: TestClient, session: Session, monkeypatc
     response_json = response.json()
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert response_json["detail"] == "dummy exception"
+
+
+@pytest.mark.asyncio
+async def test_get_thumbnail_ok(client: TestClient, monkeypatch: Any) -> None:
+    static_path = os.path.dirname(pkg_resources.resource_filename("tests.resources", "thumb-puppy.jpg")) + "/"
+    monkeypatch.setattr(nft_router.cf, "STATIC_PATH", static_path)
+
+    response = client.get(f"{NFT_ENDPOINT}thumbnail/thumb-puppy.jpg")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "immutable" in response.headers["cache-control"]
+    with open(f"{static_path}thumb-puppy.jpg", "rb") as fo:
+        assert response.content == fo.read()
+
+
+@pytest.mark.asyncio
+async def test_get_thumbnail_404_err(client: TestClient, monkeypatch: Any) -> None:
+    static_path = os.path.dirname(pkg_resources.resource_filename("tests.resources", "thumb-puppy.jpg")) + "/"
+    monkeypatch.setattr(nft_router.cf, "STATIC_PATH", static_path)
+
+    # Only existing thumbnails can be downloaded
+    assert client.get(f"{NFT_ENDPOINT}thumbnail/thumb-missing.jpg").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"{NFT_ENDPOINT}thumbnail/puppy.jpg").status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_get_thumbnail_range_ok(client: TestClient, monkeypatch: Any) -> None:
+    static_path = os.path.dirname(pkg_resources.resource_filename("tests.resources", "thumb-puppy.jpg")) + "/"
+    monkeypatch.setattr(nft_router.cf, "STATIC_PATH", static_path)
+    with open(f"{static_path}thumb-puppy.jpg", "rb") as fo:
+        content = fo.read()
+
+    response = client.get(f"{NFT_ENDPOINT}thumbnail/thumb-puppy.jpg", headers={"Range": "bytes=10-19"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["content-range"] == f"bytes 10-19/{len(content)}"
+    assert response.content == content[10:20]
+
+    response = client.get(f"{NFT_ENDPOINT}thumbnail/thumb-puppy.jpg", headers={"Range": "bytes=-5"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[-5:]
+
+    # Ranges past the end of the file can't be served
+    response = client.get(f"{NFT_ENDPOINT}thumbnail/thumb-puppy.jpg", headers={"Range": f"bytes={len(content)}-"})
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+    # Several ranges are answered with the whole file
+    response = client.get(f"{NFT_ENDPOINT}thumbnail/thumb-puppy.jpg", headers={"Range": "bytes=0-1,5-6"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.content == content
+
+
+@pytest.mark.asyncio
+async def test_get_file_ok(client: TestClient, monkeypatch: Any) -> None:
+    static_path = os.path.dirname(pkg_resources.resource_filename("tests.resources", "puppy.jpg")) + "/"
+    monkeypatch.setattr(nft_router.cf, "STATIC_PATH", static_path)
+    with open(f"{static_path}puppy.jpg", "rb") as fo:
+        content = fo.read()
+
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "immutable" in response.headers["cache-control"]
+    assert response.content == content
+
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg", headers={"Range": "bytes=100-"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[100:]
+
+
+@pytest.mark.asyncio
+async def test_get_file_not_modified_ok(client: TestClient, monkeypatch: Any) -> None:
+    static_path = os.path.dirname(pkg_resources.resource_filename("tests.resources", "puppy.jpg")) + "/"
+    monkeypatch.setattr(nft_router.cf, "STATIC_PATH", static_path)
+    with open(f"{static_path}puppy.jpg", "rb") as fo:
+        content = fo.read()
+
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg")
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    assert etag.startswith('"')
+
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert "immutable" in response.headers["cache-control"]
+    assert "content-type" not in response.headers
+
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # The range is only sent if the client has part of this same file
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg", headers={"Range": "bytes=100-", "If-Range": etag})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == content[100:]
+    response = client.get(f"{NFT_ENDPOINT}file/puppy.jpg", headers={"Range": "bytes=100-", "If-Range": '"other"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == content
+
+
+@pytest.mark.asyncio
+async def test_get_file_404_err(client: TestClient, monkeypatch: Any) -> None:
+    static_path = os.path.dirname(pkg_resources.resource_filename("tests.resources", "puppy.jpg")) + "/"
+    monkeypatch.setattr(nft_router.cf, "STATIC_PATH", static_path)
+
+    # Only stored images can be downloaded, thumbnails have their own endpoint
+    assert client.get(f"{NFT_ENDPOINT}file/missing.jpg").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"{NFT_ENDPOINT}file/thumb-puppy.jpg").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"{NFT_ENDPOINT}file/bad_nft_format.txt").status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_fetch_reference_ok(client: TestClient, monkeypatch: Any) -> None:
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def fetch(self, nft_id, if_none_match, if_modified_since, file_mode) -> NFTFetchResponse:  # type: ignore
+        received["file_mode"] = file_mode
+        response = NFTFetchResponse(
+            id=nft_id,
+            creation_date=datetime.now(),
+            description="dummy_description",
+            owner=UserResponse(id=1, date_=date.today(), username="test-user"),
+            creators=[],
+            file=NFTFileResponse(filename="puppy.jpg", url="/nft/file/puppy.jpg"),
+        )
+        response.set_validators('"puppy.jpg-1-ref"', datetime.now())
+        return response
+
+    monkeypatch.setattr(nft_router.NFTService, "fetch", fetch)
+
+    response = client.get(f"{NFT_ENDPOINT}1", params={"file_mode": "ref"})
+    assert response.status_code == status.HTTP_200_OK
+    assert received["file_mode"] == FileMode.REFERENCE
+    assert response.headers["etag"] == '"puppy.jpg-1-ref"'
+    assert response.json()["file"] == {"filename": "puppy.jpg", "file": None, "url": "/nft/file/puppy.jpg"}
+
+
+@pytest.mark.asyncio
+async def test_get_image_variant_ok(client: TestClient, monkeypatch: Any) -> None:
+    path = pkg_resources.resource_filename("tests.resources", "thumb-puppy.jpg")
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def image_variant(self, nft_id, size, image_format, accept) -> Any:  # type: ignore
+        received.update(size=size, image_format=image_format, accept=accept)
+        return path, "jpeg"
+
+    monkeypatch.setattr(nft_router.NFTService, "image_variant", image_variant)
+
+    response = client.get(f"{NFT_ENDPOINT}1/image?size=128", headers={"Accept": "image/jpeg"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert received == dict(size=128, image_format=None, accept="image/jpeg")
+    assert response.headers["content-type"] == "image/jpeg"
+    # The format was negotiated, so caches must key on Accept
+    assert response.headers["vary"] == "Accept"
+
+    response = client.get(f"{NFT_ENDPOINT}1/image?format=webp")
+    assert received["image_format"] == "webp"
+    assert "vary" not in response.headers
+
+    assert client.get(f"{NFT_ENDPOINT}1/image?format=gif").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_export_ok(client: TestClient, monkeypatch: Any) -> None:
+    # We are testing only the endpoint so we mock de service
+    async def export(*args, **kargs) -> AsyncIterator[bytes]:  # type: ignore
+        yield b'{"id": 2}\n'
+        yield b'{"id": 1}\n'
+
+    monkeypatch.setattr(nft_router.NFTService, "export", export)
+
+    response = client.get(f"{NFT_ENDPOINT}export")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.splitlines() == ['{"id": 2}', '{"id": 1}']
@@ -46,6 +46,42 @@ async def test_get_all_ok(client: TestClient, monkeypatch: Any) -> None:
     assert response_json[0]["price"] == 100
 
 
+@pytest.mark.asyncio
+async def test_get_all_sparse_fields_ok(client: TestClient, monkeypatch: Any) -> None:
+    buyer_dict = dict(id=1, username="test-buyer", date_=date.today())
+    received = {}
+
+    # We are testing only the endpoint so we mock de service
+    async def get_all(self, search_request, fields, *args, **kargs) -> List[TransactionResponse]:  # type: ignore
+        received["fields"] = fields
+        return [
+            TransactionResponse.construct(
+                id=1, creation_date=datetime.now(), buyer=UserResponse(**buyer_dict), price=100
+            )
+        ]
+
+    monkeypatch.setattr(transaction_router.TransactionService, "get_all", get_all)
+
+    response = client.get(f"{TRANSACTION_ENDPOINT}?fields=id,buyer, price&limit=1")
+
+    # Verify only the requested fields are returned
+    assert response.status_code == status.HTTP_200_OK
+    assert received["fields"] == {"id", "buyer", "price"}
+    response_json = response.json()
+    assert len(response_json) == 1
+    assert set(response_json[0]) == {"id", "buyer", "price"}
+    assert response_json[0]["buyer"]["id"] == buyer_dict["id"]
+    assert "X-Next-Cursor" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_get_all_unknown_field_400_err(client: TestClient) -> None:
+    response = client.get(f"{TRANSACTION_ENDPOINT}?fields=id,password")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "password" in response.json()["detail"]
+
+
 @pytest.mark.asyncio
 async def test_get_all_422_err(client: TestClient, monkeypatch: Any) -> None:
     # We are testing only the endpoint so we mock de service
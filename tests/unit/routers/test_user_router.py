@@ -5,7 +5,8 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.testclient import TestClient
 from fastapi import status
 import pytest
-from datetime import date
+from nft_service.src.utils import NEXT_CURSOR_HEADER, decode_cursor
+from datetime import date, datetime
 from typing import List, Any
 
 USER_ENDPOINT: str = "/user/"
@@ -95,3 +96,31 @@ async def test_get_fetch_404_err(client: TestClient, monkeypatch: Any) -> None:
     response_json = response.json()
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response_json["detail"] == "dummy exception"
+
+
+@pytest.mark.asyncio
+async def test_get_all_returns_next_cursor_ok(client: TestClient, monkeypatch: Any) -> None:
+    # We are testing only the endpoint so we mock de service
+    async def get_all(*args, **kargs) -> List[UserResponse]:  # type: ignore
+        return [UserResponse(id=7, date_=date(2023, 1, 30), username="dummy-user-1")]
+
+    monkeypatch.setattr(user_router.UserService, "get_all", get_all)
+
+    # A full page returns the cursor of its last row
+    response = client.get(USER_ENDPOINT, params={"limit": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == (datetime(2023, 1, 30), 7)
+
+    # A partial page is the last one
+    response = client.get(USER_ENDPOINT, params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_get_all_invalid_cursor_400_err(client: TestClient) -> None:
+    response = client.get(USER_ENDPOINT, params={"cursor": "not-a-cursor"})
+
+    response_json = response.json()
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response_json["detail"] == "Invalid pagination cursor"
@@ -7,6 +7,8 @@ from nft_service.src.services.balance_service import BalanceService
 from nft_service.src.schemas.transaction_schema import TransactionRequest
 from nft_service.src.schemas.balance_schema import BalanceResponse
 from nft_service.src.schemas.request_schema import SearchRequest
+from nft_service.src.exceptions import BadRequest
+from nft_service.src.utils import encode_cursor
 import tests.utils as utils
 import pytest
 from fastapi.testclient import TestClient
@@ -298,3 +300,37 @@ async def test_get_all_for_user_paginated_ok(client: TestClient, session: Sessio
         user_1.id, SearchRequest(offset=1, limit=50)  # type: ignore
     )
     assert len(response) == 1  # Note that the las balance added is for user_2
+
+
+@pytest.mark.asyncio
+async def test_get_all_cursor_paginated_ok(client: TestClient, session: Session) -> None:
+    # First persist some users
+    user_1: User = utils.persist_new_user(username="test-user-1", session=session)
+    user_2: User = utils.persist_new_user(username="test-user-2", session=session)
+
+    # Add some initial balance
+    utils.persist_new_user_balance(user_1.id, initial_amount=0, final_amount=100, session=session)  # type: ignore
+    utils.persist_new_user_balance(user_1.id, initial_amount=100, final_amount=140, session=session)  # type: ignore
+    utils.persist_new_user_balance(user_2.id, initial_amount=140, final_amount=200, session=session)  # type: ignore
+
+    context = Context.default_context()
+    context.impersonate(user_1.username)
+
+    # Walk all the history one row at a time following the cursor of the last row
+    service = BalanceService(session, context)
+    seen: List[BalanceResponse] = []
+    page: List[BalanceResponse] = await service.get_all_history(SearchRequest(limit=1))
+    while page:
+        seen.extend(page)
+        cursor = encode_cursor(page[-1].creation_date, page[-1].id)  # type: ignore
+        page = await service.get_all_history(SearchRequest(limit=1, cursor=cursor))
+
+    assert [b.final_amount for b in seen] == [200, 140, 100]
+
+
+@pytest.mark.asyncio
+async def test_get_all_invalid_cursor_err(client: TestClient, session: Session) -> None:
+    context = Context.default_context()
+
+    with pytest.raises(BadRequest):
+        await BalanceService(session, context).get_all_history(SearchRequest(cursor="not-a-cursor"))
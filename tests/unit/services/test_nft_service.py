@@ -1,20 +1,38 @@
 from nft_service.src.schemas.nft_schema import NFTRequest
 from nft_service.src.models.nft import NFTFile, NFT
+from nft_service.src.models.mint_job import MintJob
 from nft_service.src.models.user import User
 from nft_service.src.models.balance import UserBalance
 from nft_service.src.context import Context
 from nft_service.src.services import nft_service
-from nft_service.src.exceptions import BadRequest, InternalError, NotFound
+from nft_service.src import storage
+from nft_service.src.exceptions import BadRequest, InternalError, NotFound, NotModified
 from nft_service.src.schemas.transaction_schema import TransactionRequest
-from nft_service.src.schemas.nft_schema import NFTFetchResponse
+from nft_service.src.schemas.nft_schema import (
+    FileMode,
+    NFTFetchResponse,
+    NFTResponse,
+    ImageFormat,
+    MintJobStatus,
+    ThumbnailMode,
+)
+from nft_service.src.schemas.request_schema import SearchRequest
 import tests.utils as utils
 import pkg_resources
 import pytest
-from typing import Any
+from typing import Any, List
 from fastapi.testclient import TestClient
 import os
-from fastapi import UploadFile
+import hashlib
+import base64
+import shutil
+import json
+import io
+from datetime import timedelta
+from fastapi import BackgroundTasks, UploadFile
+from sqlalchemy import event, update
 from sqlmodel import Session, select
+from PIL import Image
 
 RESOURCES_PATH: str = os.path.join(os.path.dirname(__file__), "../../resources/static/")
 
@@ -67,6 +85,409 @@ async def test_mint_nft_save_file_locally_ok(client: TestClient, session: Sessio
     assert os.path.exists(RESOURCES_PATH + nft_file_obj.thumbnail)
 
 
+@pytest.mark.asyncio
+async def test_mint_nft_reads_upload_once_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+
+    def read_base64(*args, **kargs) -> str:  # type: ignore
+        raise AssertionError("the stored file should not be read again")
+
+    monkeypatch.setattr(nft_service.NFTService, "_read_base64", read_base64)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        content = fo.read()
+        fo.seek(0)
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="dummy_description", creators=[])
+        nft_obj: NFTFetchResponse = await nft_service.NFTService(session, context).add(request, file=file)
+
+    # The response reuses the base64 encoded while the upload was stored
+    assert nft_obj.file.file == base64.b64encode(content).decode()
+    file_obj: NFTFile = session.exec(select(NFTFile)).one()
+    assert file_obj.digest == hashlib.sha256(content).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_mint_same_content_shares_files_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    jobs: List[Any] = []
+    run = nft_service.image_pool.run
+
+    async def counting_run(func, *args) -> Any:  # type: ignore
+        jobs.append(func)
+        return await run(func, *args)
+
+    monkeypatch.setattr(nft_service.image_pool, "run", counting_run)
+
+    async def mint(filename: str) -> NFTFetchResponse:
+        with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+            file = UploadFile(filename=filename, file=fo)
+            request = NFTRequest(description="dummy_description", creators=[])
+            return await nft_service.NFTService(session, context).add(request, file=file)
+
+    await mint("puppy.jpg")
+    await mint("same-puppy.jpg")
+
+    first, second = session.exec(select(NFTFile)).all()
+    assert (first.filename, second.filename) == ("puppy.jpg", "same-puppy.jpg")
+    assert first.hashed_name == second.hashed_name == f"{first.digest}.jpg"
+    assert first.thumbnail == second.thumbnail
+    # The thumbnail of known content is reused
+    assert len(jobs) == 1
+
+    # A failed mint of shared content keeps the files of the NFTs already using them
+    async def create(*args, **kargs) -> NFT:  # type: ignore
+        raise InternalError(details="dummy exception")
+
+    monkeypatch.setattr(nft_service.NFTRepository, "create", create)
+    with pytest.raises(InternalError):
+        await mint("puppy.jpg")
+    assert os.path.exists(RESOURCES_PATH + first.hashed_name)
+    assert os.path.exists(RESOURCES_PATH + first.thumbnail)
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_sharded_layout_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    monkeypatch.setattr(nft_service.cf, "STATIC_SHARDED", True)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="dummy_description", creators=[])
+        await nft_service.NFTService(session, context).add(request, file=file)
+
+    file_obj: NFTFile = session.exec(select(NFTFile)).one()
+    shard = os.path.join(RESOURCES_PATH, file_obj.digest[:2], file_obj.digest[2:4])  # type: ignore[index]
+    assert os.path.exists(os.path.join(shard, file_obj.hashed_name))
+    assert os.path.exists(os.path.join(shard, file_obj.thumbnail))
+    path, _ = await nft_service.NFTService(session, context).file_path(file_obj.hashed_name)
+    assert path == os.path.join(shard, file_obj.hashed_name)
+
+
+@pytest.mark.asyncio
+async def test_mint_failed_removes_unshared_content_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+
+    async def create(*args, **kargs) -> NFT:  # type: ignore
+        raise InternalError(details="dummy exception")
+
+    monkeypatch.setattr(nft_service.NFTRepository, "create", create)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="dummy_description", creators=[])
+        with pytest.raises(InternalError):
+            await nft_service.NFTService(session, context).add(request, file=file)
+
+    assert not session.exec(select(NFTFile)).all()
+    assert [name for name in os.listdir(RESOURCES_PATH) if not name.startswith(".")] == []
+
+
+def _png_upload(filename: str, color: str) -> UploadFile:
+    content = io.BytesIO()
+    Image.new("RGB", (300, 200), color).save(content, format="PNG")
+    content.seek(0)
+    return UploadFile(filename=filename, file=content)
+
+
+@pytest.mark.asyncio
+async def test_mint_bulk_reports_each_file_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    cocreator_obj: User = utils.persist_new_user("test-cocreator", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    monkeypatch.setattr(nft_service.cf, "BULK_MINT_BATCH_SIZE", 2)
+    user_queries: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:  # type: ignore
+        if "FROM user" in statement:
+            user_queries.append(statement)
+
+    requests = [
+        NFTRequest(description="red", creators=["test-cocreator"]),
+        NFTRequest(description="blue", creators=["test-cocreator", "unknown-user"]),
+        NFTRequest(description="same red", creators=[]),
+        NFTRequest(description="green", creators=["test-cocreator"]),
+    ]
+    files = [
+        _png_upload("red.png", "red"),
+        _png_upload("blue.png", "blue"),
+        _png_upload("same-red.png", "red"),
+        _png_upload("green.png", "green"),
+    ]
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        results = await nft_service.NFTService(session, context).add_many(requests, files)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    # The logged user plus a single query for the creators of every file
+    assert len(user_queries) == 2
+    assert [(result.index, result.filename, result.created) for result in results] == [
+        (0, "red.png", True),
+        (1, "blue.png", False),
+        (2, "same-red.png", True),
+        (3, "green.png", True),
+    ]
+    assert results[1].error == "Unknown creators: unknown-user"
+
+    session.expire_all()
+    red, same_red, green = [session.exec(select(NFT).where(NFT.id == results[i].nft_id)).one() for i in (0, 2, 3)]
+    assert (red.description, same_red.description, green.description) == ("red", "same red", "green")
+    assert [user.id for user in red.creators] == [cocreator_obj.id]
+    assert same_red.creators == []
+    assert red.owner_id == same_red.owner_id == green.owner_id == owner_obj.id
+    # Identical files share their content
+    assert red.file.hashed_name == same_red.file.hashed_name != green.file.hashed_name
+    assert os.path.exists(RESOURCES_PATH + red.file.thumbnail)
+    assert os.path.exists(RESOURCES_PATH + green.file.thumbnail)
+    # Two originals and two thumbnails, with their encoded copies
+    assert len([name for name in os.listdir(RESOURCES_PATH) if not name.startswith(".")]) == 6
+
+
+@pytest.mark.asyncio
+async def test_mint_bulk_failed_batch_removes_its_content_ok(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    monkeypatch.setattr(nft_service.cf, "BULK_MINT_BATCH_SIZE", 2)
+    create_many = nft_service.NFTRepository.create_many
+    batches: List[int] = []
+
+    async def failing_second_batch(self, *args, **kargs) -> List[NFT]:  # type: ignore
+        batches.append(len(kargs["items"]))
+        if len(batches) == 2:
+            raise InternalError(details="dummy exception")
+        return await create_many(self, *args, **kargs)
+
+    monkeypatch.setattr(nft_service.NFTRepository, "create_many", failing_second_batch)
+
+    requests = [NFTRequest(description=f"nft {i}", creators=[]) for i in range(3)]
+    files = [_png_upload("red.png", "red"), _png_upload("blue.png", "blue"), _png_upload("green.png", "green")]
+    results = await nft_service.NFTService(session, context).add_many(requests, files)
+
+    assert batches == [2, 1]
+    assert [result.created for result in results] == [True, True, False]
+    assert results[2].error == "Error trying to mint NFT"
+    nft_list: List[NFT] = session.exec(select(NFT)).all()
+    assert sorted(nft_obj.description for nft_obj in nft_list) == ["nft 0", "nft 1"]
+    # Only the content of the minted NFTs is kept
+    stored = [name for name in os.listdir(RESOURCES_PATH) if not name.startswith(".") and not name.endswith(".b64")]
+    assert sorted(stored) == sorted(
+        name for nft_obj in nft_list for name in (nft_obj.file.hashed_name, nft_obj.file.thumbnail)
+    )
+
+
+@pytest.mark.asyncio
+async def test_mint_bulk_failed_upload_reports_it_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    keep_upload = storage.keep_upload
+    kept: List[str] = []
+
+    def failing_second_upload(upload: storage.StoredUpload) -> bool:
+        kept.append(upload.name)
+        if len(kept) == 2:
+            raise OSError("No space left on device")
+        return keep_upload(upload)
+
+    monkeypatch.setattr(storage, "keep_upload", failing_second_upload)
+
+    requests = [NFTRequest(description=f"nft {i}", creators=[]) for i in range(3)]
+    files = [_png_upload("red.png", "red"), _png_upload("blue.png", "blue"), _png_upload("green.png", "green")]
+    results = await nft_service.NFTService(session, context).add_many(requests, files)
+
+    assert [result.created for result in results] == [True, False, True]
+    assert results[1].error == "Error trying to mint NFT"
+    nft_list: List[NFT] = session.exec(select(NFT)).all()
+    assert sorted(nft_obj.description for nft_obj in nft_list) == ["nft 0", "nft 2"]
+    # Neither the failed upload nor its temporary file are left behind
+    stored = [name for name in os.listdir(RESOURCES_PATH) if not name.startswith(".") and not name.endswith(".b64")]
+    assert sorted(stored) == sorted(
+        name for nft_obj in nft_list for name in (nft_obj.file.hashed_name, nft_obj.file.thumbnail)
+    )
+
+
+@pytest.mark.asyncio
+async def test_mint_bulk_without_metadata_for_every_file_err(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    context = Context.default_context()
+    requests = [NFTRequest(description="red", creators=[])]
+    with pytest.raises(BadRequest):
+        await nft_service.NFTService(session, context).add_many(requests, [])
+
+    monkeypatch.setattr(nft_service.cf, "BULK_MINT_MAX_FILES", 1)
+    files = [_png_upload("red.png", "red"), _png_upload("blue.png", "blue")]
+    with pytest.raises(BadRequest):
+        await nft_service.NFTService(session, context).add_many(requests * 2, files)
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_in_background_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    cocreator_obj: User = utils.persist_new_user("test-cocreator", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    background_tasks = BackgroundTasks()
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="dummy_description", creators=["test-cocreator"])
+        job = await nft_service.NFTService(session, context).add_in_background(request, file, background_tasks)
+
+    # Only the original is stored until the background work runs
+    assert job.status == MintJobStatus.PENDING
+    assert job.url == f"/nft/mint/jobs/{job.id}"
+    job_obj: MintJob = session.exec(select(MintJob).where(MintJob.id == job.id)).one()
+    assert os.path.exists(RESOURCES_PATH + job_obj.hashed_name)
+    assert not os.path.exists(RESOURCES_PATH + "thumb-" + job_obj.hashed_name)
+    assert not session.exec(select(NFT)).all()
+
+    await background_tasks()
+    # The background work used its own session
+    session.expire_all()
+
+    job = await nft_service.NFTService(session, context).mint_job(job.id)
+    assert job.status == MintJobStatus.DONE
+    nft_obj: NFT = session.exec(select(NFT).where(NFT.id == job.nft_id)).one()
+    assert nft_obj.owner_id == owner_obj.id
+    assert [user.id for user in nft_obj.creators] == [cocreator_obj.id]
+    assert nft_obj.file.hashed_name == job_obj.hashed_name
+    assert os.path.exists(RESOURCES_PATH + nft_obj.file.thumbnail)
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_in_background_failed_then_nothing_persisted_ok(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    background_tasks = BackgroundTasks()
+
+    async def create(*args, **kargs) -> NFT:  # type: ignore
+        raise InternalError(details="dummy exception")
+
+    monkeypatch.setattr(nft_service.NFTRepository, "create", create)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="dummy_description", creators=[])
+        job = await nft_service.NFTService(session, context).add_in_background(request, file, background_tasks)
+    hashed_name = session.exec(select(MintJob).where(MintJob.id == job.id)).one().hashed_name
+
+    await background_tasks()
+    # The background work used its own session
+    session.expire_all()
+
+    job = await nft_service.NFTService(session, context).mint_job(job.id)
+    assert job.status == MintJobStatus.FAILED
+    assert job.error == "Error trying to mint NFT"
+    assert job.nft_id is None
+    # Neither the NFT, its file nor the stored images are left behind
+    assert not session.exec(select(NFT)).all()
+    assert not session.exec(select(NFTFile)).all()
+    assert not os.path.exists(RESOURCES_PATH + hashed_name)
+    assert not os.path.exists(RESOURCES_PATH + "thumb-" + hashed_name)
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_in_background_waits_for_image_queue_ok(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    # Every image job is rejected until the queue drains
+    monkeypatch.setattr(nft_service.image_pool, "queue_size", 0)
+    background_tasks = BackgroundTasks()
+    delays: List[float] = []
+
+    async def sleep(delay: float) -> None:
+        delays.append(delay)
+        if len(delays) == 2:
+            monkeypatch.setattr(nft_service.image_pool, "queue_size", 1)
+
+    monkeypatch.setattr(nft_service.asyncio, "sleep", sleep)
+
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="dummy_description", creators=[])
+        job = await nft_service.NFTService(session, context).add_in_background(request, file, background_tasks)
+
+    await background_tasks()
+    session.expire_all()
+
+    # Retried backing off instead of failing
+    assert delays == [nft_service.cf.IMAGE_RETRY_AFTER, nft_service.cf.IMAGE_RETRY_AFTER * 2]
+    job = await nft_service.NFTService(session, context).mint_job(job.id)
+    assert job.status == MintJobStatus.DONE
+    assert session.exec(select(NFT).where(NFT.id == job.nft_id)).one()
+
+
+@pytest.mark.asyncio
+async def test_recover_mint_jobs_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    context = Context.default_context()
+    context.impersonate(owner_obj.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    service = nft_service.NFTService(session, context)
+
+    # Accepted but their background work never finished, as if the process was restarted
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        file = UploadFile(filename="puppy.jpg", file=fo)
+        request = NFTRequest(description="pending", creators=[])
+        pending = await service.add_in_background(request, file, BackgroundTasks())
+    content = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(content, "png")
+    content.seek(0)
+    request = NFTRequest(description="running", creators=[])
+    running = await service.add_in_background(request, UploadFile(filename="red.png", file=content), BackgroundTasks())
+    running_obj: MintJob = session.exec(select(MintJob).where(MintJob.id == running.id)).one()
+    running_obj.status = MintJobStatus.RUNNING
+    session.add(running_obj)
+    session.commit()
+
+    # Recent jobs may still be worked on
+    assert await service.recover_mint_jobs() == 0
+
+    later = Context.default_context()
+    later.system_date += timedelta(seconds=nft_service.cf.MINT_JOB_TIMEOUT + 1)
+    assert await nft_service.NFTService(session, later).recover_mint_jobs() == 2
+    session.expire_all()
+
+    pending = await service.mint_job(pending.id)
+    assert pending.status == MintJobStatus.DONE
+    assert session.exec(select(NFT).where(NFT.id == pending.nft_id)).one()
+    # Interrupted at an unknown point, it fails and its content is released
+    running = await service.mint_job(running.id)
+    assert running.status == MintJobStatus.FAILED
+    assert not os.path.exists(RESOURCES_PATH + running_obj.hashed_name)
+
+
 @pytest.mark.asyncio
 async def test_buy_nft_when_money_available_ok(client: TestClient, session: Session) -> None:
     # Persis new file in db
@@ -478,6 +899,38 @@ async def test_mint_nft_with_creators_ok(client: TestClient, session: Session, m
         assert query_nft.creators[1].id == user_c2.id
 
 
+@pytest.mark.asyncio
+async def test_mint_nft_resolves_creators_in_one_query_ok(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    user: User = utils.persist_new_user(username="test-user", session=session)
+    usernames = [f"test-creator-{i}" for i in range(10)]
+    for username in usernames:
+        utils.persist_new_user(username=username, session=session)
+    context = Context.default_context()
+    context.impersonate(user.username)
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    user_queries: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:  # type: ignore
+        if statement.lstrip().startswith("SELECT") and "FROM user" in statement:
+            user_queries.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+            file = UploadFile(filename="puppy.jpg", file=fo)
+            request = NFTRequest(description="dummy_description", creators=usernames)
+            nft_obj: NFTFetchResponse = await nft_service.NFTService(session, context).add(request, file=file)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert [u.username for u in nft_obj.creators] == usernames
+    # The logged user, the creators and the owner of the response, whatever the amount of creators
+    assert len(user_queries) == 3
+
+
 @pytest.mark.asyncio
 async def test_mint_nft_with_bad_username_creator_err(client: TestClient, session: Session, monkeypatch: Any) -> None:
     # First persist some user to acts as logged user
@@ -497,3 +950,331 @@ async def test_mint_nft_with_bad_username_creator_err(client: TestClient, sessio
 
         with pytest.raises(NotFound):
             await nft_service.NFTService(session, context).add(NFTRequest(**request), file=file)
+
+        # Every unknown creator is reported in the same error
+        request = dict(description="dummy_description", creators=["bad-username", user.username, "other-bad-username"])
+        with pytest.raises(NotFound) as exc_info:
+            await nft_service.NFTService(session, context).add(NFTRequest(**request), file=file)
+        assert exc_info.value.details == "Unknown users: bad-username, other-bad-username"
+
+
+@pytest.mark.asyncio
+async def test_get_all_with_thumbnail_reference_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    # First persist some user to acts as logged user
+    user: User = utils.persist_new_user(username="test-user", session=session)
+
+    context = Context.default_context()
+    context.impersonate(user.username)
+
+    filename: str = "puppy.jpg"
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+
+    with open(pkg_resources.resource_filename("tests.resources", filename), "rb") as fo:
+        file = UploadFile(filename=filename, file=fo)
+        request = dict(description="dummy_description", creators=[])
+        await nft_service.NFTService(session, context).add(NFTRequest(**request), file=file)
+
+    nft_list: List[NFTResponse] = await nft_service.NFTService(session, context).get_all(
+        SearchRequest(), thumbnail_mode=ThumbnailMode.REFERENCE
+    )
+
+    # The thumbnail is not read, only referenced
+    nft_file_obj: NFTFile = session.exec(select(NFTFile).where(NFTFile.filename == filename)).one()
+    with open(RESOURCES_PATH + nft_file_obj.thumbnail, "rb") as fo:
+        expected_hash = hashlib.sha256(fo.read()).hexdigest()
+
+    assert len(nft_list) == 1
+    assert nft_list[0].file.thumbnail is None
+    assert nft_list[0].file.url == f"/nft/thumbnail/{nft_file_obj.thumbnail}"
+    assert nft_list[0].file.hash == expected_hash
+
+
+@pytest.mark.asyncio
+async def test_mint_nft_precomputes_encoded_thumbnail_ok(
+    client: TestClient, session: Session, monkeypatch: Any
+) -> None:
+    # First persist some user to acts as logged user
+    user: User = utils.persist_new_user(username="test-user", session=session)
+
+    context = Context.default_context()
+    context.impersonate(user.username)
+
+    filename: str = "puppy.jpg"
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+
+    with open(pkg_resources.resource_filename("tests.resources", filename), "rb") as fo:
+        file = UploadFile(filename=filename, file=fo)
+        request = dict(description="dummy_description", creators=[])
+        await nft_service.NFTService(session, context).add(NFTRequest(**request), file=file)
+
+    # The encoded thumbnail is stored next to it
+    nft_file_obj: NFTFile = session.exec(select(NFTFile).where(NFTFile.filename == filename)).one()
+    expected_base64 = await utils.image_to_base64(RESOURCES_PATH + nft_file_obj.thumbnail)
+    with open(RESOURCES_PATH + nft_file_obj.thumbnail + ".b64", "r") as fo:
+        assert fo.read() == expected_base64
+
+    # And it is the one returned by the list without encoding it again
+    def b64encode(*args: Any) -> Any:
+        raise AssertionError("Thumbnail should not be encoded again")
+
+    monkeypatch.setattr(nft_service.base64, "b64encode", b64encode)
+    nft_list: List[NFTResponse] = await nft_service.NFTService(session, context).get_all(SearchRequest())
+    assert nft_list[0].file.thumbnail == expected_base64
+
+
+@pytest.mark.asyncio
+async def test_export_all_nfts_in_batches_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    nft_ids = []
+    for _ in range(5):
+        file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+        nft_obj = utils._new_NFT(file_id=file_obj.id, owner_id=owner_obj.id, session=session)  # type: ignore
+        nft_ids.append(nft_obj.id)
+
+    # Force several batches
+    monkeypatch.setattr(nft_service.cf, "EXPORT_BATCH_SIZE", 2)
+
+    context = Context.default_context()
+    lines = [line async for line in nft_service.NFTService(session, context).export()]
+
+    assert len(lines) == 5
+    assert all(line.endswith(b"\n") for line in lines)
+    exported = [json.loads(line) for line in lines]
+    # Newest first, like the NFT list
+    assert [nft["id"] for nft in exported] == list(reversed(nft_ids))
+    assert exported[0]["owner"]["username"] == "test-owner-user"
+    assert exported[0]["file"]["url"].startswith("/nft/thumbnail/")
+    assert exported[0]["file"]["thumbnail"] is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_stream_matches_fetch_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    # First persist some user to acts as logged user
+    user: User = utils.persist_new_user(username="test-user", session=session)
+
+    context = Context.default_context()
+    context.impersonate(user.username)
+
+    filename: str = "puppy.jpg"
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+
+    with open(pkg_resources.resource_filename("tests.resources", filename), "rb") as fo:
+        file = UploadFile(filename=filename, file=fo)
+        request = dict(description="dummy_description", creators=[])
+        minted: NFTFetchResponse = await nft_service.NFTService(session, context).add(NFTRequest(**request), file=file)
+
+    # Read the file from disk in many small chunks
+    nft_file_obj: NFTFile = session.exec(select(NFTFile).where(NFTFile.filename == filename)).one()
+    nft_service.image_cache.invalidate(nft_file_obj.hashed_name)
+    monkeypatch.setattr(nft_service.cf, "STREAM_CHUNK_SIZE", 3 * 100)
+
+    service = nft_service.NFTService(session, context)
+    _, body = await service.fetch_stream(minted.id)
+    chunks = [chunk async for chunk in body]
+    assert len(chunks) > 3
+
+    expected: NFTFetchResponse = await service.fetch(minted.id)
+    assert json.loads(b"".join(chunks)) == json.loads(expected.json())
+
+
+@pytest.mark.asyncio
+async def test_fetch_not_modified_skips_file_read_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    user: User = utils.persist_new_user(username="test-user", session=session)
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=user.id, session=session)  # type: ignore
+    service = nft_service.NFTService(session, Context.default_context())
+
+    async def image_to_base64(*args, **kargs) -> str:  # type: ignore
+        return "dummy-base64"
+
+    monkeypatch.setattr(service, "_image_to_base64", image_to_base64)
+    fetched: NFTFetchResponse = await service.fetch(nft_obj.id)  # type: ignore
+    assert fetched.etag == f'"{file_obj.hashed_name}-{nft_obj.version}"'
+    assert fetched.last_modified is not None
+
+    async def no_file_read(*args, **kargs) -> str:  # type: ignore
+        raise AssertionError("file should not be read")
+
+    monkeypatch.setattr(service, "_image_to_base64", no_file_read)
+
+    with pytest.raises(NotModified) as exc:
+        await service.fetch(nft_obj.id, if_none_match=fetched.etag)  # type: ignore
+    assert exc.value.etag == fetched.etag
+
+    # A new version of the NFT no longer matches
+    nft_obj.version += 1
+    session.add(nft_obj)
+    session.commit()
+    with pytest.raises(AssertionError):
+        await service.fetch(nft_obj.id, if_none_match=fetched.etag)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_fetch_reference_skips_file_read_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    user: User = utils.persist_new_user(username="test-user", session=session)
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=user.id, session=session)  # type: ignore
+    service = nft_service.NFTService(session, Context.default_context())
+
+    async def no_file_read(*args, **kargs) -> str:  # type: ignore
+        raise AssertionError("file should not be read")
+
+    monkeypatch.setattr(service, "_image_to_base64", no_file_read)
+    fetched: NFTFetchResponse = await service.fetch(nft_obj.id, file_mode=FileMode.REFERENCE)  # type: ignore
+
+    assert fetched.file.file is None
+    assert fetched.file.url == f"/nft/file/{file_obj.hashed_name}"
+    # Both representations are cached separately by clients
+    assert fetched.etag == f'"{file_obj.hashed_name}-{nft_obj.version}-ref"'
+    with pytest.raises(AssertionError):
+        await service.fetch(nft_obj.id, if_none_match=fetched.etag)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached_invalidated_on_trade_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    buyer_obj: User = utils.persist_new_user("test-buyer-user", session)
+    utils.persist_new_user_balance(owner_obj.id, initial_amount=0, final_amount=100, session=session)  # type: ignore
+    utils.persist_new_user_balance(buyer_obj.id, initial_amount=0, final_amount=100, session=session)  # type: ignore
+    nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=owner_obj.id, session=session)  # type: ignore
+
+    context = Context.default_context()
+    context.impersonate(buyer_obj.username)
+    service = nft_service.NFTService(session, context)
+
+    async def image_to_base64(*args, **kargs) -> str:  # type: ignore
+        return "dummy-base64"
+
+    monkeypatch.setattr(service, "_image_to_base64", image_to_base64)
+
+    cached = await service.fetch_cached(nft_obj.id)  # type: ignore
+    assert json.loads(cached.body)["owner"]["username"] == "test-owner-user"
+
+    # The second fetch is served from the cache, only checking the version of the NFT
+    async def get_by_id(*args, **kargs) -> NFT:  # type: ignore
+        raise AssertionError("should be cached")
+
+    monkeypatch.setattr(service.nft_repo, "get_by_id", get_by_id)
+    assert await service.fetch_cached(nft_obj.id) is cached  # type: ignore
+    monkeypatch.undo()
+    monkeypatch.setattr(service, "_image_to_base64", image_to_base64)
+
+    transaction_req = TransactionRequest(buyer=buyer_obj.username, seller=owner_obj.username, price=10)
+    await service.trade_nft(nft_id=nft_obj.id, request=transaction_req, is_buy=True)  # type: ignore
+
+    cached = await service.fetch_cached(nft_obj.id)  # type: ignore
+    assert json.loads(cached.body)["owner"]["username"] == "test-buyer-user"
+
+
+@pytest.mark.asyncio
+async def test_fetch_cached_changed_by_other_process_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    owner_obj: User = utils.persist_new_user("test-owner-user", session)
+    nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=owner_obj.id, session=session)  # type: ignore
+
+    service = nft_service.NFTService(session, Context.default_context())
+
+    async def image_to_base64(*args, **kargs) -> str:  # type: ignore
+        return "dummy-base64"
+
+    monkeypatch.setattr(service, "_image_to_base64", image_to_base64)
+
+    cached = await service.fetch_cached(nft_obj.id)  # type: ignore
+    assert json.loads(cached.body)["description"] == nft_obj.description
+
+    # Updated as another worker would, which only invalidates its own cache
+    session.execute(
+        update(NFT).where(NFT.id == nft_obj.id).values(description="changed", version=NFT.version + 1)
+    )
+    session.commit()
+
+    changed = await service.fetch_cached(nft_obj.id)  # type: ignore
+    assert json.loads(changed.body)["description"] == "changed"
+    assert changed.etag != cached.etag
+
+
+@pytest.mark.asyncio
+async def test_thumbnail_path_only_images_ok(
+    client: TestClient, session: Session, tmp_path: Any, monkeypatch: Any
+) -> None:
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{tmp_path}/")
+    with open(storage.target_path("thumb-puppy.jpg"), "wb") as fo:
+        fo.write(b"thumbnail")
+    storage.write_encoded("thumb-puppy.jpg")
+
+    service = nft_service.NFTService(session, Context.default_context())
+    assert await service.thumbnail_path("thumb-puppy.jpg") == storage.path_for("thumb-puppy.jpg")
+    # The base64 sidecar is stored next to it
+    with pytest.raises(NotFound):
+        await service.thumbnail_path("thumb-puppy.jpg.b64")
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_keeps_request_order_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    owner: User = utils.persist_new_user(username="test-user", session=session)
+    nft_ids: List[int] = []
+    for _ in range(3):
+        file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+        nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=owner.id, session=session)  # type: ignore
+        nft_ids.append(nft_obj.id)  # type: ignore
+
+    service = nft_service.NFTService(session, Context.default_context())
+
+    async def image_to_base64(name: str) -> str:
+        return f"base64-{name}"
+
+    monkeypatch.setattr(service, "_image_to_base64", image_to_base64)
+
+    missing_id = max(nft_ids) + 1
+    requested = [nft_ids[2], missing_id, nft_ids[0], nft_ids[2]]
+    response = await service.fetch_many(requested)
+
+    assert [item.id for item in response] == requested
+    assert [item.found for item in response] == [True, False, True, True]
+    assert response[1].nft is None
+    assert response[0].nft.id == nft_ids[2]  # type: ignore
+    assert response[0].nft.owner.username == "test-user"  # type: ignore
+    assert response[2].nft.file.file.startswith("base64-")  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_too_many_ids_err(client: TestClient, session: Session) -> None:
+    service = nft_service.NFTService(session, Context.default_context())
+
+    with pytest.raises(BadRequest):
+        await service.fetch_many(list(range(nft_service.cf.MULTI_GET_MAX_IDS + 1)))
+
+
+@pytest.mark.asyncio
+async def test_image_variant_generated_once_ok(client: TestClient, session: Session, monkeypatch: Any) -> None:
+    user: User = utils.persist_new_user(username="test-user", session=session)
+    file_obj: NFTFile = utils.persist_new_file("puppy.jpg", session)
+    nft_obj: NFT = utils._new_NFT(file_id=file_obj.id, owner_id=user.id, session=session)  # type: ignore
+    monkeypatch.setattr(nft_service.cf, "STATIC_PATH", RESOURCES_PATH)
+    shutil.copy(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), RESOURCES_PATH + file_obj.hashed_name)
+
+    service = nft_service.NFTService(session, Context.default_context())
+    accept = "image/avif,image/webp,image/*,*/*;q=0.8"
+    path, image_format = await service.image_variant(nft_obj.id, 128, None, accept)  # type: ignore
+
+    # Browsers accepting WebP get it, saved next to the original
+    assert image_format == "webp"
+    assert os.path.dirname(path) == os.path.dirname(RESOURCES_PATH + file_obj.hashed_name)
+    with Image.open(path) as img:
+        assert img.format == "WEBP"
+        assert max(img.size) == 128
+
+    # Reused afterwards
+    def make_variant(*args, **kargs) -> None:  # type: ignore
+        raise AssertionError("variant should be reused")
+
+    monkeypatch.setattr(service, "_make_variant", make_variant)
+    assert await service.image_variant(nft_obj.id, 128, None, accept) == (path, "webp")  # type: ignore
+
+    # Clients not asking for WebP get the original format and the original file when no size is given
+    original = await service.image_variant(nft_obj.id, None, None, "*/*")  # type: ignore
+    assert original == (RESOURCES_PATH + file_obj.hashed_name, "jpeg")
+
+    with pytest.raises(BadRequest):
+        await service.image_variant(nft_obj.id, 100, ImageFormat.PNG, None)  # type: ignore
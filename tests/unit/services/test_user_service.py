@@ -70,3 +70,27 @@ async def test_fetch_404_err(client: TestClient, session: Session) -> None:
 
     with pytest.raises(NotFound):
         await UserService(session, context).fetch(fake_user_id)
+
+
+@pytest.mark.asyncio
+async def test_fetch_creators_ok(client: TestClient, session: Session) -> None:
+    user_1: User = utils.persist_new_user(username="test-user-1", session=session)
+    user_2: User = utils.persist_new_user(username="test-user-2", session=session)
+
+    creators: List[User] = await UserService(session, Context.default_context()).fetch_creators(
+        ["test-user-2", "test-user-1", "test-user-2"]
+    )
+    # Same order as requested, without repeating users
+    assert [user.id for user in creators] == [user_2.id, user_1.id]
+
+
+@pytest.mark.asyncio
+async def test_fetch_creators_404_err(client: TestClient, session: Session) -> None:
+    utils.persist_new_user(username="test-user-1", session=session)
+
+    with pytest.raises(NotFound) as exc_info:
+        await UserService(session, Context.default_context()).fetch_creators(
+            ["unknown-1", "test-user-1", "unknown-2"]
+        )
+    # Every unknown username is reported at once
+    assert exc_info.value.details == "Unknown users: unknown-1, unknown-2"
@@ -0,0 +1,64 @@
+from nft_service.src.cache import LRUCache
+
+
+def test_get_after_put_ok() -> None:
+    cache: LRUCache[str] = LRUCache("test", max_bytes=10)
+    cache.put("a", "12345")
+
+    assert cache.get("a") == "12345"
+    assert cache.get("b") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["size_bytes"] == 5
+
+
+def test_evicts_least_recently_used_ok() -> None:
+    cache: LRUCache[str] = LRUCache("test", max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a")
+    cache.put("c", "12345")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    assert cache.get("c") == "12345"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size_bytes"] == 10
+
+
+def test_value_bigger_than_budget_not_cached_ok() -> None:
+    cache: LRUCache[str] = LRUCache("test", max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345678901")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+
+
+def test_replace_and_invalidate_ok() -> None:
+    cache: LRUCache[str] = LRUCache("test", max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("a", "123")
+    assert cache.stats()["size_bytes"] == 3
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.stats()["size_bytes"] == 0
+
+
+def test_put_skipped_after_invalidation_ok() -> None:
+    cache: LRUCache[str] = LRUCache("test", max_bytes=10)
+
+    # The value was read before "a" changed, so it could be stale
+    token = cache.token()
+    cache.invalidate("a")
+    cache.put("a", "12345", token=token)
+    assert cache.get("a") is None
+
+    cache.put("a", "12345", token=cache.token())
+    assert cache.get("a") == "12345"
@@ -0,0 +1,116 @@
+from nft_service.src.imaging import ImagePool, downscale, fit_size, make_thumbnail
+from nft_service.src.exceptions import ServiceUnavailable
+from PIL import ExifTags, Image
+import asyncio
+import pkg_resources
+import pytest
+import time
+from typing import Any, List, Tuple
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.mark.asyncio
+async def test_image_pool_runs_jobs_in_processes_ok(tmp_path: Any) -> None:
+    pool = ImagePool(workers=2, queue_size=4, timeout=30)
+    path = pkg_resources.resource_filename("tests.resources", "puppy.jpg")
+    try:
+        thumbnails = [str(tmp_path / f"thumb-{i}.jpg") for i in range(3)]
+        await asyncio.gather(*(pool.run(make_thumbnail, path, thumbnail, 64) for thumbnail in thumbnails))
+    finally:
+        pool.shutdown()
+
+    for thumbnail in thumbnails:
+        with Image.open(thumbnail) as img:
+            assert max(img.size) == 64
+    assert pool.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_image_pool_rejects_jobs_when_queue_is_full_err() -> None:
+    pool = ImagePool(workers=1, queue_size=2, timeout=30)
+    try:
+        queued = [asyncio.create_task(pool.run(_sleep, 0.5)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(ServiceUnavailable) as exc:
+            await pool.run(_sleep, 0)
+        assert exc.value.status == 503
+
+        # Accepted again once the queue drains
+        assert await asyncio.gather(*queued) == [0.5, 0.5]
+        assert await pool.run(_sleep, 0) == 0
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_image_pool_job_timeout_err() -> None:
+    # Long enough for new workers to start
+    pool = ImagePool(workers=1, queue_size=2, timeout=1)
+    try:
+        await pool.run(_sleep, 0)
+        stuck_workers = list(pool._executor._processes.values())  # type: ignore[union-attr]
+        with pytest.raises(TimeoutError):
+            await pool.run(_sleep, 5)
+
+        # The stuck worker is killed, later jobs don't wait for it
+        for process in stuck_workers:
+            process.join(1)
+            assert not process.is_alive()
+        start = time.perf_counter()
+        assert await pool.run(_sleep, 0) == 0
+        assert time.perf_counter() - start < 5
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def _jpeg(path: Any, size: Tuple[int, int], orientation: int = 1) -> str:
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = orientation
+    exif[ExifTags.Base.Make] = "dummy-camera"
+    Image.linear_gradient("L").resize(size).convert("RGB").save(str(path), exif=exif, comment=b"dummy comment")
+    return str(path)
+
+
+def test_make_thumbnail_upright_without_metadata_ok(tmp_path: Any) -> None:
+    # Orientation 6, the camera was rotated 90 degrees
+    path = _jpeg(tmp_path / "photo.jpg", (1600, 1200), orientation=6)
+    thumbnail = str(tmp_path / "thumb-photo.jpg")
+    make_thumbnail(path, thumbnail, 200)
+
+    with Image.open(thumbnail) as img:
+        assert img.size == (150, 200)
+        assert not img.getexif()
+        assert "comment" not in img.info
+
+
+def test_downscale_decodes_jpeg_at_reduced_scale_ok(tmp_path: Any, monkeypatch: Any) -> None:
+    path = _jpeg(tmp_path / "photo.jpg", (4000, 3000))
+    resized: List[Tuple[int, int]] = []
+    resize = Image.Image.resize
+
+    def spy_resize(self, size, *args, **kargs):  # type: ignore
+        resized.append(self.size)
+        return resize(self, size, *args, **kargs)
+
+    monkeypatch.setattr(Image.Image, "resize", spy_resize)
+    with Image.open(path) as img:
+        assert downscale(img, 200).size == (200, 150)
+    # Decoded at 1/8 scale, never at full resolution
+    assert resized == [(500, 375)]
+
+
+def test_downscale_keeps_small_images_and_transparency_ok() -> None:
+    img = Image.new("P", (120, 80))
+    img.info["transparency"] = 0
+    img.info["dpi"] = (72, 72)
+
+    result = downscale(img, 200)
+    assert result.size == (120, 80)
+    assert result.info == {"transparency": 0}
+    assert fit_size((4000, 10), 200) == (200, 1)
@@ -0,0 +1,24 @@
+from nft_service.src.responses import UNSATISFIABLE, parse_range
+import pytest
+from typing import Optional, Tuple
+
+
+@pytest.mark.parametrize(
+    "range_header, expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-2000", (0, 999)),
+        ("bytes=990-2000", (990, 999)),
+        ("bytes=1000-", UNSATISFIABLE),
+        ("bytes=-0", UNSATISFIABLE),
+        # Ignored, the whole file is sent
+        ("bytes=10-5", None),
+        ("bytes=-", None),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range_ok(range_header: str, expected: Optional[Tuple[int, int]]) -> None:
+    assert parse_range(range_header, 1000) == expected
@@ -0,0 +1,167 @@
+from nft_service.src import storage
+from nft_service.src.commands import migrate_storage
+from nft_service.src.exceptions import PayloadTooLarge
+import asyncio
+import base64
+import hashlib
+import io
+import multiprocessing
+import os
+import pkg_resources
+import pytest
+from typing import Any
+
+
+def test_write_upload_hashes_and_encodes_in_one_pass_ok(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{tmp_path}/")
+    # Chunks not multiple of 3 bytes long still concatenate into valid base64
+    monkeypatch.setattr(storage.cf, "STREAM_CHUNK_SIZE", 1000)
+    with open(pkg_resources.resource_filename("tests.resources", "puppy.jpg"), "rb") as fo:
+        content = fo.read()
+    digest = hashlib.sha256(content).hexdigest()
+
+    upload = storage.write_upload(io.BytesIO(content), "JPEG", max_bytes=len(content), encode=True)
+
+    assert upload.size == len(content)
+    assert upload.digest == digest
+    assert upload.base64 == base64.b64encode(content).decode()
+    # Named after its content once kept
+    assert upload.name == f"{digest}.jpg"
+    assert storage.keep_upload(upload)
+    assert os.listdir(tmp_path) == [upload.name]
+    with open(storage.path_for(upload.name), "rb") as fo:
+        assert fo.read() == content
+
+
+def test_keep_upload_known_content_ok(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{tmp_path}/")
+
+    first = storage.write_upload(io.BytesIO(b"same content"), "png", max_bytes=1000)
+    second = storage.write_upload(io.BytesIO(b"same content"), "png", max_bytes=1000)
+    assert first.name == second.name and first.base64 is None
+
+    assert storage.keep_upload(first)
+    stat_result = os.stat(storage.path_for(first.name))
+    # The stored copy is left untouched and the new one dropped
+    assert not storage.keep_upload(second)
+    assert os.listdir(tmp_path) == [first.name]
+    assert os.stat(storage.path_for(first.name)).st_ino == stat_result.st_ino
+
+
+def test_write_upload_over_budget_err(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{tmp_path}/")
+
+    with pytest.raises(PayloadTooLarge) as exc:
+        storage.write_upload(io.BytesIO(b"x" * 1001), "jpg", max_bytes=1000)
+
+    # Counted on the bytes actually read and nothing is left behind
+    assert exc.value.status == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_sharded_layout_finds_files_not_migrated_yet_ok(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{tmp_path}/")
+    monkeypatch.setattr(storage.cf, "STATIC_SHARDED", True)
+
+    upload = storage.write_upload(io.BytesIO(b"content"), "png", max_bytes=1000)
+    assert storage.keep_upload(upload)
+    thumbnail = "thumb-" + upload.name
+    with open(storage.target_path(thumbnail), "wb") as fo:
+        fo.write(b"thumbnail")
+    storage.write_encoded(thumbnail)
+
+    # The original, its thumbnail and encoded copy share their directory
+    shard = os.path.join(str(tmp_path), upload.digest[:2], upload.digest[2:4])
+    assert sorted(os.listdir(shard)) == sorted([upload.name, thumbnail, thumbnail + ".b64"])
+    assert storage.path_for(upload.name) == os.path.join(shard, upload.name)
+
+    # Stored before sharding, still in the flat layout
+    with open(os.path.join(str(tmp_path), "legacy.png"), "wb") as fo:
+        fo.write(b"legacy")
+    assert storage.exists("legacy.png")
+    assert storage.path_for("legacy.png") == os.path.join(str(tmp_path), "legacy.png")
+
+    # Both copies are removed while a file is being migrated
+    storage.copy(storage.path_for("legacy.png"), storage.target_path("legacy.png"))
+    storage.remove("legacy.png")
+    assert not storage.exists("legacy.png")
+    assert "legacy.png" not in [name for name, _ in storage.stored_files(str(tmp_path))]
+
+
+def test_hash_ring_only_moves_files_to_new_volume_ok() -> None:
+    keys = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(2000)]
+    before = storage.HashRing(["a", "b", "c"])
+    after = storage.HashRing(["a", "b", "c", "d"])
+
+    moved = [key for key in keys if before.volume_for(key) != after.volume_for(key)]
+    assert all(after.volume_for(key) == "d" for key in moved)
+    # About a quarter of the files, not most of them as with a modulo
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    assert {before.volume_for(key) for key in keys} == {"a", "b", "c"}
+
+
+def test_migrate_storage_moves_files_to_their_volume_ok(tmp_path: Any, monkeypatch: Any) -> None:
+    static_path = tmp_path / "static"
+    volumes = [str(tmp_path / "volume-1"), str(tmp_path / "volume-2")]
+    for directory in (static_path, *volumes):
+        os.makedirs(directory)
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{static_path}/")
+    names = [f"{hashlib.sha256(str(i).encode()).hexdigest()}.png" for i in range(20)]
+    for name in names:
+        with open(static_path / name, "wb") as fo:
+            fo.write(name.encode())
+    with open(static_path / "upload-0123.tmp", "wb") as fo:
+        fo.write(b"partial upload")
+
+    monkeypatch.setattr(storage.cf, "STATIC_SHARDED", True)
+    monkeypatch.setattr(storage.cf, "STATIC_VOLUMES", volumes)
+    assert migrate_storage.migrate(grace=0) == (20, 20)
+
+    for name in names:
+        assert storage.path_for(name) == storage.shard_path(name)
+        with open(storage.path_for(name), "rb") as fo:
+            assert fo.read() == name.encode()
+    assert {storage.path_for(name).split(os.sep)[-4] for name in names} == {"volume-1", "volume-2"}
+    # Temporary files are left alone
+    assert os.listdir(static_path) == ["upload-0123.tmp"]
+    assert migrate_storage.migrate(grace=0) == (0, 0)
+
+
+def _hold_name_lock(static_path: str, name: str, locked: Any, release: Any) -> None:
+    # Another worker process of the host
+    storage.cf.STATIC_PATH = static_path
+
+    async def hold() -> None:
+        async with storage.name_lock(name):
+            locked.set()
+            release.wait()
+
+    asyncio.run(hold())
+
+
+def test_name_lock_across_processes_ok(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(storage.cf, "STATIC_PATH", f"{tmp_path}/")
+    context = multiprocessing.get_context("spawn")
+    locked, release = context.Event(), context.Event()
+    process = context.Process(
+        target=_hold_name_lock, args=(f"{tmp_path}/", "a.png", locked, release), daemon=True
+    )
+    process.start()
+    assert locked.wait(timeout=30)
+
+    async def take() -> float:
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.3, release.set)
+        start = loop.time()
+        async with storage.name_lock("a.png"):
+            return loop.time() - start
+
+    try:
+        # Waits for the other process to release it
+        assert asyncio.run(take()) >= 0.3
+    finally:
+        release.set()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    # No lock files are left behind
+    assert os.listdir(tmp_path) == []
@@ -79,13 +79,15 @@ def persist_new_transaction(buyer_id: int, seller_id: int, nft_id: int, price: f
     return transaction_obj
 
 
-def _new_NFT(file_id: int, owner_id: int, session: Session, cocreators: List[User] = []) -> NFT:
+def _new_NFT(
+    file_id: int, owner_id: int, session: Session, cocreators: List[User] = [], description: str = "Some description"
+) -> NFT:
     nft_obj = NFT(
         creation_date=datetime.now(),
         file_id=file_id,
         owner_id=owner_id,
         creators=cocreators,
-        description="Some description",
+        description=description,
     )
     utils.fill_obj_with_audit_data(nft_obj)
     session.add(nft_obj)